@@ -0,0 +1,128 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Persistent caches for cohort test runs keyed on content hashes.
+
+Classes
+
+  :class:`ResultCache`
+    Records the key each student's report was generated with so that
+    unchanged submissions need not be tested again.
+  :class:`CollectionCache`
+    Stores the test node ids collected by pytest for a cohort.
+"""
+import json
+import hashlib
+from typing import Dict, Sequence, List, Callable, Union
+from pathlib import Path
+from pyam.config import CONFIG
+from pyam.files import hash_tree, tree_stamp, write_atomic
+from pyam.run_pytest import fixture_plugins
+
+
+def config_digest(cohort: 'pyam.cohort.Cohort') -> str:
+    """Return a digest of the configuration which can affect test results
+
+    This is the cohort manifest (excluding the marking "tests" details)
+    and the global configuration (excluding the default cohort name).
+    """
+    cohort_config = {k: v for k, v in cohort.manifest.items() if k != "tests"}
+    global_config = {k: v for k, v in CONFIG.manifest.items() if k != "cohort"}
+    return hashlib.sha256(
+        json.dumps((cohort_config, global_config), sort_keys=True,
+                   default=str).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Cache of keys for student reports in a cohort.
+
+    A key is a digest of the student's submission files, the cohort test
+    directory, the relevant configuration and the pytest arguments. If a
+    student's key matches the one recorded when their report was written the
+    existing report can be reused.
+
+    Attributes:
+      cohort (Cohort): The cohort being cached
+      path (Path): Path to the json cache file
+      journal (Path): If set, entries stored are written here instead of to path
+        (e.g. for a shard of a run to be merged later with :meth:`update`)
+      entries (dict): Cache entries indexed by student username
+      updated (dict): Entries stored since loaded
+      test_digest (str): digest of cohort test directory
+      config_digest (str): digest of relevant configuration
+    """
+
+    def __init__(self, cohort: 'pyam.cohort.Cohort', journal: Union[Path, None] = None):
+        self.cohort = cohort
+        self.path: Path = cohort.cache_path / "results.json"
+        self.journal = journal
+        self.entries: Dict[str, Dict] = {}
+        self.updated: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, "r") as fid:
+                self.entries = json.load(fid)
+        self.test_digest: str = hash_tree(cohort.test_path)
+        self.config_digest: str = config_digest(cohort)
+
+    def key(self, student: 'pyam.cohort.Student', extras: Sequence[str] = ()) -> str:
+        """Return the current cache key for a student run with given pytest extras"""
+        return hashlib.sha256(
+            json.dumps((hash_tree(student.path), self.test_digest,
+                        self.config_digest, list(extras))).encode("utf-8")).hexdigest()
+
+    def hit(self, student: 'pyam.cohort.Student', key: str, report_path: Path) -> bool:
+        """Return True if report_path exists and was generated with key"""
+        entry = self.entries.get(student.username)
+        return bool(entry and entry["key"] == key and entry["report"] == report_path.name
+                    and report_path.exists())
+
+    def store(self, student: 'pyam.cohort.Student', key: str, report_path: Path,
+              returncode: int) -> None:
+        """Record that report_path was generated with key and write cache (or journal)"""
+        entry = {"key": key, "report": report_path.name, "returncode": returncode}
+        self.entries[student.username] = entry
+        self.updated[student.username] = entry
+        if self.journal:
+            write_atomic(self.journal, json.dumps(self.updated, indent=2, sort_keys=True))
+        else:
+            write_atomic(self.path, json.dumps(self.entries, indent=2, sort_keys=True))
+
+    def update(self, entries: Dict[str, Dict]) -> None:
+        """Add entries (e.g. read from a journal) and write cache"""
+        self.entries.update(entries)
+        write_atomic(self.path, json.dumps(self.entries, indent=2, sort_keys=True))
+
+
+class CollectionCache:
+    """On-disk cache of the test node ids collected by pytest for a cohort.
+
+    The cache is valid while the files in the cohort test directory and the
+    configured fixtures are unchanged. Modification times and sizes are
+    checked first and file contents are only hashed if these differ.
+
+    Attributes:
+      cohort (Cohort): The cohort being cached
+      path (Path): Path to the json cache file
+    """
+
+    def __init__(self, cohort: 'pyam.cohort.Cohort'):
+        self.cohort = cohort
+        self.path: Path = cohort.cache_path / "collection.json"
+
+    def nodeids(self, collect: Callable[[], List[str]]) -> List[str]:
+        """Return the cached node ids, calling collect to regenerate them if out of date"""
+        entry = {}
+        if self.path.exists():
+            with open(self.path, "r") as fid:
+                entry = json.load(fid)
+        stamp = tree_stamp(self.cohort.test_path)
+        plugins = fixture_plugins(self.cohort)
+        if entry.get("plugins") == plugins and entry.get("stamp") == stamp:
+            return entry["nodeids"]
+        digest = hash_tree(self.cohort.test_path)
+        if entry.get("plugins") == plugins and entry.get("digest") == digest:
+            entry["stamp"] = stamp
+        else:
+            entry = {"plugins": plugins, "stamp": stamp, "digest": digest,
+                     "nodeids": collect()}
+        write_atomic(self.path, json.dumps(entry, indent=2))
+        return entry["nodeids"]
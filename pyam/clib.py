@@ -0,0 +1,251 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Call functions in a student C shared library from Python (POSIX only).
+
+The library is loaded once but each call, or batch of calls using
+:meth:`CFunction.map`, is made in a child forked from the calling process so
+that a crash or infinite loop in student code can not affect the test
+session. Each call must complete within the library timeout and the child
+is subject to the library resource limits (see :class:`pyam.execute.ResourceLimit`).
+Return values, and the contents of ctypes arrays, structures and
+pointers (or byref) passed as arguments, are sent back from the child so that
+output arguments work as for a direct call.
+
+Typical Usage:
+
+.. code-block:
+    lib = CLibrary(c_compile(... cflags=["-shared", "-fPIC"]), timeout=1)
+    add = lib.function("add", ctypes.c_int, [ctypes.c_int, ctypes.c_int])
+    assert add(1, 2) == 3
+    assert add.map([(i, i) for i in range(1000)]) == [2 * i for i in range(1000)]
+
+Classes
+
+  :class:`CLibrary`
+    A shared library whose functions are called in forked children
+  :class:`CFunction`
+    A function in a :class:`CLibrary`
+"""
+import os
+import sys
+import io
+import ctypes
+import pickle
+import select
+import signal
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Iterable, List, Sequence, Union
+from pyam.cunit import RunTimeError
+from pyam.execute import ResourceLimit, apply_limits
+
+_MEMORY_TYPES = (ctypes.Array, ctypes.Structure, ctypes.Union)
+
+
+def _memory(arg: Any) -> Union[ctypes.Array, ctypes.Structure, ctypes.Union, None]:
+    """Return the ctypes object whose memory a call argument refers to, if any"""
+    if isinstance(arg, _MEMORY_TYPES):
+        return arg
+    if isinstance(arg, ctypes._Pointer):  # pylint: disable=protected-access
+        return arg.contents
+    obj = getattr(arg, "_obj", None)  # from ctypes.byref
+    if obj is not None and hasattr(obj, "_b_base_"):
+        return obj
+    return None
+
+
+def _contents(arg: Any) -> Union[bytes, None]:
+    """Return the memory contents of an argument"""
+    memory = _memory(arg)
+    if memory is None:
+        return None
+    return ctypes.string_at(ctypes.addressof(memory), ctypes.sizeof(memory))
+
+
+def _restore(arg: Any, contents: Union[bytes, None]) -> None:
+    """Copy memory contents back into an argument"""
+    memory = _memory(arg)
+    if memory is not None and contents is not None:
+        ctypes.memmove(ctypes.addressof(memory), contents, len(contents))
+
+
+class CFunction:
+    """A function in a :class:`CLibrary` called in forked children
+
+    Attributes:
+        library (CLibrary): The library
+        name (str): The function name
+        function: The ctypes function
+    """
+
+    def __init__(self, library: 'CLibrary', name: str, function):
+        self.library = library
+        self.name = name
+        self.function = function
+
+    def __call__(self, *args):
+        """Call the function with args in a forked child and return its result"""
+        return self.map([args])[0]
+
+    def map(self, calls: Iterable[Sequence]) -> List:
+        """Call the function for each sequence of arguments in a single forked child
+
+        Args:
+            calls: The arguments for each call
+
+        Returns:
+            List of the results of each call
+
+        Raises:
+            subprocess.TimeoutExpired: If any call takes longer than the library timeout
+            RunTimeError: If the child crashed or a call raised an exception
+        """
+        calls = [tuple(args) for args in calls]
+        if not calls:
+            return []
+        read_fd, write_fd = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._child(calls, write_fd)
+        os.close(write_fd)
+        try:
+            data, timed_out = self.library.read(read_fd)
+        except BaseException:
+            # e.g. an interrupt or session timeout - do not leave the child running
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            raise
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+        records = []
+        stream = io.BytesIO(data)
+        while len(records) < len(calls):
+            try:
+                records.append(pickle.load(stream))
+            except (EOFError, pickle.UnpicklingError):
+                break
+        results = []
+        for args, record in zip(calls, records):
+            if record[0] == "error":
+                raise RunTimeError(f"{self.name}{args}: {record[1]}")
+            _, result, contents = record
+            for arg, content in zip(args, contents):
+                _restore(arg, content)
+            if isinstance(result, bytes) and isinstance(self.function.restype, type) \
+               and issubclass(self.function.restype, _MEMORY_TYPES):
+                result = self.function.restype.from_buffer_copy(result)
+            results.append(result)
+        if len(results) < len(calls):
+            args = calls[len(results)]
+            if timed_out:
+                raise subprocess.TimeoutExpired(f"{self.name}{args}", self.library.timeout)
+            raise RunTimeError(
+                f"{self.name}{args} crashed ({self.library.describe_status(status)})")
+        return results
+
+    def _child(self, calls: List[tuple], write_fd: int) -> None:
+        """Make the calls in the forked child writing a record for each to write_fd"""
+        code = 0
+        try:
+            if self.library.resources is not None:
+                apply_limits(self.library.resources)
+            with os.fdopen(write_fd, "wb") as pipe:
+                for args in calls:
+                    try:
+                        result = self.function(*args)
+                        if isinstance(result, _MEMORY_TYPES):
+                            result = bytes(result)
+                        record = ("ok", result, [_contents(arg) for arg in args])
+                        pickle.dumps(record)
+                    except Exception as err:  # pylint: disable=broad-except
+                        record = ("error", repr(err))
+                    pickle.dump(record, pipe)
+                    pipe.flush()
+        except BaseException:  # pylint: disable=broad-except
+            code = 1
+        finally:
+            # flush student C output which os._exit would discard
+            ctypes.CDLL(None).fflush(None)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)  # pylint: disable=protected-access
+
+
+class CLibrary:
+    """A student C shared library whose functions are called in forked children
+
+    Only available where os.fork is supported.
+
+    Attributes:
+        path (Path): Path to the shared library
+        timeout (float): Timeout for each call in seconds (None for no timeout)
+        resources (ResourceLimit): Resource limits applied to the forked children
+          (None for no limits) - the memory limit includes the test session's address space
+        library (ctypes.CDLL): The loaded library
+    """
+
+    def __init__(self, path: Union[Path, str], timeout: Union[float, None] = None,
+                 resources: Union[ResourceLimit, None] = None):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.resources = resources
+        self.library = ctypes.CDLL(str(self.path.resolve()))
+
+    def function(self, name: str, restype: Any = ctypes.c_int,
+                 argtypes: Union[Sequence[Any], None] = None) -> CFunction:
+        """Return a function from the library
+
+        Args:
+            name: The C function name
+            restype: The ctypes return type (None for void)
+            argtypes: The ctypes argument types if they are to be checked and converted
+
+        Raises:
+            AttributeError: If the library does not define the function
+        """
+        function = getattr(self.library, name)
+        function.restype = restype
+        if argtypes is not None:
+            function.argtypes = list(argtypes)
+        return CFunction(self, name, function)
+
+    def __getattr__(self, name: str) -> CFunction:
+        """Return a function returning int with unchecked arguments"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.function(name)
+
+    def read(self, read_fd: int):
+        """Read all the records from a child until it closes read_fd
+
+        Each record must arrive within the timeout of the previous one.
+
+        Returns:
+            Tuple of the data read and whether it timed out
+        """
+        chunks = []
+        with os.fdopen(read_fd, "rb", buffering=0) as pipe:
+            deadline = None if self.timeout is None else time.monotonic() + self.timeout
+            while True:
+                wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+                ready, _, _ = select.select([pipe], [], [], wait)
+                if not ready:
+                    return b"".join(chunks), True
+                chunk = pipe.read(65536)
+                if not chunk:
+                    return b"".join(chunks), False
+                chunks.append(chunk)
+                if deadline is not None:
+                    deadline = time.monotonic() + self.timeout
+
+    @staticmethod
+    def describe_status(status: int) -> str:
+        """Describe a child wait status"""
+        if os.WIFSIGNALED(status):
+            return f"signal {signal.Signals(os.WTERMSIG(status)).name}"
+        return f"exit status {os.WEXITSTATUS(status)}"
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Main routine for benchmark command"""
+import argparse
+import subprocess
+import tempfile
+import pyam.cohort as cohortlib
+from pyam.config import CONFIG
+from pyam.cmd.args import add_common_args
+from pyam.fixtures.vhdl import (SIMULATORS, VHDLError, VHDLTestFile, get_simulator,
+                                simulate_testbench)
+
+
+def main(args=None):
+    """Compare the VHDL simulators on the cohort VHDL testbenches
+
+    Each VHDL test file is analysed, elaborated and run for each of its
+    PYAM_TEST_VALUEs by each simulator against the files of the given students
+    (default the solution student) and the times taken for each stage are
+    printed. The total time for each simulator is then printed over only the
+    testbenches which passed on every simulator, so that a simulator is not
+    favoured by failing early, followed by the number of failures of each.
+    Use the fastest for the cohort by setting vhdl.simulator in the configuration.
+    """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_args(parser)
+        args = parser.parse_args()
+    cohort = cohortlib.get_cohort(args.cohort)
+    simulators = []
+    for name in args.simulators:
+        try:
+            simulators.append(get_simulator(name))
+        except FileNotFoundError:
+            print(f"{name} not found")
+    if args.students:
+        students = cohort.students(args.students)
+    elif cohort.get("solution.username", None):
+        students = [cohort.students(cohort.get("solution.username"))]
+    else:
+        print("No students given and no solution.username configured")
+        return
+    testbenches = []
+    for path in sorted(cohort.test_path.glob("test_*.vhd")):
+        text = path.read_text(encoding="ascii")
+        if VHDLTestFile.RE_TEST.search(text):
+            testbenches.append((path, VHDLTestFile.parse(text)))
+    CONFIG.build_path.mkdir(parents=True, exist_ok=True)
+    totals = {simulator.name: 0.0 for simulator in simulators}
+    failures = {simulator.name: 0 for simulator in simulators}
+    compared = 0
+    for student in students:
+        print(student.name())
+        for path, options in testbenches:
+            files = [path.with_name(filename) for filename in options.get("test_depends", ())
+                     if filename] + [path]
+            for glob in options["test_globs"]:
+                if glob:
+                    files += sorted(student.path.glob(glob))[:1]
+            durations = {}
+            for simulator in simulators:
+                with tempfile.TemporaryDirectory(dir=CONFIG.build_path) as workdir:
+                    try:
+                        times = simulate_testbench(simulator, path, files, workdir,
+                                                   options["test_values"],
+                                                   options.get("test_timeout"))
+                    except (VHDLError, subprocess.TimeoutExpired) as err:
+                        failures[simulator.name] += 1
+                        print(f"  {path.stem:30} {simulator.name:6} failed: "
+                              f"{str(err).splitlines()[0] if str(err) else type(err).__name__}")
+                        continue
+                durations[simulator.name] = sum(times.values())
+                print(f"  {path.stem:30} {simulator.name:6} "
+                      + " ".join(f"{stage} {duration:7.2f}s" for stage, duration in times.items())
+                      + f" total {durations[simulator.name]:7.2f}s")
+            if len(durations) == len(simulators):
+                compared += 1
+                for name, duration in durations.items():
+                    totals[name] += duration
+    print(f"Totals over {compared} testbenches passing on all simulators")
+    for name, total in sorted(totals.items(), key=lambda entry: entry[1]):
+        print(f"{name:6} {total:8.2f}s {failures[name]:4} failed")
+
+
+def add_args(parser=argparse.ArgumentParser(description=__doc__)):
+    """Add args for this command"""
+    add_common_args(parser, ["cohort", "students"])
+    parser.add_argument(
+        '--simulators',
+        nargs="+",
+        choices=list(SIMULATORS),
+        default=list(SIMULATORS),
+        help="Simulators to compare (default all)")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from openpyxl.utils import quote_sheetname, absolute_coordinate
 from pyam.config import CONFIG
 from pyam.cmd.args import add_common_args
 from pyam.cohort import get_cohort
+from pyam.results import ResultsDB
 import re
 
 def to_defined_name(nodeid: str) -> str:
@@ -30,7 +31,8 @@ def main(args=None):
     Starts from specified template or template_template.xlsx
     and adds in a row per test with the description, a named cell to filled in
     as PASSED or FAILED from the students reports and a mark as per the test
-    manifest.
+    manifest. With --from-db only tests with results in the cohort results
+    database are included.
 
     The following Global defined names are used in template
 
@@ -79,7 +81,15 @@ def main(args=None):
     column=start_cell.column_letter
     row=0
     mapping=cohort.get("template.mapping",{})
-    items=cohort.tests().items()
+    if args.from_db:
+        # only tests with results, in the order they were run
+        database=ResultsDB.for_cohort(cohort)
+        manifest=cohort.get("tests", {})
+        tests={nodeid: manifest.get(nodeid, {}) for nodeid in database.nodeids()}
+        database.close()
+    else:
+        tests=cohort.tests()
+    items=tests.items()
     if args.sorted:
         items=sorted(items,key=lambda a: a[1].get("description",a[0]))
     for test, details in items:
@@ -109,6 +119,11 @@ def add_args(parser=argparse.ArgumentParser(description=__doc__)):
         action="store_true",
         help="If set items will be in sorted order"
     )
+    parser.add_argument(
+        "--from-db",
+        action="store_true",
+        help="Use the tests found in the cohort results database rather than collecting them"
+    )
 
 
 
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Main routine for lint command"""
+import argparse
+import shutil
+import pyam.cohort as cohortlib
+from pyam.cmd.args import add_common_args
+from pyam.lint import lint_cohort, CLANG_TIDY
+
+
+def main(args=None):
+    """Lint student C files with clang-tidy in parallel for specified cohort and students
+
+    The files are those matching C test files with a PYAM_LINT definition. Results
+    are stored in the cohort lint cache, from which the lint tests read them, so
+    only files changed since they were last linted are linted again. The run
+    command does this before running the tests.
+    """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_args(parser)
+        args = parser.parse_args()
+    if not shutil.which(CLANG_TIDY):
+        print(f"{CLANG_TIDY} not found")
+        return
+    cohort = cohortlib.get_cohort(args.cohort)
+    students = [student for student in cohort.students(args.students) if student.path.exists()]
+    count = lint_cohort(cohort, students, args.jobs or None)
+    print(f"Linted {count} files")
+
+
+def add_args(parser=argparse.ArgumentParser(description=__doc__)):
+    """Add args for this command"""
+    add_common_args(parser, ["cohort", "students"])
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=0,
+        help="Number of files to lint in parallel (default one per CPU)")
+
+
+if __name__ == "__main__":
+    main()
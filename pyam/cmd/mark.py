@@ -12,6 +12,7 @@ from pyam.cohort import get_cohort
 from pyam.cmd.args import add_common_args
 from pyam.cmd.generate_template import to_defined_name
 from pyam.files import PathGlob
+from pyam.results import results_path, read_results, outcomes, ResultsDB
 
 def main(args=None):
     """Generate mark spreadsheets for each student
@@ -19,7 +20,9 @@ def main(args=None):
     Reads in test reports and a template spreadsheet.
     Creates a mark spreadsheet for each student from template
     with the cells named by the test ids set to PASSED or FAILED
-    based on the report.
+    based on the structured results saved with the report (or the
+    report itself if there are none). With --from-db the latest results
+    for each student are taken from the cohort results database instead.
 
     Completes the following additional defined names in the template for
     each student:
@@ -48,8 +51,10 @@ def main(args=None):
     cohort.start_log_section(f"Generating mark sheets from {args.template.name}")
     students = cohort.students(args.students)
     reports = get_reports(cohort, students, args.reports, args.prefix )
+    database = ResultsDB.for_cohort(cohort) if args.from_db else None
     for student, report in reports.items():
-        fill_workbook(template, student, report)
+        found = database.outcomes(student.username) if database else None
+        fill_workbook(template, student, report, found)
         report_path = cohort.report_path / f"{args.prefix}_{student.username}.xlsx"
         if not (args.overwrite) and report_path.exists():
             raise FileExistsError(report_path)
@@ -83,8 +88,11 @@ def get_reports(cohort, students, paths, prefix) -> dict:
     return reports
 
 
-def fill_workbook(template, student, report):
-    """Fill in workbook 0 of template with student and report details"""
+def fill_workbook(template, student, report, found=None):
+    """Fill in workbook 0 of template with student and report details
+
+    If given found is a dictionary of test outcomes to use instead of those
+    from the report."""
     def set_field(name,value, required=True):
         try:
             for title, coord in template.defined_names[name].destinations:
@@ -109,11 +117,33 @@ def fill_workbook(template, student, report):
         set_field("student_course",course)
     tests=cohort.tests()
     mapping=cohort.get("template.mapping")
-    for key, value in analyse_report(report, tests,
-                                     cohort.log).items():
+    if found is not None:
+        results = analyse_outcomes(found, tests, cohort.log, report.name)
+    elif results_path(report).exists():
+        results = analyse_results(results_path(report), tests, cohort.log)
+    else:
+        results = analyse_report(report, tests, cohort.log)
+    for key, value in results.items():
         value=tests[key].get("mapping",mapping).get(value,"UNKNOWN")
         set_field(tests[key].get("cell",to_defined_name(key)), value)
 
+def analyse_results(path: Path, tests: dict, log=None):
+    """Returns a dictionary of results from a structured results file at path"""
+    return analyse_outcomes(outcomes(read_results(path)), tests, log, path.name)
+
+
+def analyse_outcomes(found: dict, tests: dict, log=None, name=""):
+    """Returns a dictionary of results for tests from dictionary of found outcomes"""
+    results = {test: found[test] for test in tests.keys() if test in found}
+    if log:
+        #check we have all expected results
+        for test in tests.keys():
+            if test not in results:
+                results[test] = "Unknown"
+                log.warning("Missing test result %s in '%s'", test, name)
+    return results
+
+
 def analyse_report(report_path: Path, tests: dict, log=None):
     """Returns a dictionary of results from a report file at path"""
     results = {}
@@ -160,6 +190,10 @@ def add_args(parser=argparse.ArgumentParser(description=__doc__)):
         default=None,
         help="list of workbooks files to be processed. "
         "Defaults to those in report directory with matching prefix")
+    parser.add_argument(
+        '--from-db',
+        action="store_true",
+        help="Take test results from the cohort results database")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Main routine for merge command"""
+
+import argparse
+import json
+import re
+import shutil
+from typing import List
+from pyam.cohort import get_cohort
+from pyam.cmd.args import add_common_args
+from pyam.cache import ResultCache
+from pyam.results import ResultsDB, read_results
+
+_LOG_RECORD_RE = re.compile(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d: ")
+
+
+def main(args=None):
+    """Merge the outputs of sharded runs into the cohort reports folder.
+
+    Moves the reports, results and any other outputs from each
+    shard-K-of-N subdirectory of the reports folder (see run --shard)
+    into the reports folder, adds the results to the cohort results
+    database and the cached report keys to the result cache, and
+    appends the shard logs to the cohort log in time order. The shard
+    subdirectories are then removed.
+    """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_args(parser)
+        args = parser.parse_args()
+    cohort = get_cohort(args.cohort)
+    shards = sorted(path for path in cohort.report_path.glob("shard-*-of-*") if path.is_dir())
+    if not shards:
+        print(f"No shards to merge in {cohort.report_path}")
+        return
+    database = ResultsDB.for_cohort(cohort)
+    cache = ResultCache(cohort)
+    records = []
+    for shard in shards:
+        log_path = shard / "info.log"
+        if log_path.exists():
+            # refer to outputs by their merged locations
+            records += log_records(log_path.read_text().replace(f"{shard.name}/", ""))
+            log_path.unlink()
+        cache_path = shard / "cache.json"
+        if cache_path.exists():
+            with open(cache_path, "r") as fid:
+                cache.update(json.load(fid))
+            cache_path.unlink()
+        for path in sorted(shard.iterdir()):
+            destination = cohort.report_path / path.name
+            if path.is_dir():
+                shutil.copytree(path, destination, dirs_exist_ok=True)
+                shutil.rmtree(path)
+            else:
+                path.replace(destination)
+                if destination.suffix == ".json":
+                    database.add(read_results(destination))
+        shard.rmdir()
+        print(f"Merged {shard.name}")
+    database.close()
+    # records start with time so a stable sort interleaves them in time order
+    records.sort(key=lambda record: record[:19])
+    for handler in cohort.log.handlers:
+        handler.flush()
+    with open(cohort.report_path / "info.log", "a") as fid:
+        fid.writelines(records)
+    cohort.start_log_section(f"Merged {len(shards)} shards")
+
+
+def log_records(text: str) -> List[str]:
+    """Split log text into records - each starting with a time stamp line"""
+    records = []
+    for line in text.splitlines(keepends=True):
+        if _LOG_RECORD_RE.match(line) or not records:
+            records.append(line)
+        else:
+            records[-1] += line
+    return records
+
+
+def add_args(parser=argparse.ArgumentParser(description=__doc__)):
+    """Add args for this command"""
+    add_common_args(parser, ["cohort"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Main routine for results command"""
+
+import argparse
+from pathlib import Path
+from pyam.cohort import get_cohort
+from pyam.cmd.args import add_common_args
+from pyam.results import ResultsDB, read_results
+
+
+def main(args=None):
+    """Query the cohort results database.
+
+    With no options print the pass rate for each test over the latest run of
+    every student. Results files written by earlier runs may be added to the
+    database using --import.
+    """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_args(parser)
+        args = parser.parse_args()
+    cohort = get_cohort(args.cohort)
+    database = ResultsDB.for_cohort(cohort)
+    if args.import_files is not None:
+        paths = args.import_files or sorted(
+            cohort.report_path.glob(f"{args.prefix or cohort.get('template.prefix')}_*.json"))
+        for path in paths:
+            database.add(read_results(path))
+            print(f"Imported {path.name}")
+    elif args.test:
+        for username in database.students(args.test, args.outcome):
+            print(cohort.students(username).name())
+    elif args.runs:
+        usernames = [s.username for s in cohort.students(args.students)] if args.students else [None]
+        for username in usernames:
+            for student, created, exitstatus, duration in database.runs(username):
+                print(f"{student:10} | {created:20} | exit {exitstatus} | {duration:8.1f}s")
+    elif args.resources is not None:
+        for student, nodeid, cpu in database.resource_usage(args.resources or None):
+            print(f"{student:10} | {nodeid:60} | {cpu:8.2f}s")
+    elif args.students:
+        for student in cohort.students(args.students):
+            print(student.name())
+            for nodeid, outcome in database.outcomes(student.username).items():
+                print(f"    {nodeid:60} {outcome}")
+    else:
+        for nodeid, passed, total in database.pass_rates():
+            print(f"{nodeid:60} {passed:4}/{total:<4} {100*passed/total:5.1f}%")
+    database.close()
+
+
+def add_args(parser=argparse.ArgumentParser(description=__doc__)):
+    """Add args for this command"""
+    add_common_args(parser, ["cohort", "students", "prefix"])
+    parser.add_argument(
+        '--test',
+        help="List students whose latest result for this test nodeid has given outcome")
+    parser.add_argument(
+        '--outcome',
+        default="failed",
+        choices=("passed", "failed", "skipped"),
+        help="Outcome to match with --test. Default is failed")
+    parser.add_argument(
+        '--runs',
+        action="store_true",
+        help="List run history (for given students or all)")
+    parser.add_argument(
+        '--resources',
+        nargs="?",
+        type=int,
+        const=0,
+        default=None,
+        help="List tests in latest runs by CPU time used by student programs "
+        "- optionally only the given number")
+    parser.add_argument(
+        '--import',
+        dest="import_files",
+        nargs="*",
+        type=Path,
+        default=None,
+        help="Add results files to database. "
+        "Defaults to those in report directory with matching prefix")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,45 @@
 """Main routine for run command"""
 import argparse
 import datetime
+import os
+import shutil
+import sqlite3
+from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pyam.cohort as cohortlib
 from pyam.config import CONFIG
 from pyam.cmd.args import add_common_args
-from pyam.run_pytest import run_pytest
+from pyam.cache import ResultCache
+from pyam.files import write_atomic
+from pyam.results import results_path, artifacts_path, read_results, sum_stats, ResultsDB
+from pyam.run_pytest import run_pytest, PytestPool
+from pyam.schedule import longest_first, Progress
+from pyam.lint import lint_cohort
+from pyam.timeouts import TimeoutCalibration, calibrate
 
 
 def main(args=None):
     """Run the test suite for specified cohort and students
 
-    Generates the test reports for each student in the reports folder.
+    Generates the test reports and structured json results for each student
+    in the reports folder and adds the results to the cohort results database.
+    Test artifacts (e.g. waveforms of failed simulations) are stored in the
+    artifacts subdirectory of the reports folder.
+    Students may be tested in parallel using the --jobs option and, on POSIX
+    systems, in sessions forked from a warm worker pool using the --warm option.
+    Students are started in order of the duration of their previous run, longest
+    first, and progress with an estimated time remaining is printed as each completes.
+    If timeout.calibrate is set the solution student is tested first, when the tests
+    or solution have changed, to calibrate shorter test timeouts for the others.
+
+    With --overwrite only students whose submission, tests or configuration have
+    changed since their report was generated are tested again, unless --no-cache is given.
+
+    With --shard K/N only the K'th of N disjoint slices of the students (by
+    student hash) are tested and the outputs are written to a shard-K-of-N
+    subdirectory of the reports folder, so that several machines sharing the
+    cohort directories may each run a shard. Use the merge command
+    afterwards to combine the shard outputs into the reports folder.
     """
     # pylint: disable=W1510
     #Ensure pyam is in Python search path
@@ -22,9 +51,125 @@ def main(args=None):
         add_args(parser)
         args = parser.parse_args()
     cohort = cohortlib.get_cohort(args.cohort)
-    cohort.start_log_section(
-        f"Running tests {args.test} for {args.students or 'all'}")
     students = cohort.students(args.students)
+    output_path = cohort.report_path
+    if args.shard:
+        index, count = args.shard
+        output_path = cohort.report_path / shard_name(index, count)
+        output_path.mkdir(exist_ok=True)
+        cohort.set_log_file(output_path / "info.log")
+        students = [student for student in students if student.hash() % count == index - 1]
+    cohort.start_log_section(
+        f"Running tests {args.test} for {args.students or 'all'}"\
+        + (f" shard {args.shard[0]}/{args.shard[1]}" if args.shard else ""))
+    extras = []
+    if args.mark:
+        extras += ['-m', args.mark]
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(cohort, journal=output_path / "cache.json" if args.shard else None)
+    reports, keys = select_reports(cohort, students, args, output_path, cache, extras)
+    # shards only read the database as SQLite is unsafe on shared filesystems
+    try:
+        history = ResultsDB.for_cohort(cohort, readonly=bool(args.shard))
+        durations = history.durations()
+        history.close()
+    except sqlite3.OperationalError:  # no database yet
+        durations = {}
+    order, estimates = longest_first(
+        reports, {student: durations.get(student.username) for student in reports})
+    jobs = args.jobs or os.cpu_count()
+    # lint files for all students in one parallel batch before the sessions read the results
+    lint_cohort(cohort, list(reports), jobs)
+    if args.warm and not hasattr(os, "fork"):
+        CONFIG.log.warning("--warm is not supported on this platform.")
+        args.warm = False
+    if args.warm:
+        executor = PytestPool(cohort, max_workers=jobs)
+        submit = executor.run_pytest
+    else:
+        # Each job is a pytest subprocess so threads are sufficient to keep
+        # all workers busy.
+        executor = ThreadPoolExecutor(max_workers=jobs)
+        submit = lambda *pytest_args: executor.submit(run_pytest, cohort, *pytest_args)
+    # Reports, log entries and results are only written from this thread as each job completes.
+    # Shards are merged into the database by the merge command
+    database = None if args.shard else ResultsDB.for_cohort(cohort)
+    progress = Progress(estimates, jobs)
+    completed = []
+
+    def complete(student, result):
+        """Write the report and results of a completed student run"""
+        write_report(cohort, student, reports[student], result)
+        results = None
+        if results_path(reports[student]).exists():
+            results = read_results(results_path(reports[student]))
+            completed.append(results)
+            if database:
+                database.add(results)
+        if cache:
+            cache.store(student, keys[student], reports[student], result.returncode)
+        print(progress.done(student, results["duration"] if results else None))
+        return results
+
+    with executor:
+        for report_path in reports.values():
+            results_path(report_path).unlink(missing_ok=True)
+            shutil.rmtree(artifacts_path(report_path), ignore_errors=True)
+        # the solution is run on its own first to calibrate the timeouts for the others
+        calibration = TimeoutCalibration(cohort)
+        if reports and calibration.required():
+            solution = calibration.solution()
+            if solution in reports:
+                order.remove(solution)
+                results = complete(
+                    solution, submit(*report_args(solution, reports[solution], extras)).result())
+                if results:
+                    calibration.calibrate(results)
+            else:
+                calibrate(cohort, *extras)
+        futures = {
+            submit(*report_args(student, reports[student], extras)): student
+            for student in order
+        }
+        for future in as_completed(futures):
+            complete(futures[future], future.result())
+    if database:
+        database.close()
+    stats = sum_stats(completed).get("compile_cache")
+    if stats:
+        print(f"Compile cache: {stats['hits']} hits, {stats['misses']} misses")
+        cohort.log.info("Compile cache: %d hits, %d misses.", stats["hits"], stats["misses"])
+
+
+def shard_name(index: int, count: int) -> str:
+    """Return name of output subdirectory for a shard"""
+    return f"shard-{index}-of-{count}"
+
+
+def shard_spec(spec: str) -> Tuple[int, int]:
+    """Parse a shard specification K/N into a tuple (K, N)"""
+    try:
+        index, count = (int(value) for value in spec.split("/"))
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}' - use K/N") from err
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}' - need 1 <= K <= N")
+    return (index, count)
+
+
+def select_reports(cohort, students, args, output_path, cache=None, extras=()):
+    """Select the students to be tested and the paths their reports are to be written to
+
+    Students without a submission are skipped, as are those with an existing
+    report unless args.overwrite is set (or always if args.new_only is
+    set), and those whose report is a cache hit.
+
+    Returns:
+        A tuple of dictionaries of report paths and cache keys indexed by student
+    """
+    keys = {}
+    reports = {}
     for student in students:
         if not student.path.exists():
             cohort.log.warning("No Submission Folder: '%s'.", student.name())
@@ -34,35 +179,52 @@ def main(args=None):
             if args.new_only:
                 continue
             if not args.overwrite:
-                cohort.log.warning("Using Existing Report for '%s' - '%s'.", 
+                cohort.log.warning("Using Existing Report for '%s' - '%s'.",
                                 student.name(), report_path.relative_to(CONFIG.root_path))
                 CONFIG.log.warning("Use --overwrite option to overwrite report.")
                 continue
-        extras = []
-        if args.mark:
-            extras += ['-m', args.mark]
-        result = run_pytest(
-            cohort,
-            '--no-header',
-            '-rA',
-            '--tb=short',
-            '-v',
-            *extras,
-            '--student',
-            student.username,
-        )
-        with open(report_path, "w") as fid:
-            fid.write(f"Report generated {datetime.datetime.now().strftime('%Y/%m/%d %H:%M')}"\
-                      + f" for {student.name()} by {cohort.get('assessor.name')}\n")
-            fid.write(result.stdout)
-        if result.returncode == 0:
-            cohort.log.info("Passed all tests : '%s' - report '%s'.",
-                            student.name(),
-                            report_path.relative_to(CONFIG.root_path))
-        else:
-            cohort.log.warning("Failed test: '%s' - report '%s'.",
-                               student.name(),
-                               report_path.relative_to(CONFIG.root_path))
+        if cache:
+            keys[student] = cache.key(student, extras)
+            if cache.hit(student, keys[student], report_path):
+                cohort.log.info("Unchanged submission: '%s' - reusing report '%s'.",
+                                student.name(), report_path.relative_to(CONFIG.root_path))
+                continue
+        reports[student] = output_path / report_path.name
+    return reports, keys
+
+
+REPORT_OPTIONS = ('--no-header', '-rA', '--tb=short', '-v')
+
+
+def report_args(student, report_path, extras=()):
+    """Return the pytest arguments to generate the report (structured results and artifacts)
+    for a student"""
+    return (
+        *REPORT_OPTIONS,
+        *extras,
+        '--results',
+        str(results_path(report_path)),
+        '--artifacts',
+        str(artifacts_path(report_path)),
+        '--student',
+        student.username,
+    )
+
+
+def write_report(cohort, student, report_path, result):
+    """Write the report for a completed test run and log its outcome"""
+    write_atomic(report_path,
+                 f"Report generated {datetime.datetime.now().strftime('%Y/%m/%d %H:%M')}"\
+                 + f" for {student.name()} by {cohort.get('assessor.name')}\n"
+                 + result.stdout)
+    if result.returncode == 0:
+        cohort.log.info("Passed all tests : '%s' - report '%s'.",
+                        student.name(),
+                        report_path.relative_to(CONFIG.root_path))
+    else:
+        cohort.log.warning("Failed test: '%s' - report '%s'.",
+                           student.name(),
+                           report_path.relative_to(CONFIG.root_path))
 
 
 def add_args(parser):
@@ -84,6 +246,25 @@ def add_args(parser):
         help=
         "Selected mark tests when testing e.g. 'no slow' to not run slow tests"
     )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help="Number of students to test in parallel (0 for one per CPU)")
+    parser.add_argument(
+        '--warm',
+        action="store_true",
+        help="Run each student in a session forked from a warm pytest worker pool (POSIX only)")
+    parser.add_argument(
+        '--no-cache',
+        action="store_true",
+        help="Test students again even if their submission and the tests are unchanged")
+    parser.add_argument(
+        '--shard',
+        type=shard_spec,
+        default=None,
+        help="Only test shard K of N (K/N) of the students, writing to a shard subdirectory")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Main routine for serve command"""
+import argparse
+import shutil
+import subprocess
+import json
+import pyam.cohort as cohortlib
+from pyam.cmd.args import add_common_args
+from pyam.cmd.run import select_reports, write_report, REPORT_OPTIONS
+from pyam.cache import ResultCache
+from pyam.files import write_atomic
+from pyam.results import (results_path, artifacts_path, combine_results, ResultsDB,
+                          NO_TESTS_COLLECTED)
+from pyam.schedule import longest_first, Progress
+from pyam.workqueue import WorkQueueServer, DEFAULT_ADDRESS
+from pyam.timeouts import calibrate
+
+
+def main(args=None):
+    """Serve the tests for specified cohort and students to worker processes
+
+    Each (student, test file) pair is a work unit which is leased to the
+    next worker (see the worker command) to request one, so that slow
+    students or tests do not hold up the others. Units are served in order of
+    their durations in previous runs, longest first. Units leased to workers which
+    disconnect before returning a result are given to another worker. When all
+    the units for a student are completed their report and structured results
+    are written to the reports folder as by the run command. Test artifacts are
+    written by the workers into the artifacts subdirectory of the reports folder.
+
+    If timeout.calibrate is set the solution student is first tested locally, when
+    the tests or solution have changed, to calibrate shorter test timeouts for the others.
+
+    Workers must share the cohort directories (e.g. run on the same machine).
+    """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_args(parser)
+        args = parser.parse_args()
+    cohort = cohortlib.get_cohort(args.cohort)
+    students = cohort.students(args.students)
+    cohort.start_log_section(f"Serving tests for {args.students or 'all'} on {args.address}")
+    extras = []
+    if args.mark:
+        extras += ['-m', args.mark]
+    cache = None if args.no_cache else ResultCache(cohort)
+    reports, keys = select_reports(cohort, students, args, cohort.report_path, cache, extras)
+    paths = list(dict.fromkeys(nodeid.split("::")[0] for nodeid in cohort.tests()))
+    students = {student.username: student for student in reports}
+    units = [(username, path) for username in students for path in paths]
+    if not units:
+        print("Nothing to test")
+        return
+    if calibrate(cohort, *REPORT_OPTIONS, *extras):
+        print("Calibrated timeouts from the solution student")
+    parts = {username: {} for username in students}
+    # artifacts are written by the workers directly into the (shared) reports folder
+    student_args = {}
+    for username, student in students.items():
+        shutil.rmtree(artifacts_path(reports[student]), ignore_errors=True)
+        student_args[username] = ["--artifacts", str(artifacts_path(reports[student]))]
+    database = ResultsDB.for_cohort(cohort)
+    durations = {}
+    for (username, nodeid), duration in database.test_durations().items():
+        unit = (username, nodeid.split("::")[0])
+        durations[unit] = durations.get(unit, 0.0) + duration
+    units, estimates = longest_first(units, durations)
+    progress = Progress(estimates)
+    with WorkQueueServer(cohort, units, args.address, [*REPORT_OPTIONS, *extras],
+                         student_args) as server:
+        print(f"Serving {len(units)} units on {args.address}")
+        for unit, result in server.results():
+            username, path = unit
+            parts[username][path] = result
+            progress.jobs = max(1, server.workers)
+            print(progress.done(unit, result["results"]["duration"] if result["results"] else None))
+            if len(parts[username]) < len(paths):
+                continue
+            student = students[username]
+            report_path = reports[student]
+            outputs = [parts[username][path] for path in paths]
+            returncodes = [output["returncode"] for output in outputs
+                           if output["returncode"] != NO_TESTS_COLLECTED]
+            result = subprocess.CompletedProcess(
+                args=paths,
+                returncode=max(returncodes, default=NO_TESTS_COLLECTED),
+                stdout="\n".join(output["stdout"] for output in outputs))
+            write_report(cohort, student, report_path, result)
+            structured = [output["results"] for output in outputs if output["results"]]
+            if structured:
+                combined = combine_results(structured)
+                write_atomic(results_path(report_path), json.dumps(combined, indent=2))
+                database.add(combined)
+            else:
+                results_path(report_path).unlink(missing_ok=True)
+            if cache:
+                cache.store(student, keys[student], report_path, result.returncode)
+            del parts[username]
+    database.close()
+
+
+def add_args(parser=argparse.ArgumentParser(description=__doc__)):
+    """Add args for this command"""
+    add_common_args(parser)
+    parser.add_argument(
+        '--address',
+        default=DEFAULT_ADDRESS,
+        help=f"host:port or Unix socket path to listen on. Default is {DEFAULT_ADDRESS}")
+    parser.add_argument(
+        '--new_only',
+        action="store_true",
+        help="If set then only run tests for those student for whom there are no reports")
+    parser.add_argument(
+        '-m',
+        '--mark',
+        help="Selected mark tests when testing e.g. 'no slow' to not run slow tests")
+    parser.add_argument(
+        '--no-cache',
+        action="store_true",
+        help="Test students again even if their submission and the tests are unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Main routine for worker command"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pyam.config import CONFIG
+from pyam.workqueue import run_worker, DEFAULT_ADDRESS
+
+
+def main(args=None):
+    """Run tests served by the serve command until its queue is finished
+
+    Each worker repeatedly takes a unit from the server, runs it with the
+    cohort fixtures and returns the results. Several workers may be run,
+    either as separate processes or using the --jobs option.
+    """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_args(parser)
+        args = parser.parse_args()
+
+    def work(_):
+        try:
+            return run_worker(args.address)
+        except (ConnectionError, FileNotFoundError) as err:
+            CONFIG.log.warning("Worker stopped: %s", err)
+            return 0
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        count = sum(executor.map(work, range(args.jobs)))
+    print(f"Completed {count} units")
+
+
+def add_args(parser=argparse.ArgumentParser(description=__doc__)):
+    """Add args for this command"""
+    parser.add_argument(
+        '--address',
+        default=DEFAULT_ADDRESS,
+        help=f"host:port or Unix socket path of server. Default is {DEFAULT_ADDRESS}")
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        help="Number of units to run in parallel")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,13 @@ import openpyxl
 from pyam.cohort import get_cohort
 from pyam.cmd.args import add_common_args
 from pyam.files import set_csv_column, PathGlob
+from pyam.results import ResultsDB
 
 def main(args=None):
-    """Read marks from a set of mark spreadsheets and write them into csv files"""
+    """Read marks from a set of mark spreadsheets and write them into csv files
+
+    With --from-results marks are instead calculated directly from the cohort
+    results database as the total of the manifest marks for each passed test."""
     if args is None:
         parser = argparse.ArgumentParser(description=__doc__)
         add_args(parser)
@@ -16,7 +20,11 @@ def main(args=None):
     cohort = get_cohort(args.cohort)
     students = cohort.students(args.students)
     cohort.start_log_section(f"Collating marks into csv files")
-    marks = get_marks(cohort, students, args.prefix, args.mark_sheets)
+    prefix = args.prefix or cohort.get("template.prefix")
+    if args.from_results:
+        marks = get_marks_from_results(cohort, students)
+    else:
+        marks = get_marks(cohort, students, prefix, args.mark_sheets)
 
     def get_value(student_id):
         match = None
@@ -80,6 +88,26 @@ def get_marks(cohort, students, prefix, paths) -> dict:
     return marks
 
 
+def get_marks_from_results(cohort, students) -> dict:
+    """Calculate marks for a set of students from the cohort results database
+
+    The mark is the sum of the "mark" values in the cohort tests manifest for
+    the tests each student passed in their latest run. Will warn if there are missing results."""
+    tests = cohort.tests()
+    database = ResultsDB.for_cohort(cohort)
+    marks = {}
+    for student in students:
+        found = database.outcomes(student.username)
+        if not found:
+            cohort.log.warning("No results found for %s", student.name())
+            continue
+        marks[student] = sum(
+            float(tests.get(nodeid, {}).get("mark", 0))
+            for nodeid, outcome in found.items() if outcome == "PASSED")
+    database.close()
+    return marks
+
+
 def write_mark_csv(filename, marks):
     """Write out student marks to a new csv file"""
     with open(filename, 'w', newline='') as csvfile:
@@ -116,3 +144,7 @@ def add_args(parser=argparse.ArgumentParser(description=__doc__)):
         help="Name of column in csv file where marks are to be written.")
     parser.add_argument('--student-col',
                         help="Name of student id column in CSV files")
+    parser.add_argument(
+        '--from-results',
+        action="store_true",
+        help="Calculate marks from the cohort results database instead of mark sheets")
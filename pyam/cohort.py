@@ -32,6 +32,7 @@ import pyam.config_manager as config
 from pyam.config import CONFIG
 from pyam.files import read_csv
 from pyam.run_pytest import run_pytest
+from pyam.cache import CollectionCache
 
 
 def current_academic_year() -> str:
@@ -66,6 +67,7 @@ class Cohort(config.ConfigManager):
       path (Path): The Path to this cohort
       test_path (Path): The Path to the tests for this cohort
       report_path (Path) : The Path to report directory for this cohort
+      cache_path (Path) : The Path to directory for cached (regenerable) data for this cohort
       log (logging.Logger): The Logger for cohort.
     """
 
@@ -75,24 +77,30 @@ class Cohort(config.ConfigManager):
         self.test_path: Path = CONFIG.tests_path / name
         self.report_path: Path = CONFIG.reports_path / name
         self.report_path.mkdir(exist_ok=True)
+        self.cache_path: Path = CONFIG.build_path / "cache" / name
         super().__init__(self.path / "manifest.json", "cohort")
         self.log: logging.Logger = logging.getLogger("cohort")
-        self.log.handlers.clear()
-        handler = logging.FileHandler(filename=self.report_path / "info.log",
-                                      mode="a")
-        handler.setFormatter(
-            logging.Formatter('%(asctime)s: %(levelname)-8s: %(message)s',
-                              '%Y-%m-%d %H:%M:%S'))
-        self.log.addHandler(handler)
+        self.set_log_file(self.report_path / "info.log")
         if not self.path.exists():
             raise FileNotFoundError(self.path)
         for path in (self.test_path, self.report_path):
             path.mkdir(exist_ok=True)
+        self.cache_path.mkdir(parents=True, exist_ok=True)
         student_list = []
         for rec in read_csv(self.path / "students.csv",
                             self.student_columns()):
             student_list.append(Student(self, rec))
         self._students: 'tuple[Student]' = tuple(student_list)
+        self._nodeids: 'Union[List[str], None]' = None
+
+    def set_log_file(self, path: Path) -> None:
+        """Direct the cohort log to the file at path (appending to it)"""
+        self.log.handlers.clear()
+        handler = logging.FileHandler(filename=path, mode="a")
+        handler.setFormatter(
+            logging.Formatter('%(asctime)s: %(levelname)-8s: %(message)s',
+                              '%Y-%m-%d %H:%M:%S'))
+        self.log.addHandler(handler)
 
     def student_columns(self) -> List[tuple]:
         """Return a list of student column information for this cohort configuration
@@ -149,6 +157,8 @@ class Cohort(config.ConfigManager):
         If a manifest.json is provided in the test directory then this is the "tests"
         value from that file. Otherwise the nodeids are collected by pytest and the values
         fields are empty dictionaies. Future implementations may use the values.
+        Collected nodeids are cached on disk until the test files or fixtures configuration
+        change and memoized for the lifetime of this cohort.
 
         Returns:
           A dictionary of tests for this cohort indexed by pytest nodeids.
@@ -157,17 +167,32 @@ class Cohort(config.ConfigManager):
           and "mark" to provide a numerical mark for this test in the generated template.
         """
         #Load manifest data if present
-        tests=self.get("tests", {})
+        tests = dict(self.get("tests", {}))
         #Ensure all tests are included by collecting from pytest
+        if self._nodeids is None:
+            self._nodeids = CollectionCache(self).nodeids(self.collect_tests)
+        for nodeid in self._nodeids:
+            if not tests.get(nodeid):
+                tests[nodeid] = {}
+        return tests
+
+    def collect_tests(self) -> List[str]:
+        """Collect the test nodeids for this cohort using pytest
+
+        :meth:`tests` caches the result - use that instead.
+
+        Returns:
+          List of nodeids relative to cohort test directory
+        """
+        nodeids = []
         result = run_pytest(self, '--collect-only', '-q')
         for line in result.stdout.splitlines():
             if len(line) == 0:
                 break
             if line.startswith(self.name + "/"):
                 line = line[len(self.name) + 1:]
-            if not tests.get(line):
-                tests[line] = {}
-        return tests
+            nodeids.append(line)
+        return nodeids
 
 
 class Student:
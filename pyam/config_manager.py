@@ -303,6 +303,92 @@ SCHEMA = {
         {"description": "Cell reference where marking entries start in marking template",
          "default": "B14"}
     },
+    "cache": {
+        "compile": {
+            "path": {
+                "description": "directory for cache of compiled C outputs - default build/compile-cache",
+                "type": Path
+            },
+            "size": {
+                "description": "maximum size of compile cache in MB (0 to disable)",
+                "default": 256,
+                "type": float
+            }
+        }
+    },
+    "output": {
+        "limit": {
+            "description": "maximum output (MB) of a student program before it is killed",
+            "default": 16,
+            "type": float
+        },
+        "keep": {
+            "description": "output (KB) kept from each of the start and end of a program's stdout and stderr - the rest is in a file in the build directory",
+            "default": 32,
+            "type": float
+        }
+    },
+    "limits": {
+        "cpu": {
+            "description": "maximum CPU time (s) of a student program (0 for no limit)",
+            "default": 0,
+            "type": float
+        },
+        "memory": {
+            "description": "maximum memory (address space, MB) of a student program (0 for no limit)",
+            "default": 0,
+            "type": float
+        },
+        "nproc": {
+            "description": "maximum number of processes of the user when a student program is run (0 for no limit)",
+            "default": 0,
+            "type": float
+        }
+    },
+    "timeout": {
+        "calibrate": {
+            "description": "calibrate shorter test timeouts for other students from the solution student's run",
+            "default": False
+        },
+        "multiplier": {
+            "description": "multiple of the solution student's test call durations used as calibrated timeouts",
+            "default": 10,
+            "type": float
+        },
+        "floor": {
+            "description": "minimum calibrated test timeout (s)",
+            "default": 1.0,
+            "type": float
+        },
+        "call": {
+            "description": "maximum time (s) of each call of a student C library function (see c_library)",
+            "default": 5.0,
+            "type": float
+        }
+    },
+    "vhdl": {
+        "simulator": {
+            "description": "VHDL simulator used to run VHDL test files - ghdl or nvc",
+            "default": "ghdl"
+        },
+        "jobs": {
+            "description": "number of PYAM_TEST_VALUE simulations of a VHDL test file to run in parallel",
+            "default": 1,
+            "type": float
+        },
+        "wave": {
+            "failed": {
+                "description": "re-run failed VHDL simulations with waves to store as compressed test artifacts",
+                "default": True
+            },
+            "signals": {
+                "description": "list of signals (in simulator syntax) to include in waves - default all"
+            },
+            "stop-time": {
+                "description": "simulation time at which re-runs with waves stop e.g. 100us - default the failure"
+            }
+        }
+    },
     "tests": {
         "description": "Dictionary mapping test names to dictionaries with a description and mark for the marking template"
     }
@@ -7,11 +7,24 @@ Typical Usage:
 .. code-block:
     binary_path=c_compile(binary_path,"mysouce.c",include=["include_path"],declarations=['DOSOMETHING'])
     ran_ok=c_exec(binary_path, options=( "option1", "option2" ), timeout=5)
+
+Compiled outputs may be cached by passing a :class:`CompileCache` to :func:`c_compile`.
+
+Binaries built with the fork-server harness in :file:`include/pyam_harness.h` are run
+with :func:`harness_exec`.
 """
 
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import functools
 from pathlib import Path
 from subprocess import run
-from typing import Union, Sequence, List
+from typing import Union, Sequence, List, Dict, Tuple
+from pyam.execute import run_bounded, BoundedProcess, OutputLimit, ResourceLimit
 
 
 class CompilationError(Exception):
@@ -26,6 +39,114 @@ class LintError(Exception):
     """Exceeded maximum number of lint warnings"""
 
 
+#: Directory containing the pyam C headers (e.g. pyam_harness.h)
+INCLUDE_PATH = Path(__file__).parent / "include"
+
+#: Maximum output kept for each harness case (PYAM_MAX_OUTPUT in pyam_harness.h)
+HARNESS_MAX_OUTPUT = 65536
+
+#: Maximum size of a harness case record line
+HARNESS_RECORD_SIZE = 512
+
+_HARNESS_RECORD = re.compile(rb"PYAM_CASE (\S+) (\S+) (\S+) (\d+)\n")
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_identity(compiler: str) -> str:
+    """Return a string identifying a compiler - its resolved path and version"""
+    # pylint: disable=W1510
+    path = shutil.which(compiler)
+    result = run((compiler, "--version"), text=True, capture_output=True)
+    return f"{path and os.path.realpath(path)}\n{result.stdout}"
+
+
+class CompileCache:
+    """A content addressed cache of compiler outputs (binaries or objects)
+
+    Outputs are keyed on the preprocessed translation unit, the compiler
+    flags and link options (excluding include paths, whose effect is in the
+    preprocessed source) and the compiler identity, so identical submissions
+    and repeated runs share outputs. The least recently used outputs are
+    removed when the cache exceeds its size.
+
+    Attributes:
+        path (Path): The cache directory
+        size (int): Maximum total size of cached outputs in bytes
+        stats (dict): Counts of cache "hits" and "misses"
+    """
+
+    def __init__(self, path: Union[Path, str], size: int, stats: Union[Dict, None] = None):
+        self.path = Path(path)
+        self.size = size
+        self.stats = {"hits": 0, "misses": 0} if stats is None else stats
+        self.stats.setdefault("hits", 0)
+        self.stats.setdefault("misses", 0)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def key(self, compiler: str, source: Union[Path, str], include: Sequence[str],
+            cflags: Sequence[str], link: Sequence[str],
+            objects: Sequence[Union[Path, str]] = ()) -> Union[str, None]:
+        """Return the cache key for a compilation, or None if it can not be preprocessed"""
+        # pylint: disable=W1510
+        # paths in __FILE__ expansions are made relative to the source directory
+        # so that the same file in different (build) directories has the same key
+        prefix_map = f"-fmacro-prefix-map={Path(source).resolve().parent}=."
+        result = run((compiler, "-E", "-P", prefix_map, *include, *cflags, str(source)),
+                     text=True,
+                     capture_output=True)
+        if result.returncode != 0:
+            return None
+        digests = [hashlib.sha256(Path(path).read_bytes()).hexdigest() for path in objects]
+        return hashlib.sha256(
+            json.dumps((compiler_identity(compiler), list(cflags), list(link), digests,
+                        result.stdout)).encode("utf-8")).hexdigest()
+
+    def entry(self, key: str) -> Path:
+        """Return the path of the cache entry for key"""
+        return self.path / key[:2] / key
+
+    def fetch(self, key: str, output: Union[Path, str]) -> bool:
+        """Copy the cached output for key to output if present
+
+        Returns:
+            True if there was a cache hit
+        """
+        entry = self.entry(key)
+        try:
+            shutil.copy2(entry, output)
+            os.utime(entry)
+        except FileNotFoundError:
+            self.stats["misses"] += 1
+            return False
+        self.stats["hits"] += 1
+        return True
+
+    def store(self, key: str, output: Union[Path, str]) -> None:
+        """Add output to the cache under key and evict entries if over size"""
+        entry = self.entry(key)
+        entry.parent.mkdir(exist_ok=True)
+        fid, temp = tempfile.mkstemp(dir=entry.parent)
+        os.close(fid)
+        shutil.copy2(output, temp)
+        os.replace(temp, entry)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache is within its size"""
+        entries = []
+        for path in self.path.glob("*/*"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                pass
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime):
+            if total <= self.size:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+
 def c_compile(
         binary: Union[Path, str],
         source: Union[Path, str],
@@ -33,9 +154,14 @@ def c_compile(
         cflags: Sequence[str] = (),
         declarations: Sequence[str] = (),
         compiler: str = "gcc",
-        link: Sequence[str] = ()) -> Union[Path, str]:
+        link: Sequence[str] = (),
+        cache: Union[CompileCache, None] = None,
+        objects: Sequence[Union[Path, str]] = ()) -> Union[Path, str]:
     """Use C compile to compile source files into an executable binary
 
+    The source may instead be compiled to an object by adding "-c" to cflags,
+    and objects compiled separately may be linked with the source.
+
     Args:
       binary: location for binary executable
       sources: source files to compile
@@ -44,6 +170,8 @@ def c_compile(
       declarations: list of compile declarations (-D flags)
       compiler: name of compiler to use
       link: sequence of flags to pass for linkage
+      cache: compile cache to reuse outputs from
+      objects: object files (or archives) to link with the source
 
     Raises:
         CompilationError: if compiler failed
@@ -53,13 +181,20 @@ def c_compile(
     """
     # pylint: disable=W1510
     include = [(lambda s: f"-I{s}")(s) for s in include]
+    cflags = list(cflags)
     for dec in declarations:
         cflags = cflags + ["-D", dec]
+    key = cache.key(compiler, source, include, cflags, link, objects) if cache else None
+    if key and cache.fetch(key, binary):
+        return binary
     result = run(
-        (compiler, "-o", str(binary), *include, *cflags, str(source), *link),
+        (compiler, "-o", str(binary), *include, *cflags, str(source),
+         *[str(path) for path in objects], *link),
         text=True,
         capture_output=True)
     if result.returncode == 0:
+        if key:
+            cache.store(key, binary)
         return binary
     raise CompilationError(result.stderr + result.stdout)
 
@@ -67,23 +202,90 @@ def c_compile(
 def c_exec(binary: Union[Path, str],
            flags: Sequence[str] = (),
            input: Union[List[str], str] = "",
-           timeout: Union[float, str] = None) -> True:
+           timeout: Union[float, str] = None,
+           env: Union[Dict[str, str], None] = None,
+           limit: Union[OutputLimit, None] = None,
+           spill: Union[Path, str, None] = None,
+           resources: Union[ResourceLimit, None] = None) -> BoundedProcess:
     """Execute a binary executable with given flags.
 
+    Output is captured using :func:`pyam.execute.run_bounded` so a program
+    producing excessive output is killed and its output truncated, and its
+    resource use is limited and recorded.
+
     Args:
         binary: Path to binary executable
         timeout: timeout for process
         input : A string that will be fed to standard input or
            a list of strings can be given - these will be joined with a newline character.
+        env: Additional environment variables for the process
+        limit: The output limits (default :class:`pyam.execute.OutputLimit` defaults)
+        spill: Directory for files of truncated output
+        resources: Resource limits for the process
 
     Returns:
-        subprocess.CompletedProcess: From the run
+        BoundedProcess: From the run
     """
     if not isinstance(input, str):
         input = "\n".join([str(a) for a in input]) + "\n"
-    # pylint: disable=W1510
-    return run((str(binary), *flags),
-               text=True,
-               input=input,
-               capture_output=True,
-               timeout=timeout)
+    if env is not None:
+        env = {**os.environ, **env}
+    return run_bounded((str(binary), *flags),
+                       input=input,
+                       timeout=timeout,
+                       env=env,
+                       limit=limit,
+                       spill=spill,
+                       resources=resources)
+
+
+def harness_exec(binary: Union[Path, str],
+                 cases: Sequence[str] = (),
+                 case_timeout: Union[float, None] = None,
+                 timeout: Union[float, None] = None,
+                 resources: Union[ResourceLimit, None] = None,
+                 limit: Union[OutputLimit, None] = None
+                 ) -> Tuple[Dict[str, Tuple[str, str, str]], str]:
+    """Execute a binary built with the pyam_harness.h fork-server harness
+
+    Each case is killed (with outcome "exceeded") if its output exceeds limit.limit
+    bytes and only the first limit.keep bytes of its output are kept, so the
+    output of the binary is bounded by the number of cases.
+
+    Args:
+        binary: Path to binary executable
+        cases: Names of the cases to run - all if empty
+        case_timeout: timeout for each case
+        timeout: timeout for the whole process
+        resources: Resource limits for the process (and so each case)
+        limit: The output limits for each case (default :class:`OutputLimit` defaults)
+
+    Returns:
+        A tuple of a dictionary of (outcome, detail, output) indexed by case name
+        and the process stderr
+
+    Raises:
+        subprocess.TimeoutExpired: if the process timed out
+    """
+    limit = limit or OutputLimit()
+    env = {**os.environ, "PYAM_CASE_OUTPUT_LIMIT": str(limit.limit),
+           "PYAM_CASE_OUTPUT_KEEP": str(limit.keep)}
+    if case_timeout:
+        env["PYAM_CASE_TIMEOUT"] = str(case_timeout)
+    # output is a stream of framed records so must not be truncated - the bound is
+    # only reached if the harness is not keeping to its limits
+    total = max(1, len(cases)) * (min(limit.keep, HARNESS_MAX_OUTPUT) + HARNESS_RECORD_SIZE)
+    result = run_bounded((str(binary), *cases), timeout=timeout, env=env, text=False,
+                         limit=OutputLimit(total, total), resources=resources)
+    records = {}
+    data = result.stdout
+    position = 0
+    while True:
+        match = _HARNESS_RECORD.search(data, position)
+        if not match:
+            break
+        name, outcome, detail, length = match.groups()
+        position = match.end() + int(length)
+        records[name.decode()] = (outcome.decode(), detail.decode(),
+                                  data[match.end():position].decode(errors="replace"))
+    return records, result.stderr.decode(errors="replace")
@@ -0,0 +1,418 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Run student programs with bounded, streamed capture of their output.
+
+:func:`run_bounded` is used instead of subprocess.run with capture_output so
+that a student program printing in a loop can not exhaust the memory of the
+test session. Output is read as it is produced and only the first and last
+:attr:`OutputLimit.keep` bytes of each stream are held in memory - the rest is
+spilled to a file in a given (build) directory. If the total output exceeds
+:attr:`OutputLimit.limit` bytes the program is killed. The captured output of
+a truncated stream has a marker line in place of the omitted bytes, and a note
+is added to stderr if the program was killed, so that both are shown in reports.
+
+On POSIX systems CPU time, memory (address space) and process count limits
+(see :class:`ResourceLimit`) may also be applied to the program, and its
+resource usage (user and system CPU time) is collected when it exits. The
+usage of every program run within a :func:`collect_usage` context is recorded -
+pyAutoMark uses this to add the resource usage of each test to its report and
+the structured results.
+
+Classes
+
+  :class:`OutputLimit`
+    Limits on the captured output of a program
+  :class:`ResourceLimit`
+    Limits on the resources used by a program
+  :class:`BoundedProcess`
+    Completed process with bounded output
+
+Functions
+
+  :func:`run_bounded`
+    Run a program with bounded output capture
+  :func:`output_limit`
+    The output limits configured for a cohort
+  :func:`resource_limit`
+    The resource limits configured for a cohort
+  :func:`apply_limits`
+    Apply resource limits to the current (e.g. forked child) process
+  :func:`collect_usage`
+    Context manager collecting the resource usage of programs run
+  :func:`total_usage`
+    Total the resource usage of several programs
+"""
+import os
+import math
+import signal
+import tempfile
+import threading
+import contextlib
+import subprocess
+from pathlib import Path
+from typing import Dict, IO, Iterator, List, NamedTuple, Sequence, Tuple, Union
+try:
+    import resource
+except ImportError:  # not POSIX
+    resource = None
+
+#: Size of reads from the program pipes
+CHUNK_SIZE = 65536
+
+
+class OutputLimit(NamedTuple):
+    """Limits on the captured output of a program
+
+    Attributes:
+        limit: Total bytes of output (stdout and stderr) after which the program is killed
+        keep: Bytes kept in memory at each of the start and end of each stream
+    """
+    limit: int = 16 * 1024 * 1024
+    keep: int = 32 * 1024
+
+
+def output_limit(cohort: Union['pyam.cohort.Cohort', None] = None) -> OutputLimit:
+    """Return the output limits set by the output.limit and output.keep configuration"""
+    if cohort is None:
+        return OutputLimit()
+    return OutputLimit(int(float(cohort.get("output.limit")) * 1024 * 1024),
+                       int(float(cohort.get("output.keep")) * 1024))
+
+
+class ResourceLimit(NamedTuple):
+    """Limits on the resources used by a program (0 for no limit)
+
+    Attributes:
+        cpu: CPU time in seconds (RLIMIT_CPU)
+        memory: Address space in bytes (RLIMIT_AS)
+        nproc: Number of processes of the user (RLIMIT_NPROC) - this counts
+          all processes of the user running the tests, not only the program's
+    """
+    cpu: float = 0
+    memory: int = 0
+    nproc: int = 0
+
+
+def resource_limit(cohort: Union['pyam.cohort.Cohort', None] = None) -> ResourceLimit:
+    """Return the resource limits set by the limits.cpu, limits.memory and limits.nproc
+    configuration"""
+    if cohort is None:
+        return ResourceLimit()
+    return ResourceLimit(float(cohort.get("limits.cpu") or 0),
+                         int(float(cohort.get("limits.memory") or 0) * 1024 * 1024),
+                         int(cohort.get("limits.nproc") or 0))
+
+
+def _rlimits(limits: ResourceLimit) -> List[Tuple[int, int, int]]:
+    """Return (resource, soft, hard) for each limit set
+
+    The hard CPU limit is a second later so SIGXCPU is followed by SIGKILL.
+    Limits are reduced to the current hard limits.
+    """
+    rlimits = []
+    for name, soft, hard in (
+            (resource.RLIMIT_CPU, math.ceil(limits.cpu), math.ceil(limits.cpu) + 1),
+            (resource.RLIMIT_AS, limits.memory, limits.memory),
+            (resource.RLIMIT_NPROC, limits.nproc, limits.nproc)):
+        if soft:
+            _, maximum = resource.getrlimit(name)
+            if maximum != resource.RLIM_INFINITY:
+                soft, hard = min(soft, maximum), min(hard, maximum)
+            rlimits.append((name, soft, hard))
+    return rlimits
+
+
+def apply_limits(limits: ResourceLimit) -> None:
+    """Apply resource limits to the current process - e.g. a child forked to run student code
+
+    Does nothing if not POSIX.
+    """
+    if resource is None:
+        return
+    for name, soft, hard in _rlimits(limits):
+        resource.setrlimit(name, (soft, hard))
+
+
+def _preexec(limits: ResourceLimit):
+    """Return a function applying limits in a child process before exec"""
+    rlimits = _rlimits(limits)
+
+    def set_limits():
+        for name, soft, hard in rlimits:
+            resource.setrlimit(name, (soft, hard))
+
+    return set_limits
+
+
+#: Lists recording usage of programs run - see :func:`collect_usage`
+_COLLECTORS: List[List[Dict]] = []
+
+
+@contextlib.contextmanager
+def collect_usage() -> Iterator[List[Dict]]:
+    """Context manager recording the resource usage of programs run by :func:`run_bounded`
+
+    Yields:
+        A list to which the usage dictionary of each program is appended as it exits
+    """
+    usages = []
+    _COLLECTORS.append(usages)
+    try:
+        yield usages
+    finally:
+        _COLLECTORS.remove(usages)
+
+
+def _usage(command: str, rusage) -> Dict:
+    """Return a usage dictionary from the rusage of a child process
+
+    The maximum resident set size is not included as on Linux it includes that
+    of the process the program was forked from (before exec).
+    """
+    return {"command": command, "user": rusage.ru_utime, "system": rusage.ru_stime}
+
+
+def total_usage(usages: Sequence[Dict]) -> Dict:
+    """Return the total resource usage of several programs
+
+    Returns:
+        Dictionary of total user and system CPU time (s) and the number of processes
+    """
+    return {"user": sum(usage["user"] for usage in usages),
+            "system": sum(usage["system"] for usage in usages),
+            "processes": len(usages)}
+
+
+class BoundedProcess(subprocess.CompletedProcess):
+    """A completed process whose output may have been truncated
+
+    Attributes:
+        truncated (bool): True if some output was omitted from stdout or stderr
+        exceeded (bool): True if the process was killed for exceeding the output limit
+        spills (Dict[str, Path]): Files holding the omitted output of each stream
+        usage (Dict): The resource usage of the process (None if not available)
+    """
+
+    def __init__(self, args, returncode, stdout, stderr, truncated=False, exceeded=False,
+                 spills=None, usage=None):
+        super().__init__(args, returncode, stdout, stderr)
+        self.truncated = truncated
+        self.exceeded = exceeded
+        self.spills = spills or {}
+        self.usage = usage
+
+
+class _Budget:
+    """Total output allowed from a process, shared by its streams"""
+
+    def __init__(self, process: subprocess.Popen, limit: int):
+        self.process = process
+        self.remaining = limit
+        self.exceeded = False
+        self._lock = threading.Lock()
+
+    def consume(self, count: int) -> bool:
+        """Account for count bytes of output, killing the process if over budget
+
+        Returns:
+            True if the output is within budget
+        """
+        with self._lock:
+            self.remaining -= count
+            if self.remaining >= 0:
+                return True
+            if not self.exceeded:
+                self.exceeded = True
+                _kill(self.process)
+            return False
+
+
+class _Capture(threading.Thread):
+    """Read a process stream keeping its head and tail and spilling the rest"""
+
+    def __init__(self, stream: IO[bytes], name: str, budget: _Budget, keep: int,
+                 spill: Union[Path, None], prefix: str):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.name = name
+        self.budget = budget
+        self.keep = keep
+        self.spill = spill
+        self.prefix = prefix
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.omitted = 0
+        self.spill_path = None
+        self._spill_file = None
+
+    def run(self):
+        try:
+            while True:
+                chunk = self.stream.read1(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if not self.budget.consume(len(chunk)):
+                    # keep draining so the (killed) process never blocks
+                    continue
+                self.add(chunk)
+        finally:
+            self.stream.close()
+            if self._spill_file:
+                self._spill_file.close()
+
+    def add(self, chunk: bytes) -> None:
+        """Add a chunk of output"""
+        space = self.keep - len(self.head)
+        if space > 0:
+            self.head += chunk[:space]
+            chunk = chunk[space:]
+        if not chunk:
+            return
+        self.tail += chunk
+        if len(self.tail) > self.keep:
+            overflow = len(self.tail) - self.keep
+            self.write_spill(bytes(self.tail[:overflow]))
+            del self.tail[:overflow]
+            self.omitted += overflow
+
+    def write_spill(self, data: bytes) -> None:
+        """Write omitted output to the spill file"""
+        if self.spill is None:
+            return
+        if self._spill_file is None:
+            fid, path = tempfile.mkstemp(prefix=f"{self.prefix}-", suffix=f".{self.name}",
+                                         dir=self.spill)
+            self.spill_path = Path(path)
+            self._spill_file = os.fdopen(fid, "wb")
+        self._spill_file.write(data)
+
+    def output(self) -> bytes:
+        """Return the captured output with a marker for any omitted bytes"""
+        if not self.omitted:
+            return bytes(self.head + self.tail)
+        where = f" - see {self.spill_path}" if self.spill_path else ""
+        marker = f"\n... [{self.omitted} bytes of output truncated{where}] ...\n"
+        return bytes(self.head) + marker.encode() + bytes(self.tail)
+
+
+def _kill(process: subprocess.Popen) -> None:
+    """Kill a process (and its process group on POSIX)"""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _feed(stream: IO[bytes], data: bytes) -> None:
+    """Write data to a process stdin ignoring a process that does not read it all"""
+    try:
+        if data:
+            stream.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stream.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+
+def _wait(process: subprocess.Popen, status: Dict) -> None:
+    """Wait for a process to exit setting its returncode and status["rusage"]"""
+    if hasattr(os, "wait4"):
+        _, wait_status, status["rusage"] = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(wait_status)
+    else:
+        process.wait()
+
+
+def run_bounded(args: Sequence[Union[str, Path]],
+                input: Union[str, bytes, None] = None,
+                timeout: Union[float, None] = None,
+                env: Union[Dict[str, str], None] = None,
+                cwd: Union[Path, str, None] = None,
+                limit: Union[OutputLimit, None] = None,
+                spill: Union[Path, str, None] = None,
+                text: bool = True,
+                resources: Union[ResourceLimit, None] = None) -> BoundedProcess:
+    """Run a program capturing a bounded amount of its output
+
+    Args:
+        args: The program and its arguments
+        input: Data to feed to standard input
+        timeout: Timeout for the process in seconds
+        env: The environment for the process (default inherited)
+        cwd: Working directory for the process
+        limit: The output limits (default :class:`OutputLimit` defaults)
+        spill: Directory for files of omitted output (default discarded)
+        text: If True input and output are str, otherwise bytes
+        resources: Resource limits for the process (POSIX only, default none)
+
+    Returns:
+        The completed process - as for subprocess.run with capture_output
+
+    Raises:
+        subprocess.TimeoutExpired: if the process timed out, with the output captured so far
+    """
+    # pylint: disable=redefined-builtin
+    limit = limit or OutputLimit()
+    if isinstance(input, str):
+        input = input.encode()
+    args = [str(arg) for arg in args]
+    preexec_fn = None
+    if resources and any(resources) and resource is not None:
+        preexec_fn = _preexec(resources)
+    process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, env=env, cwd=cwd,
+                               start_new_session=os.name == "posix",
+                               preexec_fn=preexec_fn)
+    budget = _Budget(process, limit.limit)
+    prefix = Path(args[0]).name
+    captures = [_Capture(process.stdout, "stdout", budget, limit.keep, spill, prefix),
+                _Capture(process.stderr, "stderr", budget, limit.keep, spill, prefix)]
+    feeder = threading.Thread(target=_feed, args=(process.stdin, input), daemon=True)
+    status = {}
+    waiter = threading.Thread(target=_wait, args=(process, status), daemon=True)
+    for thread in (*captures, feeder, waiter):
+        thread.start()
+    try:
+        waiter.join(timeout)
+    except BaseException:
+        _kill(process)
+        raise
+    timed_out = waiter.is_alive()
+    if timed_out:
+        _kill(process)
+        waiter.join()
+    # a background child still holding the pipes would otherwise block forever
+    for capture in captures:
+        capture.join(1.0 if timed_out else None)
+    feeder.join(timeout=1.0)
+    usage = None
+    if "rusage" in status:
+        usage = _usage(prefix, status["rusage"])
+        for usages in _COLLECTORS:
+            usages.append(usage)
+    stdout, stderr = (capture.output() for capture in captures)
+    if budget.exceeded:
+        stderr += (f"\n[Killed after exceeding the output limit of {limit.limit} bytes]\n"
+                   ).encode()
+    if usage and resources and resources.cpu and (
+            process.returncode == -signal.SIGXCPU or
+            (process.returncode == -signal.SIGKILL
+             and usage["user"] + usage["system"] >= resources.cpu)):
+        stderr += f"\n[Killed after exceeding the CPU time limit of {resources.cpu}s]\n".encode()
+    if text:
+        stdout = stdout.decode(errors="replace")
+        stderr = stderr.decode(errors="replace")
+    if timed_out:
+        raise subprocess.TimeoutExpired(args, timeout, output=stdout, stderr=stderr)
+    return BoundedProcess(args, process.returncode, stdout, stderr,
+                          truncated=any(capture.omitted for capture in captures),
+                          exceeded=budget.exceeded,
+                          spills={capture.name: capture.spill_path for capture in captures
+                                  if capture.spill_path},
+                          usage=usage)
@@ -5,8 +5,10 @@ import shutil
 import os
 import re
 import argparse
+import tempfile
+import hashlib
 from pathlib import Path
-from typing import Any, Union, List, Dict, Callable
+from typing import Any, Union, List, Dict, Callable, Sequence
 import csv
 
 class PathGlob(argparse.Action):
@@ -42,22 +44,27 @@ def expand_files(filearg):
         files=[Path(filearg)]
     return files
 
-def get_depends(name: Any, depends: List[List]) -> List[Any]:
+def get_depends(name: Any, depends: List[List], visited: Union[set, None] = None) -> List[Any]:
     """Determine the dependencies for a particular (file) name from a
     dependency graph. Recurses the depends graph, will return dependencies in order.
 
     Args:
         name (Any): Item for which dependencies
         depends (List[List]): A recursive dependency graph
+        visited (set): Items already visited in this search - used to stop at cycles
 
     Returns:
         The ordered list of dependencies for name
     """
+    visited = set() if visited is None else visited
+    visited.add(name)
     results = []
     for item in depends:
         if item[0] == name:
             for i in item[1:]:
-                for elem in get_depends(i, depends):
+                if i in visited:
+                    continue
+                for elem in get_depends(i, depends, visited):
                     if not elem in results:
                         results.append(elem)
             break
@@ -65,6 +72,87 @@ def get_depends(name: Any, depends: List[List]) -> List[Any]:
     return results
 
 
+def write_atomic(path: Union[Path, str], text: str) -> None:
+    """Write text to a file so that readers never see a partially written file.
+
+    The text is written to a temporary file in the same directory which
+    then replaces path.
+
+    Args:
+        path: The file to be written
+        text: The contents to write
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as fid:
+            fid.write(text)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+CACHE_EXCLUDES = (".git", "__pycache__", ".pytest_cache")
+
+
+def tree_files(path: Union[Path, str], exclude: Sequence[str] = CACHE_EXCLUDES) -> List[Path]:
+    """Return sorted list of all files under a directory
+
+    Args:
+        path: The directory (or single file)
+        exclude: File or directory names to ignore
+
+    Returns:
+        List of file paths - empty if path doesn't exist
+    """
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    files = []
+    for directory, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(name for name in dirnames if name not in exclude)
+        files += [Path(directory) / name for name in sorted(filenames)
+                  if name not in exclude]
+    return files
+
+
+def tree_stamp(path: Union[Path, str], exclude: Sequence[str] = CACHE_EXCLUDES) -> List[List]:
+    """Return a cheap stamp of the names, modification times and sizes of files under a directory
+
+    If the stamp is unchanged the contents can be assumed to be unchanged
+    without hashing them.
+    """
+    path = Path(path)
+    stamp = []
+    for file in tree_files(path, exclude):
+        stat = file.stat()
+        stamp.append([str(file.relative_to(path)), stat.st_mtime_ns, stat.st_size])
+    return stamp
+
+
+def hash_tree(path: Union[Path, str], exclude: Sequence[str] = CACHE_EXCLUDES) -> str:
+    """Return a digest of the names and contents of all files under a directory
+
+    Args:
+        path: The directory (or single file) to hash
+        exclude: File or directory names to ignore
+
+    Returns:
+        Hex digest - empty directories or missing paths give the digest of no files
+    """
+    path = Path(path)
+    sha = hashlib.sha256()
+    for file in tree_files(path, exclude):
+        sha.update(str(file.relative_to(path)).encode("utf-8") + b"\0")
+        with open(file, "rb") as fid:
+            for block in iter(lambda: fid.read(1 << 16), b""):
+                sha.update(block)
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
 def find_executable(name: str, paths: List[Union[Path, str]]) -> Path:
     """Find path to an executable program.
 
@@ -6,21 +6,62 @@ This set of fixtures assumes a single student C file, and a single mock test C f
 include path will be set to the cohort test directory, the build directory and the students
 directory. A file "student.h" is written into build directory to include the students c file
 in the mock test.
+
+Alternatively, if a test sets the :func:`link_student_object` fixture, the student C file
+is compiled once per session to an object which each mock test is linked against, so that
+only the mock test is compiled for each test. "student.h" then includes
+:func:`student_h_file` (if set) which should declare the student functions used.
+
+Functions in the student C file may also be called directly from Python tests using
+the :func:`c_library` fixture.
 """
 
 import re
 from pathlib import Path
-from typing import Sequence, Union, List
+from typing import Sequence, Union, List, Dict
 import subprocess
-from subprocess import run
 import pytest
 import pyam.cunit as cunit
+from pyam.clib import CLibrary
 import pyam.cohort
 from pyam.config import CONFIG
+from pyam.lint import LintCache, warning_count, lint_includes, DEFAULT_CFLAGS
+import pyam.execute
+from pyam.fixtures.common import get_build_path, session_stats, item_timeout
+
+COMPILE_CACHE = pytest.StashKey[Union[cunit.CompileCache, None]]()
+SESSION_BUILDS = pytest.StashKey[Dict[tuple, Union[Path, cunit.CompilationError]]]()
 
 # pylint: disable=redefined-outer-name
 
 
+def pytest_configure(config):
+    """Set up the compile cache for the session - there is none without a cohort"""
+    name = config.getoption("--cohort", None)
+    if not name:  # e.g. pytest run directly without pyAutoMark options
+        config.stash[COMPILE_CACHE] = None
+        return
+    cohort = pyam.cohort.get_cohort(name)
+    size = float(cohort.get("cache.compile.size"))
+    config.stash[COMPILE_CACHE] = cunit.CompileCache(
+        cohort.get("cache.compile.path") or CONFIG.build_path / "compile-cache",
+        int(size * 1024 * 1024),
+        stats=session_stats(config, "compile_cache")) if size > 0 else None
+
+
+def get_compile_cache(config) -> Union[cunit.CompileCache, None]:
+    """Return the compile cache for the pytest session with given config (None if disabled)"""
+    return config.stash.get(COMPILE_CACHE, None)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Report compile cache statistics"""
+    cache = get_compile_cache(config)
+    if cache and (cache.stats["hits"] or cache.stats["misses"]):
+        terminalreporter.write_line(
+            f"compile cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses")
+
+
 @pytest.fixture
 def binary_name(student_c_file, mock_c_file) -> str:
     """*Fixture*: The binary executable name to use for compiled tests
@@ -47,14 +88,32 @@ def mock_c_file() -> Union[str, Path]:
       *Must be set in the test if using mocks*."""
 
 
+@pytest.fixture
+def link_student_object() -> bool:
+    """*Fixture*: If True mock tests are linked against the student C file compiled once
+      to an object (see :func:`student_object`) rather than including it.
+      *Set in the test to enable*."""
+    return False
+
+
+@pytest.fixture
+def student_h_file() -> Union[str, Path]:
+    """*Fixture*: Header declaring the student C file functions - included by
+      :file:`student.h` instead of the student C file when :func:`link_student_object` is set"""
+
+
 @pytest.fixture(autouse=True)
-def write_header(build_path, student_c_file) -> Path:
+def write_header(build_path, student_c_file, link_student_object, student_h_file) -> Path:
     """*Fixture*:  creates :file:`student.h` which includes the :func:`student_c_file`
 
-    Used in Mock C code to include the students file."""
+    Used in Mock C code to include the students file (or :func:`student_h_file` if
+    linking against the student object)."""
     header = build_path / "student.h"
     with open(header, "w") as fid:
-        fid.write(f'#include "{student_c_file}"')
+        if not link_student_object:
+            fid.write(f'#include "{student_c_file}"')
+        elif student_h_file:
+            fid.write(f'#include "{student_h_file}"')
     return header
 
 
@@ -67,9 +126,75 @@ def compile_flags() -> Sequence[str]:
     ]
 
 
+def session_build(config, key: tuple, build) -> Path:
+    """Return the output of build() memoized for the pytest session on key
+
+    A compilation error is raised again for each use without rebuilding.
+    """
+    outputs = config.stash.setdefault(SESSION_BUILDS, {})
+    if key not in outputs:
+        try:
+            outputs[key] = build(len(outputs))
+        except cunit.CompilationError as err:
+            outputs[key] = err
+    if isinstance(outputs[key], cunit.CompilationError):
+        raise cunit.CompilationError(*outputs[key].args)
+    return outputs[key]
+
+
+@pytest.fixture
+def student_object(pytestconfig, student, test_path, build_path, student_c_file,
+                   compile_flags, compiler) -> Path:
+    """*Fixture*: Path to the object compiled from the :func:`student_c_file`
+
+    The object is compiled once per session for each file, flags and compiler
+    and shared by all the tests using it.
+
+    Raises:
+        cunit.CompilationError: for each test if the student file failed to compile
+    """
+    return session_build(
+        pytestconfig, ("object", str(student_c_file), tuple(compile_flags), str(compiler)),
+        lambda index: cunit.c_compile(build_path / f"{Path(student_c_file).stem}-{index}.o",
+                                      source=student_c_file,
+                                      include=[test_path, build_path, student.path],
+                                      cflags=[*compile_flags, "-c"],
+                                      compiler=compiler,
+                                      cache=get_compile_cache(pytestconfig)))
+
+
 @pytest.fixture
-def c_compile(student, test_path, build_path, mock_c_file, student_c_file,
-              binary_name, compile_flags, compiler):
+def c_library(request, pytestconfig, cohort, student, test_path, build_path, student_c_file,
+              compile_flags, compiler, resource_limit) -> CLibrary:
+    """*Fixture*: The :func:`student_c_file` built as a shared library to call from Python
+
+    The library is built once per session for each file, flags and compiler. Each
+    call of a library function (or batch of calls using map) is made in a forked
+    child with the resource limits applied - see :mod:`pyam.clib`. Each call is
+    given the timeout.call configuration, reduced to half the test timeout if that
+    is shorter, so that a call times out before the test does. POSIX only.
+
+    Raises:
+        cunit.CompilationError: for each test if the student file failed to compile
+    """
+    timeout = float(cohort.get("timeout.call"))
+    marker = request.node.get_closest_marker("timeout")
+    if marker is not None and marker.args and marker.args[0]:
+        timeout = min(timeout, item_timeout(request.node, marker.args[0]) / 2)
+    path = session_build(
+        pytestconfig, ("library", str(student_c_file), tuple(compile_flags), str(compiler)),
+        lambda index: cunit.c_compile(build_path / f"lib{Path(student_c_file).stem}-{index}.so",
+                                      source=student_c_file,
+                                      include=[test_path, build_path, student.path],
+                                      cflags=[*compile_flags, "-shared", "-fPIC"],
+                                      compiler=compiler,
+                                      cache=get_compile_cache(pytestconfig)))
+    return CLibrary(path, timeout=timeout, resources=resource_limit)
+
+
+@pytest.fixture
+def c_compile(request, pytestconfig, student, test_path, build_path, mock_c_file,
+              student_c_file, binary_name, compile_flags, compiler, link_student_object):
     """*Fixture*: The compile function
 
     The returned function takes the following arguments
@@ -80,6 +205,9 @@ def c_compile(student, test_path, build_path, mock_c_file, student_c_file,
             Typically only one will be set to select the test in the mock C file.
         source (Union[Path,str]): source C file - defaults to mock_c_file or student_c_file
 
+    If :func:`link_student_object` is set a mock C file is linked against the
+    :func:`student_object`.
+
     Returns:
         Path: Location of binary executable
 
@@ -89,22 +217,31 @@ def c_compile(student, test_path, build_path, mock_c_file, student_c_file,
 
     def _compile(declarations: Sequence[str] = (),
                  source: Union[Path, str] = mock_c_file or student_c_file):
+        objects = []
+        if link_student_object and source != student_c_file:
+            objects.append(request.getfixturevalue("student_object"))
         return cunit.c_compile(build_path / binary_name,
                                source=source,
                                include=[test_path, build_path, student.path],
                                declarations=declarations,
                                cflags=compile_flags,
-                               compiler=compiler)
+                               compiler=compiler,
+                               cache=get_compile_cache(pytestconfig),
+                               objects=objects)
 
     return _compile
 
 
 @pytest.fixture
-def c_exec(request, c_compile, c_binary):
+def c_exec(request, c_compile, c_binary, output_limit, resource_limit, build_path):
     """*Fixture*: The exec function for this test suite which
     will compile and execute the mock C tests.
 
-    Uses the timeout marker, and if set will stop student programm execution at that time.
+    Uses the timeout marker, shortened to the calibrated timeout of the test if
+    there is one (see :func:`pyam.fixtures.common.item_timeout`), and if set will
+    stop student programm execution at that time.
+    Output beyond the :func:`output_limit` is truncated and the :func:`resource_limit`
+    applied.
 
     The returned function takes the following arguments:
 
@@ -121,7 +258,7 @@ def c_exec(request, c_compile, c_binary):
          The stdout from the script as a string.
     """
     marker = request.node.get_closest_marker("timeout")
-    timeout = None if marker is None else marker.args[0]
+    timeout = item_timeout(request.node, None if marker is None else marker.args[0])
 
     def _exec(declarations: Sequence[str] = (),
               binary: Union[Path, str] = c_binary,
@@ -130,7 +267,8 @@ def c_exec(request, c_compile, c_binary):
 
         if binary is None:
             binary = c_compile(declarations)
-        result = cunit.c_exec(binary, input=input, timeout=timeout)
+        result = cunit.c_exec(binary, input=input, timeout=timeout, limit=output_limit,
+                              spill=build_path, resources=resource_limit)
         if result.returncode != 0:
             if print_cap:
                 print(result.stderr + result.stdout)
@@ -146,9 +284,12 @@ def c_lint_checks() -> str:
 
 
 @pytest.fixture
-def c_lint(student, test_path, build_path, c_lint_checks):
+def c_lint(cohort, student, c_lint_checks):
     """*Fixture*: A function to provide lint ouput on students C file
 
+    Results are read from the cohort lint cache if the file has been linted before.
+    The file is linted with the same include paths and (default) flags as C test files.
+
     The returned function takes the following arguments:
 
     Args:
@@ -156,20 +297,16 @@ def c_lint(student, test_path, build_path, c_lint_checks):
        man_warnings (int): Optionally maximum number of warning to accept before test
           is considered a failure.
     """
-    includes = [(lambda s: f"-I{s}")(s)
-                for s in (test_path, build_path, student.path)]
+    cache = LintCache(cohort)
 
-    # pylint: disable=subprocess-run-check
     def _c_lint(source_file, max_warnings=0):
-        result = run(("clang-tidy", student.path / source_file,
-                      f"-checks={c_lint_checks}", "--quiet", "--", *includes),
-                     capture_output=True,
-                     text=True)
+        result = cache.lint(student.path / source_file, c_lint_checks,
+                            lint_includes(cohort, student), DEFAULT_CFLAGS)
         if result.returncode == 0:
-            warning_count = int(result.stderr.split(" ")[0])
-            if warning_count < 10.0:
+            count = warning_count(result.stderr)
+            if count < 10.0:
                 print(result.stdout[0:])
-            assert warning_count <= max_warnings, result.stderr
+            assert count <= max_warnings, result.stderr
         else:
             raise cunit.CompilationError(result.stdout + result.stderr)
 
@@ -190,6 +327,19 @@ def pytest_collect_file(parent, path) -> List:
 
     A test timeout may be specified using #DEFINE PYAM_TIMEOUT <float>
 
+    If the file includes "pyam_harness.h" its tests are instead the cases
+    defined using PYAM_CASE(name) and PYAM_CASES(name, N), which are all run by a
+    single launch of the binary (see :file:`pyam/include/pyam_harness.h`).
+
+    By default the file is compiled for each test with the test symbol defined.
+    If it contains #define PYAM_SELECT "argv" or #define PYAM_SELECT "env" it
+    is instead compiled once and the test symbol is passed to the binary at run
+    time as its first argument or in the PYAM_TEST environment variable
+    respectively, so the file must select the test itself e.g. using strcmp.
+
+    The file is first compiled without a test symbol. If that fails the compiler
+    errors are reported for the first test only and the others fail referring to it.
+
     Returns:
         List of  tuples of filepath and a list of tests declarations.
     """
@@ -211,7 +361,11 @@ class CTestFile(pytest.File):
         clint_checks: Lint checks from   #define PYAM_LINT threshold,"checks"
         cflags: List of flags from PYAM_FLAGS to pass to compiler
         link: List of link items to pass to compiler
-        timeout: timout in seconds specified using #DEFINE PYAM_TIMEOUT <float>
+        select: "argv" or "env" from #define PYAM_SELECT "mode" if compiled once
+          and the test is selected at run time, otherwise None
+        harness: True if the file uses the pyam_harness.h fork-server harness
+        timeout: timout in seconds specified using #DEFINE PYAM_TIMEOUT <float> - items
+          may have shorter calibrated timeouts (see :func:`pyam.fixtures.common.item_timeout`)
         cohort: Student cohort under for test
         student: student under test
         test_file_path: first file in student directory matching glob
@@ -222,12 +376,17 @@ class CTestFile(pytest.File):
     re_timeout = re.compile(r'#define\s+PYAM_TIMEOUT\s+(.+)')
     re_cflags = re.compile(r'#define\s+PYAM_CFLAGS\s+\"(.+)\"')
     re_link = re.compile(r'#define\s+PYAM_LINK\s+\"(.+)\"')
+    re_select = re.compile(r'#define\s+PYAM_SELECT\s+\"(argv|env)\"')
+    re_harness = re.compile(r'#include\s+[<"]pyam_harness\.h[>"]')
+    re_case = re.compile(r'^\s*PYAM_CASES?\(\s*(\w+)\s*(?:,\s*(\d+)\s*)?\)', re.MULTILINE)
     # attributes from initialisation
     text: str
     ctest_glob: str
     clint_threshold: int = None
     clint_checks: str = "performance-*,readability-*,portability-*"
     timeout = None
+    select: str = None
+    harness: bool = False
     # attributes after configure
     cohort: pyam.cohort.Cohort = None
     student: pyam.cohort.Student = None
@@ -237,32 +396,46 @@ class CTestFile(pytest.File):
     link: List[str]
 
     @classmethod
-    def from_parent(cls, parent, *, fspath=None, path=None, text="", **kw):
-        self = super().from_parent(parent=parent,
-                                   fspath=fspath,
-                                   path=path,
-                                   **kw)
-        self.text = text
-        self.ctest_glob = self.re_ctest.search(text).group(1)
-        match = self.re_clint.search(text)
+    def parse(cls, text: str) -> Dict:
+        """Return the attributes set by the PYAM definitions in test file text"""
+        options = {"ctest_glob": cls.re_ctest.search(text).group(1)}
+        match = cls.re_clint.search(text)
         if match:
             if match.group(1):
-                self.clint_threshold = int(match.group(1))
+                options["clint_threshold"] = int(match.group(1))
             else:
-                self.clint_threshold = 999
+                options["clint_threshold"] = 999
             if match.group(3):
-                self.clint_checks = match.group(3)
-        match = self.re_timeout.search(text)
+                options["clint_checks"] = match.group(3)
+        match = cls.re_timeout.search(text)
+        if match:
+            options["timeout"] = float(match.group(1))
+        options["cflags"] = list(DEFAULT_CFLAGS)
+        match = cls.re_cflags.search(text)
         if match:
-            self.timeout = float(match.group(1))
-        self.cflags = ["-Wall", "-std=gnu99"]
-        match = self.re_cflags.search(text)
+            options["cflags"] = match.group(1).split()
+        options["link"] = []
+        match = cls.re_link.search(text)
         if match:
-            self.cflags = match.group(1).split()
-        self.link = []
-        match = self.re_link.search(text)
+            options["link"] = match.group(1).split()
+        match = cls.re_select.search(text)
         if match:
-            self.link = match.group(1).split()
+            options["select"] = match.group(1)
+        options["harness"] = bool(cls.re_harness.search(text))
+        return options
+
+    @classmethod
+    def from_parent(cls, parent, *, fspath=None, path=None, text="", **kw):
+        self = super().from_parent(parent=parent,
+                                   fspath=fspath,
+                                   path=path,
+                                   **kw)
+        self.text = text
+        for name, value in self.parse(text).items():
+            setattr(self, name, value)
+        self._compiled = None
+        self._cases = None
+        self._case_timeout = None
         return self
 
     def collect(self):
@@ -271,8 +444,12 @@ class CTestFile(pytest.File):
         C Mock unit test executable.
         """
         if self.ctest_glob:
-            for test in re.findall("TEST_[A-Z0-9_]+", self.text):
-                yield CTestItem.from_parent(name=test, parent=self)
+            if self.harness:
+                for name in self.case_names():
+                    yield CHarnessItem.from_parent(name=name, parent=self)
+            else:
+                for test in re.findall("TEST_[A-Z0-9_]+", self.text):
+                    yield CTestItem.from_parent(name=test, parent=self)
             if self.clint_threshold:
                 yield CLintItem.from_parent(name="STYLE", parent=self)
 
@@ -300,53 +477,160 @@ class CTestFile(pytest.File):
                 "Multiple files matching '%s' found for %s, using %s",
                 self.ctest_glob, self.student.name(), self.test_file_path)
         #insert include to student file
-        self.compile_file_path = CONFIG.build_path / self.path.name
+        self.compile_file_path = get_build_path(self.config) / self.path.name
         with open(self.compile_file_path, "w") as fid:
             fid.write(f'#include "{self.test_file_path}"\n')
             fid.write(self.text)
 
+    def case_names(self) -> List[str]:
+        """The names of the harness cases defined in the file"""
+        names = []
+        for name, count in self.re_case.findall(self.text):
+            if count:
+                names += [f"{name}[{index}]" for index in range(int(count))]
+            else:
+                names.append(name)
+        return names
+
     def includes(self):
         """The list of include paths to use during compilation"""
-        return (self.cohort.test_path, CONFIG.build_path, self.student.path)
+        return (self.cohort.test_path, get_build_path(self.config), self.student.path,
+                cunit.INCLUDE_PATH)
+
+    def c_compile(self, item=None):
+        """Compile the test for item - its name is set as a command line definition
 
-    def c_compile(self, item):
-        """Compile the test for item - its name is set as a command line definition"""
+        If item is None the file is compiled without a test definition
+        """
+        return cunit.c_compile(binary=get_build_path(self.config) /
+                               self.test_file_path.stem,
+                               source=self.compile_file_path,
+                               include=self.includes(),
+                               cflags=self.cflags,
+                               link=self.link,
+                               declarations=[item.name] if item else [],
+                               cache=get_compile_cache(self.config))
+
+    def preflight(self, item):
+        """Compile the binary shared by all items of a file which selects the test at run time
+
+        If compilation fails the errors are reported for item (the first to
+        run) and each later item fails referring to it without compiling again.
+
+        Returns:
+            Path to the binary
+        """
+        if self._compiled is None:
+            try:
+                self._compiled = self.c_compile()
+            except cunit.CompilationError as err:
+                self._compiled = (err, item.name)
+                raise
+        self.check_compiled()
+        return self._compiled
+
+    def check_compiled(self):
+        """Raise a compilation error if an earlier item found the file does not compile"""
+        if isinstance(self._compiled, tuple):
+            raise cunit.CompilationError(
+                f"Compilation failed - see {self._compiled[1]} for the errors")
+
+    def compile_item(self, item):
+        """Compile the binary for item of a file which does not select the test at run time
+
+        Only if compilation fails is the file compiled without a test definition,
+        to an object, to check whether it is the file rather than the test which
+        does not compile. If so each later item fails referring to item without
+        compiling again.
+
+        Returns:
+            Path to the binary
+        """
+        self.check_compiled()
         try:
-            return cunit.c_compile(binary=CONFIG.build_path /
-                                   self.test_file_path.stem,
-                                   source=self.compile_file_path,
-                                   include=self.includes(),
-                                   cflags=self.cflags,
-                                   link=self.link,
-                                   declarations=[item.name])
+            return self.c_compile(item)
         except cunit.CompilationError as err:
-            raise err
+            if self._compiled is None:
+                try:
+                    self._compiled = cunit.c_compile(
+                        binary=get_build_path(self.config) / f"{self.test_file_path.stem}.o",
+                        source=self.compile_file_path,
+                        include=self.includes(),
+                        cflags=[*self.cflags, "-c"],
+                        cache=get_compile_cache(self.config))
+                except cunit.CompilationError:
+                    self._compiled = (err, item.name)
+            raise
 
     def c_exec(self, item):
         """Execute the compiled binary for item."""
         if not self.test_file_path:
             raise FileNotFoundError
-        binary = self.c_compile(item)
-        result = cunit.c_exec(binary, timeout=self.timeout)
+        flags = ()
+        env = None
+        if self.select:
+            binary = self.preflight(item)
+            if self.select == "argv":
+                flags = (item.name, )
+            else:
+                env = {"PYAM_TEST": item.name}
+        else:
+            binary = self.compile_item(item)
+        result = cunit.c_exec(binary, flags=flags, env=env,
+                              timeout=item_timeout(item, self.timeout),
+                              limit=pyam.execute.output_limit(self.cohort),
+                              spill=get_build_path(self.config),
+                              resources=pyam.execute.resource_limit(self.cohort))
         if result.returncode != 0:
             raise cunit.RunTimeError(result.stderr + result.stdout)
         if len(result.stdout.strip())>0:
             print(result.stdout,end="")
 
+    def harness_case(self, item):
+        """Return the result of the harness case for item.
+
+        The binary is compiled once and all the cases run on the first call.
+        """
+        if not self.test_file_path:
+            raise FileNotFoundError
+        if self._cases is None:
+            binary = self.preflight(item)
+            count = len(self.case_names())
+            # all cases share one timeout - the longest calibrated for them
+            self._case_timeout = self.timeout and max(
+                item_timeout(case, self.timeout) for case in item.session.items
+                if case.parent is self)
+            try:
+                self._cases = cunit.harness_exec(
+                    binary, self.case_names(), case_timeout=self._case_timeout,
+                    timeout=self._case_timeout * count + 10 if self._case_timeout else None,
+                    resources=pyam.execute.resource_limit(self.cohort),
+                    limit=pyam.execute.output_limit(self.cohort))
+            except subprocess.TimeoutExpired as err:
+                self._cases = err
+        if isinstance(self._cases, subprocess.TimeoutExpired):
+            raise subprocess.TimeoutExpired(self._cases.cmd, self._cases.timeout)
+        records, stderr = self._cases
+        if item.name not in records:
+            raise cunit.RunTimeError(f"No result for case {item.name}\n{stderr}")
+        outcome, detail, output = records[item.name]
+        if outcome == "timeout":
+            raise subprocess.TimeoutExpired(item.name, self._case_timeout)
+        if outcome != "passed":
+            raise cunit.RunTimeError(f"{outcome} ({detail})\n{output}")
+        if output.strip():
+            print(output, end="")
+
     def c_lint(self, item):
-        """Use clang-tidy to lint the file"""
+        """Use clang-tidy to lint the file - reading the result from the lint cache if present"""
         if not self.test_file_path:
             raise FileNotFoundError
-        includes = [(lambda s: f"-I{s}")(s) for s in self.includes()]
-        # pylint: disable=subprocess-run-check
-        result = run(
-            ("clang-tidy", self.test_file_path, f"-checks={self.clint_checks}",
-             "--quiet", "--", *includes),
-            capture_output=True,
-            text=True)
+        result = LintCache(self.cohort).lint(self.test_file_path, self.clint_checks,
+                                             lint_includes(self.cohort, self.student),
+                                             self.cflags)
         if result.returncode != 0:
             raise cunit.CompilationError(result.stdout + result.stderr)
-        count = int(result.stderr.split(" ")[0])
+        count = warning_count(result.stderr)
         #If we set a threshold and are above it fail this test
         if self.clint_threshold >= 0 and count > self.clint_threshold:
             raise cunit.LintError(result.stdout)
@@ -379,6 +663,14 @@ class CTestItem(pytest.Item):
         return stem, 0, stem + ":" + self.name
 
 
+class CHarnessItem(CTestItem):
+    """Pytest.Item subclass for each case of a pyam_harness.h test file."""
+
+    def runtest(self):
+        """Report the case result"""
+        self.parent.harness_case(self)
+
+
 class CLintItem(pytest.Item):
     """Pytest.Item subclass to handle each test result item."""
 
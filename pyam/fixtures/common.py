@@ -3,26 +3,286 @@
 """
 Common fixtures for pyAutoMark tests which provid the cohort and student context in
 which the tests will be run.
+
+Each pytest session builds into its own directory under the configured build path,
+scoped by cohort, student and worker, so that concurrent sessions never share
+build products. The directory is removed at the end of the session unless
+--keep-build is given.
+
+If the --results option is given the outcome, duration and captured output of
+every test is also written to a json file - see :mod:`pyam.results`.
+
+The resource usage of student programs run by each test (see :mod:`pyam.execute`)
+is added to its report as a "resources" section and user property.
+
+Files kept to help diagnose a test (e.g. waveforms of a failed simulation) are
+stored in the --artifacts directory and listed in an "artifacts" section and
+user property of its report - see :func:`add_artifact`.
+
+The timeouts of programs run by tests are shortened to those calibrated from the
+solution student, if configured - see :mod:`pyam.timeouts` and :func:`item_timeout`.
 """
+import os
+import json
+import time
+import shutil
+import tempfile
+from datetime import datetime
 from pathlib import Path
-from typing import Union
+from typing import Union, Dict, List
 import pytest
 import pyam
 from pyam.config import CONFIG
 from pyam.cohort import get_cohort
+from pyam.files import write_atomic
+from pyam.timeouts import TimeoutCalibration
+import pyam.execute
+from pyam.execute import OutputLimit, ResourceLimit
 
 
 def pytest_addoption(parser):
     """Add in pyAutoTest control options for pytest"""
     parser.addoption("--cohort", action="store", default=None)
     parser.addoption("--student", action="store", default=None)
+    parser.addoption("--build-path", action="store", type=Path, default=None,
+                     help="Build directory for this session instead of an isolated one")
+    parser.addoption("--keep-build", action="store_true",
+                     help="Do not remove the isolated build directory at end of session")
+    parser.addoption("--results", action="store", type=Path, default=None,
+                     help="Write structured json test results to this file")
+    parser.addoption("--artifacts", action="store", type=Path, default=None,
+                     help="Directory to store test artifacts in (default in the build directory)")
+
+
+BUILD_PATH = pytest.StashKey[Path]()
+STATS = pytest.StashKey[Dict[str, Dict]]()
+USAGE = pytest.StashKey[List[Dict]]()
+TIMEOUTS = pytest.StashKey[Dict[str, float]]()
+ITEM_TIMEOUT = pytest.StashKey[float]()
+ARTIFACTS = pytest.StashKey[List[tuple]]()
 
 
 def pytest_configure(config):
-    """Add in pyAutoTest markers for pytest"""
+    """Add in pyAutoTest markers for pytest and set up the session build directory"""
     config.addinivalue_line("markers", "slow: mark test as slow")
     config.addinivalue_line("markers", "timeout: set timeout for a test.")
-    
+    path = config.getoption("--build-path")
+    if path:
+        path.mkdir(parents=True, exist_ok=True)
+    else:
+        scope = CONFIG.build_path / (config.getoption("--cohort") or "default")
+        scope.mkdir(parents=True, exist_ok=True)
+        worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+        path = Path(tempfile.mkdtemp(
+            prefix=f"{config.getoption('--student') or 'collect'}-{worker}-", dir=scope))
+        if not config.getoption("--keep-build"):
+            config.add_cleanup(lambda: shutil.rmtree(path, ignore_errors=True))
+    config.stash[BUILD_PATH] = path
+    config.stash[TIMEOUTS] = {}
+    if config.getoption("--student"):
+        name = config.getoption("--cohort")
+        config.stash[TIMEOUTS] = TimeoutCalibration(
+            get_cohort(name) if name else get_cohort()).timeouts()
+    if config.getoption("--results"):
+        config.pluginmanager.register(ResultsRecorder(config), "pyam-results")
+
+
+def get_build_path(config) -> Path:
+    """Return the build directory for the pytest session with given config
+
+    Test files and items should use this rather than the global build path
+    so that concurrent sessions do not clobber each others build products.
+    """
+    return config.stash[BUILD_PATH]
+
+
+def session_stats(config, name: str) -> Dict:
+    """Return the named statistics dictionary for the pytest session with given config
+
+    Plugins may count events (e.g. cache hits) in these dictionaries; they are
+    written with the structured results.
+    """
+    return config.stash.setdefault(STATS, {}).setdefault(name, {})
+
+
+def pytest_collection_modifyitems(config, items):
+    """Record the calibrated timeouts of items for :func:`item_timeout`
+
+    Timeout markers are not changed as pytest-timeout also times fixture setup
+    (e.g. compilation) which is not part of the calibrated durations.
+    """
+    timeouts = config.stash[TIMEOUTS]
+    if not timeouts:
+        return
+    prefix = nodeid_prefix(config)
+    for item in items:
+        timeout = timeouts.get(relative_nodeid(item.nodeid, prefix))
+        if timeout is not None:
+            item.stash[ITEM_TIMEOUT] = timeout
+
+
+def item_timeout(item, timeout: Union[float, None]) -> Union[float, None]:
+    """Return the timeout for a test item - its calibrated timeout if shorter than timeout
+
+    Calibrated timeouts are never shorter than timeout.floor (see
+    :meth:`pyam.timeouts.TimeoutCalibration.timeouts`) and apply whether the
+    timeout is from a timeout marker or a default.
+
+    Args:
+        item: The test item
+        timeout: The timeout it would otherwise have (None for no timeout)
+    """
+    calibrated = item.stash.get(ITEM_TIMEOUT, None)
+    if calibrated is None:
+        return timeout
+    if timeout is None:
+        return calibrated
+    return min(float(timeout), calibrated)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Collect the resource usage of the programs run by a test"""
+    with pyam.execute.collect_usage() as usages:
+        yield
+    item.stash[USAGE] = usages
+
+
+def artifacts_path(config) -> Path:
+    """Return the directory to store test artifacts in for the pytest session with given config
+
+    This is the --artifacts option if given, otherwise in the session build directory.
+    """
+    path = config.getoption("--artifacts") or get_build_path(config) / "artifacts"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def add_artifact(item, name: str, path: Path) -> None:
+    """Record an artifact file of a test item to be listed in its report
+
+    Args:
+        item: The test item
+        name: Description of the artifact (e.g. "wave")
+        path: The artifact file - normally in the :func:`artifacts_path` directory
+    """
+    path = Path(path).resolve()
+    if path.is_relative_to(CONFIG.root_path.resolve()):
+        path = path.relative_to(CONFIG.root_path.resolve())
+    item.stash.setdefault(ARTIFACTS, []).append((name, str(path)))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Add the artifacts and resource usage of a test to its report and the session statistics"""
+    outcome = yield
+    if call.when != "call":
+        return
+    report = outcome.get_result()
+    artifacts = item.stash.get(ARTIFACTS, None)
+    if artifacts:
+        report.user_properties.append(("artifacts", dict(artifacts)))
+        report.sections.append(
+            ("artifacts", "\n".join(f"{name}: {path}" for name, path in artifacts)))
+    usages = item.stash.get(USAGE, None)
+    if not usages:
+        return
+    usage = pyam.execute.total_usage(usages)
+    report.user_properties.append(("resources", usage))
+    report.sections.append(("resources", format_usage(usage)))
+    stats = session_stats(item.config, "resources")
+    for key in ("user", "system", "processes"):
+        stats[key] = stats.get(key, 0) + usage[key]
+
+
+def format_usage(usage: Dict) -> str:
+    """Return a one line description of resource usage (see :func:`pyam.execute.total_usage`)"""
+    return (f"user {usage['user']:.2f}s system {usage['system']:.2f}s"
+            f" ({usage['processes']} processes)")
+
+
+def nodeid_prefix(config) -> str:
+    """Return the path of the cohort test directory relative to the session rootdir
+
+    Sessions are run in the cohort test directory but nodeids are relative to
+    the rootdir, which depends on the arguments.
+
+    Returns:
+        The path ending in / (or empty if the same)
+    """
+    test_path = Path(config.invocation_params.dir).resolve()
+    rootpath = Path(config.rootpath).resolve()
+    if test_path != rootpath and test_path.is_relative_to(rootpath):
+        return test_path.relative_to(rootpath).as_posix() + "/"
+    return ""
+
+
+def relative_nodeid(nodeid: str, prefix: str) -> str:
+    """Return nodeid relative to the cohort test directory
+
+    Args:
+        nodeid: pytest nodeid (relative to the session rootdir)
+        prefix: path of cohort test directory relative to the rootdir ending in / (or empty)
+    """
+    if nodeid.startswith(prefix):
+        return nodeid[len(prefix):]
+    return nodeid
+
+
+class ResultsRecorder:
+    """pytest plugin recording structured results for the session
+
+    Registered by :func:`pytest_configure` when the --results option is given.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.path: Path = config.getoption("--results")
+        self.cohort_name: str = config.getoption("--cohort") or ""
+        self.prefix = nodeid_prefix(config)
+        self.start = time.time()
+        self.tests = {}
+        self.errors = {}
+
+    def pytest_runtest_logreport(self, report):
+        """Accumulate the reports for each phase of a test"""
+        nodeid = relative_nodeid(report.nodeid, self.prefix)
+        test = self.tests.setdefault(
+            nodeid, {"outcome": "passed", "when": "call", "duration": 0.0,
+                     "longrepr": "", "sections": {}})
+        test["duration"] += report.duration
+        if report.when == "call":
+            test["call_duration"] = report.duration
+        for title, content in report.sections:
+            test["sections"][title] = content
+        for name, value in report.user_properties:
+            if name in ("resources", "artifacts"):
+                test[name] = value
+        if report.failed or (report.skipped and test["outcome"] == "passed"):
+            test["outcome"] = report.outcome
+            test["when"] = report.when
+            test["longrepr"] = report.longreprtext
+
+    def pytest_collectreport(self, report):
+        """Record collection errors"""
+        if report.failed:
+            self.errors[relative_nodeid(report.nodeid, self.prefix)] = report.longreprtext
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        """Write results file"""
+        results = {
+            "cohort": self.cohort_name,
+            "student": self.config.getoption("--student"),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "exitstatus": int(exitstatus),
+            "duration": time.time() - self.start,
+            "tests": self.tests,
+            "errors": self.errors,
+            "stats": self.config.stash.get(STATS, {})
+        }
+        write_atomic(self.path, json.dumps(results, indent=1))
+
+
 # pylint: disable=W0621
 @pytest.fixture
 def cohort(request) -> pyam.cohort.Cohort:
@@ -47,9 +307,27 @@ def compiler(request) -> Union[str,Path]:
 
 
 @pytest.fixture
-def build_path() -> Path:
-    "*Fixture*: Directory path for out of source build (executables, libs and object files)"
-    return CONFIG.build_path
+def build_path(request) -> Path:
+    """*Fixture*: Directory path for out of source build (executables, libs and object files)
+
+    This is isolated per session - see :func:`get_build_path`"""
+    return get_build_path(request.config)
+
+
+@pytest.fixture
+def output_limit(cohort) -> OutputLimit:
+    """*Fixture*: Limits on the captured output of student programs
+
+    Set by the output.limit and output.keep configuration - see :mod:`pyam.execute`"""
+    return pyam.execute.output_limit(cohort)
+
+
+@pytest.fixture
+def resource_limit(cohort) -> ResourceLimit:
+    """*Fixture*: Limits on the resources (CPU time, memory and processes) used by student programs
+
+    Set by the limits configuration - see :mod:`pyam.execute`"""
+    return pyam.execute.resource_limit(cohort)
 
 
 @pytest.fixture
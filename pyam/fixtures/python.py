@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import Union
 import importlib
 import re
+from pyam.execute import run_bounded
+from pyam.fixtures.common import item_timeout
 
 
 class PythonRunError(Exception):
@@ -19,8 +21,10 @@ class PythonStyleError(Exception):
     "pylint Score too low"
 
 @pytest.fixture
-def run_script(student,request):
+def run_script(student,request,output_limit,resource_limit,build_path):
     """*Fixture*: A function to run a students python script.
+
+    Output beyond the :func:`output_limit` is truncated and the :func:`resource_limit` applied.
     
     The function takes the following arguments
 
@@ -38,12 +42,13 @@ def run_script(student,request):
     """
 
     marker = request.node.get_closest_marker("timeout")
-    timeout=10.0 if marker is None else marker.args[0]
+    timeout=item_timeout(request.node, 10.0 if marker is None else marker.args[0])
     def _run_script(script,stdin):
         # pylint: disable=W1510
         if not(isinstance(stdin,str)):
             stdin="\n".join([str(a) for a in stdin])+"\n"
-        result = run([sys.executable,student.path/script],capture_output=True,timeout=timeout,text=True,input=stdin)
+        result = run_bounded([sys.executable,student.path/script],timeout=timeout,input=stdin,
+                             limit=output_limit,spill=build_path,resources=resource_limit)
         if result.returncode !=0:
             raise PythonRunError(result.stderr)
         return result.stdout.strip()
@@ -10,11 +10,12 @@ Main testing fixtures:
     return a function to test synthesisis of a student VHDl design
 
 Support fixtures:
+  simulator: the configured :class:`Simulator` (vhdl.simulator - ghdl or nvc)
   ghdl: returns function to run the ghdl simulator
   vivdao: run function to run Vivado
 
 Configuration fixtures:
-  search_paths: paths to dsearch for ghdl and vviado executables (if no on path)
+  search_paths: paths to dsearch for simulator and vviado executables (if no on path)
   vivado_exec: the (found) vivado executable path
   ghdl_exec: the (found) ghdl executable path
   partnumber: Vivado parnumber to synthesise for
@@ -23,17 +24,33 @@ Configuration fixtures:
 
 """
 
+import sys
+import os
+import gzip
+import time
+import json
+import shutil
+import hashlib
+import tempfile
 import subprocess
 from subprocess import run
+from concurrent.futures import ThreadPoolExecutor
 import re
 from io import StringIO
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Sequence, Set, Union
 from datetime import datetime
 import pytest
-from pyam.files import find_executable
+from pyam.files import find_executable, get_depends
+from pyam.cunit import compiler_identity
+import pyam.execute
+from pyam.execute import run_bounded
 import pyam.cohort
-from pyam.config import CONFIG
+from pyam.vhdl_depends import AnalysisStamps, analysis_order, depends_graph, scan_units
+from pyam.fixtures.common import get_build_path, item_timeout, artifacts_path, add_artifact
+
+CLEANED = pytest.StashKey[Set[Path]]()
+SEARCH_PATHS = ("/usr/bin", "/opt/Xilinx/", "/usr/local/")
 
 
 class VHDLError(Exception):
@@ -52,16 +69,226 @@ class VHDLSynthesisError(VHDLError):
     "Error with VHDL Synthesis"
 
 
-@pytest.fixture(autouse=True)
-def clean(ghdl_exec, build_path) -> None:
-    "*Autouse Fixture*: Runsh ghdl --clean at start of test run"
-    run((ghdl_exec, "--clean", f"--workdir={build_path}"), check=True)
+class Simulator:
+    """A VHDL simulator backend
+
+    Subclasses implement analysis, elaboration and running of a design in a
+    working directory holding its work library. Failures raise
+    :class:`VHDLAnalysisError`, :class:`VHDLRunError` or :class:`VHDLError` (elaboration).
+
+    Attributes:
+        name (str): The name used to choose the simulator in configuration (vhdl.simulator)
+        wave_suffix (str): The suffix for wave files written by the simulator
+        options (Sequence[str]): Options given for each command (e.g. VHDL standard)
+        executable (Path): The simulator executable
+    """
+    name: str = None
+    wave_suffix: str = None
+    options: Sequence[str] = ()
+
+    def __init__(self, executable: Union[Path, str, None] = None,
+                 search_paths: Sequence[Union[Path, str]] = SEARCH_PATHS):
+        self.executable = Path(executable) if executable else \
+            find_executable(self.name, search_paths)
+
+    def identity(self) -> str:
+        """Return a string identifying the simulator - its path and version"""
+        return compiler_identity(str(self.executable))
+
+    def execute(self, stage: str, args: Sequence[str], workdir: Path,
+                timeout: Union[float, None] = None, output_limit=None, resource_limit=None):
+        """Run the simulator with args in workdir for a stage ("analyse", "elaborate" or "run")
+
+        Returns:
+          pyam.execute.BoundedProcess if successful
+
+        Raises:
+          VHDLAnalysisError: if analysis failed
+          VHDLRunError: if the simulation failed
+          VHDLError: if elaboration failed
+          subprocess.TimeoutExpired
+        """
+        result = run_bounded([self.executable, *args],
+                             cwd=workdir,
+                             timeout=timeout,
+                             limit=output_limit,
+                             spill=workdir,
+                             resources=resource_limit)
+        if result.returncode != 0:
+            msg = result.stdout + result.stderr
+            if stage == "analyse":
+                raise VHDLAnalysisError(msg)
+            if stage == "run":
+                raise VHDLRunError(msg)
+            raise VHDLError(f"{self.name} {stage} '{args[-1]}' {msg}")
+        return result
+
+    def analyse(self, path: Path, workdir: Path, timeout: Union[float, None] = None) -> None:
+        """Analyse a VHDL file into the work library in workdir"""
+        raise NotImplementedError
+
+    def elaborate(self, unit: str, workdir: Path, timeout: Union[float, None] = None) -> None:
+        """Elaborate a top level unit from the work library in workdir"""
+        raise NotImplementedError
+
+    def run(self, unit: str, workdir: Path, generics: Union[Dict[str, str], None] = None,
+            wave: Union[Path, None] = None, timeout: Union[float, None] = None,
+            output_limit=None, resource_limit=None, signals: Sequence[str] = (),
+            stop_time: Union[str, None] = None) -> None:
+        """Run the simulation of an elaborated unit until an error assertion or it finishes
+
+        Args:
+            unit: The top level unit
+            workdir: The working directory with the work library
+            generics: Values for top level generics by name
+            wave: File to write waves to (None for no waves)
+            signals: Signals to include in waves in the simulator syntax (default all)
+            stop_time: Simulation time to stop at e.g. "100us" (default no limit)
+            timeout: maximum execution time for the run
+            output_limit (OutputLimit): limits on captured output
+            resource_limit (ResourceLimit): limits on resources used
+        """
+        raise NotImplementedError
+
+    def clean(self, workdir: Path) -> None:
+        """Remove generated files (but not the work library) from workdir"""
+        raise NotImplementedError
+
+
+class GHDL(Simulator):
+    """The ghdl simulator"""
+    name = "ghdl"
+    wave_suffix = ".ghw"
+    options = ("--std=08", "--warn-no-hide")
+
+    def analyse(self, path, workdir, timeout=None):
+        self.execute("analyse", ["-a", *self.options, path], workdir, timeout)
+
+    def elaborate(self, unit, workdir, timeout=None):
+        self.execute("elaborate", ["-e", *self.options, unit], workdir, timeout)
+
+    def run(self, unit, workdir, generics=None, wave=None, timeout=None,
+            output_limit=None, resource_limit=None, signals=(), stop_time=None):
+        args = ["-r", *self.options, unit, "--assert-level=error"]
+        args += [f"-g{name}={value}" for name, value in (generics or {}).items()]
+        if wave:
+            args.append(f"--wave={wave}")
+            if signals:
+                options = Path(wave).with_suffix(".opt")
+                options.write_text("\n".join(["$ version 1.1", *signals]) + "\n")
+                args.append(f"--read-wave-opt={options}")
+        if stop_time:
+            args.append(f"--stop-time={stop_time}")
+        self.execute("run", args, workdir, timeout, output_limit, resource_limit)
+
+    def clean(self, workdir):
+        run((self.executable, "--clean", f"--workdir={workdir}"), check=True)
+
+
+class NVC(Simulator):
+    """The nvc simulator
+
+    Generics are set at elaboration so a run with generics elaborates the unit
+    again (just in time, without saving it to the work library).
+    """
+    name = "nvc"
+    wave_suffix = ".fst"
+    options = ("--std=2008",)
+
+    def analyse(self, path, workdir, timeout=None):
+        self.execute("analyse", [*self.options, "-a", path], workdir, timeout)
+
+    def elaborate(self, unit, workdir, timeout=None):
+        self.execute("elaborate", [*self.options, "-e", unit], workdir, timeout)
+
+    def run(self, unit, workdir, generics=None, wave=None, timeout=None,
+            output_limit=None, resource_limit=None, signals=(), stop_time=None):
+        args = [*self.options]
+        if generics:
+            args += ["-e", "--jit", "--no-save",
+                     *[f"-g{name}={value}" for name, value in generics.items()], unit, "-r"]
+        else:
+            args += ["-r", unit]
+        args.append("--exit-severity=error")
+        if wave:
+            args.append(f"--wave={wave}")
+            args += [f"--include={signal}" for signal in signals]
+        if stop_time:
+            args.append(f"--stop-time={stop_time}")
+        self.execute("run", args, workdir, timeout, output_limit, resource_limit)
+
+    def clean(self, workdir):
+        for path in Path(workdir).glob("*.fst"):
+            path.unlink()
+
+
+SIMULATORS = {simulator.name: simulator for simulator in (GHDL, NVC)}
+
+
+def get_simulator(name: str = "ghdl",
+                  search_paths: Sequence[Union[Path, str]] = SEARCH_PATHS) -> Simulator:
+    """Return the named simulator
+
+    Raises:
+        ValueError: if the simulator is not supported
+        FileNotFoundError: if its executable is not found
+    """
+    if name not in SIMULATORS:
+        raise ValueError(f"Unknown VHDL simulator '{name}' - one of {', '.join(SIMULATORS)}")
+    return SIMULATORS[name](search_paths=search_paths)
+
+
+def simulate_testbench(simulator: Simulator, testbench: Path, files: Sequence[Path],
+                       workdir: Path, values: Sequence[str] = (),
+                       timeout: Union[float, None] = None) -> Dict[str, float]:
+    """Analyse files in dependency order, elaborate a testbench and run it for each test value
+
+    Args:
+        simulator: The simulator
+        testbench: The testbench file - the top level unit is its stem
+        files: The files to analyse (including the testbench)
+        workdir: The working directory for the work library
+        values: Values for the PYAM_TEST_VALUE generic - one run each (or one run if empty)
+        timeout: maximum execution time for each command
+
+    Returns:
+        The times in seconds taken for each stage ("analyse", "elaborate" and "run")
+    """
+    times = {}
+    start = time.perf_counter()
+    for path in analysis_order(files):
+        simulator.analyse(path, workdir, timeout)
+    times["analyse"] = time.perf_counter() - start
+    start = time.perf_counter()
+    simulator.elaborate(testbench.stem, workdir, timeout)
+    times["elaborate"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for value in values or [None]:
+        simulator.run(testbench.stem, workdir, timeout=timeout,
+                      generics={"PYAM_TEST_VALUE": value} if value else None)
+    times["run"] = time.perf_counter() - start
+    return times
 
 
 @pytest.fixture
 def search_paths() -> List[str]:
     "*Fixture*: A list of additional paths to search for the executables"
-    return ("/usr/bin", "/opt/Xilinx/", "/usr/local/")
+    return SEARCH_PATHS
+
+
+@pytest.fixture
+def simulator(cohort, search_paths) -> Simulator:
+    "*Fixture*: The VHDL simulator chosen by the vhdl.simulator configuration"
+    return get_simulator(cohort.get("vhdl.simulator"), search_paths)
+
+
+@pytest.fixture(autouse=True)
+def clean(pytestconfig, simulator, build_path) -> None:
+    "*Autouse Fixture*: Cleans the simulator files once per build path at start of test run"
+    cleaned = pytestconfig.stash.setdefault(CLEANED, set())
+    if build_path not in cleaned:
+        simulator.clean(build_path)
+        cleaned.add(build_path)
 
 
 @pytest.fixture
@@ -94,7 +321,9 @@ def run_ghdl(command,
              options=("--std=08", "--warn-no-hide"),
              build_path="./",
              run_options=(),
-             timeout=None):
+             timeout=None,
+             output_limit=None,
+             resource_limit=None):
     """Run the ghdl command
     Args:
       ghdl_exec (Union[Path|str]): ghdl executable
@@ -105,6 +334,8 @@ def run_ghdl(command,
       run_options (Sequence[str]): Additional run time ghdl options to give after unit
       build_path Union[Path|str]): Path where test executable is to be built
       timeout (Union[float|None]): maximum execution time for the run
+      output_limit (OutputLimit): limits on captured output (default :mod:`pyam.execute` defaults)
+      resource_limit (ResourceLimit): limits on resources used (default none)
 
     Returns:
       subprocess.CompletedProcess if successful
@@ -115,20 +346,17 @@ def run_ghdl(command,
       VHDLError: if ghdl failed but netiehr of above commands
       subprocess.TimeoutExpired
     """
-    #pylint: disable=subprocess-run-check
     #DEBUG: print(ghdl_exec, command, *options, unit,*run_options)
     if unit:
-        result = run([ghdl_exec, command, *options, unit,*run_options],
-                    cwd=build_path,
-                    text=True,
-                    capture_output=True,
-                    timeout=timeout)
+        args = [ghdl_exec, command, *options, unit, *run_options]
     else:
-        result = run([ghdl_exec, command],
-                    cwd=build_path,
-                    text=True,
-                    capture_output=True,
-                    timeout=timeout)
+        args = [ghdl_exec, command]
+    result = run_bounded(args,
+                         cwd=build_path,
+                         timeout=timeout,
+                         limit=output_limit,
+                         spill=build_path,
+                         resources=resource_limit)
     if result.returncode != 0:
         msg = result.stdout + result.stderr
         if command == "-a":
@@ -140,10 +368,12 @@ def run_ghdl(command,
 
 
 @pytest.fixture
-def ghdl(ghdl_exec, ghdl_options, build_path, request):
+def ghdl(ghdl_exec, ghdl_options, build_path, request, output_limit, resource_limit):
     """*Fixture*: A function to run a test using ghdl.
 
-    The timeout marker is honoured to limit maximum execution time if appropriate
+    The timeout marker is honoured to limit maximum execution time if appropriate,
+    output beyond the :func:`output_limit` is truncated and the :func:`resource_limit`
+    applied to simulations.
 
     Args:
       command (str): the ghdl command string to use
@@ -169,7 +399,9 @@ def ghdl(ghdl_exec, ghdl_options, build_path, request):
                  options=options,
                  run_options=run_options,
                  build_path=build_path,
-                 timeout=timeout)
+                 timeout=timeout,
+                 output_limit=output_limit,
+                 resource_limit=resource_limit if command in ("--elab-run", "-r") else None)
         # result = run(
         #     [
         #         ghdl_exec, command, *options, f"--workdir={build_path}", unit,
@@ -192,9 +424,10 @@ def ghdl(ghdl_exec, ghdl_options, build_path, request):
 
 
 @pytest.fixture
-def vhdl_simulate(ghdl, student, test_path):
+def vhdl_simulate(simulator, student, test_path, build_path, request, output_limit,
+                  resource_limit):
     """*Fixture*: A function to analyse student against tutors testbench.
-    Uses ghdl fixture to run synthesis
+    Uses the :func:`simulator` fixture to run the simulation, honouring the timeout marker.
 
     Args:
       top (str): the top level (tutors) testbench filename to run
@@ -203,21 +436,26 @@ def vhdl_simulate(ghdl, student, test_path):
                   e.g. to provide working implementations for student work to use
 
     Raises:
-       see :func:`ghdl`:
+       see :meth:`Simulator.execute`
 """
 
+    marker = request.node.get_closest_marker("timeout")
+    timeout = None if marker is None else marker.args[0]
+
     def _vhdl_simulate(top, student_files, test_files=None):
         if test_files is None:
-            ghdl("-a", test_path / f"{top}.vhd")
+            simulator.analyse(test_path / f"{top}.vhd", build_path, timeout)
         for file in student_files:
-            ghdl("-a", student.file(file))
+            simulator.analyse(student.file(file), build_path, timeout)
         if test_files is not None:
             for file in test_files:
-                ghdl("-a", test_path / file)
+                simulator.analyse(test_path / file, build_path, timeout)
         try:
-            ghdl("--elab-run", top, run_options=["--assert-level=error"])
+            simulator.elaborate(top, build_path, timeout)
+            simulator.run(top, build_path, timeout=timeout, output_limit=output_limit,
+                          resource_limit=resource_limit)
         except VHDLError as err:
-            assert True, err.args[0]
+            pytest.fail(err.args[0])
 
     return _vhdl_simulate
 
@@ -266,15 +504,15 @@ def vivado(request, vivado_exec, build_path, student, vivado_options,
         )
         tcl.write(f"write_bitstream -force {bitfile}\n")
         tcl = tcl.getvalue()
-        result = run([
+        # output is searched for errors so is not truncated
+        result = run_bounded([
             vivado_exec, *vivado_options, "-log", build_path / "synth.log",
             "-tempDir", build_path, "-mode", "tcl"
         ],
                      cwd=student.path,
-                     capture_output=True,
-                     text=True,
                      timeout=timeout,
-                     input=tcl)
+                     input=tcl,
+                     limit=pyam.execute.OutputLimit(sys.maxsize, sys.maxsize))
         no_errors=0
         errors=[]
         # collect all unique error lines
@@ -329,13 +567,23 @@ def pytest_collect_file(parent, path) -> List:
 
     They may also contain a -- PYAM_TIMEOUT <float
 
-    Multiple tests can be instantiated per testbench using a PYAM_TEST generic,
-    Where the values are specified in a -- PYAM_TEST_VALUES comment
+    Other tutor files the testbench needs may be listed using -- PYAM_DEPENDS "filename"+
+
+    Multiple tests can be instantiated per testbench using a PYAM_TEST_VALUE generic,
+    Where the values are specified in -- PYAM_TEST_VALUE comments (one per line)
 
     Tests are recognised as symbols matching "TEST_[A-Z0-9_]+"
 
     A test timeout may be specified using -- PYAM_TIMEOUT <float>
 
+    The tutor files (dependencies and testbench) are analysed once per cohort into
+    a library which is copied for each student - see :meth:`VHDLTestFile.tutor_library`.
+    The student files are analysed in dependency order, and only when they have changed,
+    and the testbench elaborated once for all the tests in the file, which are then each
+    a run of the simulation with their generic value.
+    If analysis or elaboration fails the errors are reported for the first test only
+    and the others fail referring to it.
+
     Returns:
         List of  tuples of filepath and a list of tests declarations.
     """
@@ -358,15 +606,16 @@ class VHDLTestFile(pytest.File):
         test_globs (str): The string from -- PYAM_TEST "glob"+ - glob sto find student file(s)
         timeout (fload): timout in seconds specified using -- PYAM_TIMEOUT <float>
         tests (list): List of tests to be performed set usuing -- PYAM_TEST_VALUE value
-              These will be passed as PYAM_TEST generci value using -gPYAM_TEST=VALUE
-              If not specified file is executed as a single test item
+              These will be passed as PYAM_TEST_VALUE generic value using -gPYAM_TEST_VALUE=VALUE
+              If not specified file is executed as a single test item.
+              The simulations are run vhdl.jobs at a time in parallel if configured.
         cohort: Student cohort under for test
         student: student under test
         uut_path (Path): first file in student directory matching glob
     """
     RE_TEST = re.compile(r'--\s+PYAM_TEST\s+\"(.*?)\"(?:[,\s]+\"(.*)\")*')
     RE_TIMEOUT = re.compile(r'--\s+PYAM_TIMEOUT\s+(.+)')
-    RE_TEST_VALUE = re.compile(r'--\s+PYAM_TEST_VALUE\s+(.+)$')
+    RE_TEST_VALUE = re.compile(r'--\s+PYAM_TEST_VALUE\s+(.+)$', re.MULTILINE)
     RE_DEPENDS = re.compile(r'--\s+PYAM_DEPENDS\s+\"(.*?)\"(?:[,\s]+\"(.*)\")*')
     # attributes from initialisation
     text: str
@@ -377,21 +626,31 @@ class VHDLTestFile(pytest.File):
     # attributes after configure
     cohort: pyam.cohort.Cohort = None
     student: pyam.cohort.Student = None
+    simulator: Simulator = None
     uut_paths: List[Path]
 
+    @classmethod
+    def parse(cls, text: str) -> Dict:
+        """Return the attributes set by the PYAM definitions in test file text"""
+        options = {"test_globs": cls.RE_TEST.findall(text)[0],
+                   "test_values": cls.RE_TEST_VALUE.findall(text)}
+        match = cls.RE_TIMEOUT.search(text)
+        if match:
+            options["test_timeout"] = float(match.group(1))
+        match = cls.RE_DEPENDS.findall(text)
+        if match:
+            options["test_depends"] = match[0]
+        return options
+
     @classmethod
     def from_parent(cls, parent, *, fspath=None, path=None, text="", **kw):
         """Class constructor as required by pytest"""
         self = super().from_parent(parent=parent, fspath=fspath, path=path, **kw)
         self.text =  text
-        self.test_globs = self.RE_TEST.findall(self.text)[0]
-        match = self.RE_TIMEOUT.search(self.text)
-        if match:
-            self.test_timeout = float(match.group(1))
-        self.test_values = self.RE_TEST_VALUE.findall(self.text)
-        match = self.RE_DEPENDS.findall(self.text)
-        if match:
-            self.test_depends=match[0]
+        for name, value in self.parse(text).items():
+            setattr(self, name, value)
+        self._analysed = None
+        self._runs = None
         return self
 
     def collect(self):
@@ -401,7 +660,7 @@ class VHDLTestFile(pytest.File):
         """
         if self.test_values:
             for test in self.test_values:
-                yield VHDLTestItem.from_parent(parent=self, name=test, test=test)
+                yield VHDLTestItem.from_parent(parent=self, name=test, test_generic=test)
         else:
             yield VHDLTestItem.from_parent(parent=self, name=self.path.name)
 
@@ -415,6 +674,7 @@ class VHDLTestFile(pytest.File):
         self.cohort = pyam.cohort.get_cohort(config.getoption("--cohort"))
         if not config.getoption("--student"):
             return # if no student collecting tests only
+        self.simulator = get_simulator(self.cohort.get("vhdl.simulator"))
         self.student = self.cohort.students(config.getoption("--student"))
         self.uut_paths=[]
         for glob in self.test_globs:
@@ -432,36 +692,215 @@ class VHDLTestFile(pytest.File):
                         glob, self.student.name(), self.uut_paths)
 
 
+    def tutor_files(self) -> List[Path]:
+        """Return the tutor files - the dependencies then the testbench"""
+        return [self.path.with_name(filename) for filename in self.test_depends
+                if filename] + [self.path]
+
+    def shared_tutor_files(self) -> List[Path]:
+        """Return the tutor files which can be analysed without student files in analysis order
+
+        These are the files which only reference units declared in the tutor files,
+        e.g. a testbench using a component for the unit under test.
+        """
+        files = analysis_order(self.tutor_files())
+        units = {path: scan_units(path) for path in files}
+        declared = set().union(*(declares for declares, _, _ in units.values()))
+        graph = depends_graph(files, components=False)
+        shared = []
+        for path in files:
+            if not units[path][1] - declared and \
+               all(dependency in shared for dependency in get_depends(path, graph)[:-1]):
+                shared.append(path)
+        return shared
+
+    def tutor_library(self) -> Path:
+        """Return directory of the shared tutor files analysed into a work library for the cohort
+
+        The library is built once and shared by all students, in the cohort cache
+        under a key of the tutor file contents and the simulator version, so it is only
+        rebuilt when these change. It is read only - copy it to use it.
+
+        Raises:
+            VHDLAnalysisError: if a tutor file failed analysis
+        """
+        files = self.shared_tutor_files()
+        key = hashlib.sha256(json.dumps((
+            self.simulator.identity(),
+            [[str(path), hashlib.sha256(path.read_bytes()).hexdigest()] for path in files]
+        )).encode("utf-8")).hexdigest()
+        cache = self.cohort.cache_path / self.simulator.name
+        library = cache / f"{self.path.stem}-{key[:16]}"
+        if library.exists():
+            return library
+        cache.mkdir(exist_ok=True)
+        temp = Path(tempfile.mkdtemp(dir=cache, prefix=f".{self.path.stem}-"))
+        try:
+            for path in files:
+                self.simulator.analyse(path, temp, self.test_timeout)
+            for directory, _, filenames in os.walk(temp):
+                Path(directory).chmod(0o755)
+                for filename in filenames:
+                    (Path(directory) / filename).chmod(0o444)
+            os.rename(temp, library)
+        except OSError:
+            # built concurrently by another session
+            if not library.exists():
+                raise
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+        for stale in cache.glob(f"{self.path.stem}-*"):
+            if stale != library:
+                shutil.rmtree(stale, ignore_errors=True)
+        return library
+
+    def student_library(self) -> Path:
+        """Return directory where the student's analysed library for this file is kept between runs"""
+        return (self.cohort.cache_path / self.simulator.name / "students" /
+                self.student.username / self.path.stem)
+
+    def analyse(self, item) -> Path:
+        """Analyse the student files and elaborate the testbench once for all items
+
+        Analysis is in a working directory for this file, starting from a copy of the
+        student's library from their last run (or of the :meth:`tutor_library`). The
+        student files, and any tutor files which reference their units, are analysed in
+        dependency order skipping files which, along with the files they depend on, are
+        unchanged since they were analysed into the library - see
+        :class:`pyam.vhdl_depends.AnalysisStamps`. If it fails the errors are reported for
+        item (the first to run) and each later item fails referring to it without
+        analysing again.
+
+        Returns:
+            The working directory
+        """
+        if self._analysed is None:
+            workdir = get_build_path(self.config) / self.path.stem
+            shutil.rmtree(workdir, ignore_errors=True)
+            try:
+                if not self.uut_paths:
+                    raise VHDLAnalysisError("No UUT file found")
+                library = self.tutor_library()
+                store = self.student_library()
+                if store.exists():
+                    shutil.copytree(store, workdir, copy_function=shutil.copyfile)
+                stamps = AnalysisStamps(workdir, library.name)
+                if not stamps.keys:
+                    shutil.rmtree(workdir, ignore_errors=True)
+                    shutil.copytree(library, workdir, copy_function=shutil.copyfile)
+                shared = self.shared_tutor_files()
+                files = [*self.tutor_files(), *self.uut_paths]
+                graph = depends_graph(files)
+                changed = False
+                for path in analysis_order(files, graph):
+                    if path in shared:
+                        continue
+                    key = stamps.key(path, graph)
+                    if stamps.current(path, key):
+                        continue
+                    self.simulator.analyse(path, workdir, self.test_timeout)
+                    stamps.update(path, key)
+                    changed = True
+                if changed:
+                    stamps.save()
+                    self.save_library(workdir, store)
+                self.simulator.elaborate(self.path.stem, workdir, self.test_timeout)
+            except (VHDLError, subprocess.TimeoutExpired) as err:
+                self._analysed = (err, item.name)
+                raise
+            self._analysed = workdir
+        if isinstance(self._analysed, tuple):
+            raise VHDLAnalysisError(
+                f"Analysis or elaboration failed - see {self._analysed[1]} for the errors")
+        return self._analysed
+
+    @staticmethod
+    def save_library(workdir: Path, store: Path) -> None:
+        """Replace the library kept in store with a copy of the analysed library in workdir"""
+        store.parent.mkdir(parents=True, exist_ok=True)
+        temp = Path(tempfile.mkdtemp(dir=store.parent, prefix=f".{store.name}-"))
+        try:
+            shutil.copytree(workdir, temp, dirs_exist_ok=True)
+            shutil.rmtree(store, ignore_errors=True)
+            os.rename(temp, store)
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    def simulate(self, item, timeout, wave: Union[Path, None] = None):
+        """Run the elaborated testbench for a test item
+
+        Waves are only written if a wave file is given, limited to the vhdl.wave.signals
+        and vhdl.wave.stop-time configured.
+        """
+        workdir = self.analyse(item)
+        generics = None
+        if item.test_generic:
+            generics = {"PYAM_TEST_VALUE": item.test_generic}
+        options = {}
+        if wave:
+            signals = self.cohort.get("vhdl.wave.signals") or ()
+            options = {"signals": [signals] if isinstance(signals, str) else signals,
+                       "stop_time": self.cohort.get("vhdl.wave.stop-time")}
+        self.simulator.run(self.path.stem,
+                           workdir,
+                           generics=generics,
+                           wave=wave,
+                           timeout=timeout,
+                           output_limit=pyam.execute.output_limit(self.cohort),
+                           resource_limit=pyam.execute.resource_limit(self.cohort),
+                           **options)
+
+    def capture_waves(self, item):
+        """Simulate a failed test item again writing waves and store them as an artifact
+
+        The waves are gzip compressed into the session artifacts directory - see
+        :func:`pyam.fixtures.common.add_artifact`. Only done if vhdl.wave.failed is set.
+        """
+        if not self.cohort.get("vhdl.wave.failed"):
+            return
+        name = self.path.stem + (f"-{item.test_generic}" if item.test_generic else "")
+        wave = self.analyse(item) / f"{name}{self.simulator.wave_suffix}"
+        try:
+            self.simulate(item, item_timeout(item, self.test_timeout), wave)
+        except (VHDLError, subprocess.TimeoutExpired):
+            pass  # expected to fail again
+        if not wave.exists():
+            return
+        artifact = artifacts_path(self.config) / f"{wave.name}.gz"
+        with open(wave, "rb") as source, gzip.open(artifact, "wb") as destination:
+            shutil.copyfileobj(source, destination)
+        wave.unlink()
+        add_artifact(item, "wave", artifact)
+
     def run_test(self, item):
-        "Run a VHDL test item"
-        # analyse test dependencies before running tests
+        """Run a VHDL test item
+
+        If vhdl.jobs is more than 1 the first item to run starts the simulations for all
+        the items of this file in parallel and each item waits for its own. The item
+        durations then don't reflect the simulation times so calibrated timeouts are not used.
+
+        Simulations are run without waves - if one fails it is run again to capture them
+        (see :meth:`capture_waves`).
+        """
         #DEBUG: print("VHDL Test File", self.path)
         #DEBUG: print("UUT Fles:",self.uut_paths)
-        run_ghdl("--remove")
-        assert self.uut_paths,"No UUT file found"
-        for filename in self.test_depends:
-            if filename:
-                run_ghdl(command="-a", unit=self.path.with_name(filename),
-                         build_path=CONFIG.build_path,
-                         timeout=self.test_timeout)
-        run_options = []
-        if item.test_generic:
-            run_options = ["-gPYAM_TEST_VALUE={item.test_generic}"]
-        run_ghdl(command="-a", unit=self.path,
-                 build_path=CONFIG.build_path,
-                 timeout=self.test_timeout)
-        for uut in self.uut_paths:
-            if uut:
-                run_ghdl(command="-a",
-                        unit=uut,
-                        build_path=CONFIG.build_path,
-                        timeout=self.test_timeout)
-        run_ghdl(command="--elab-run",
-                 unit=self.path.stem,
-                 build_path=CONFIG.build_path,
-                 run_options=["--assert-level=error", *run_options,
-                              f"--wave={CONFIG.build_path/uut.stem}.ghw"],
-                 timeout=self.test_timeout)
+        self.analyse(item)
+        jobs = int(self.cohort.get("vhdl.jobs") or 1)
+        try:
+            if jobs <= 1 or not self.test_values:
+                self.simulate(item, item_timeout(item, self.test_timeout))
+                return
+            if self._runs is None:
+                items = [other for other in item.session.items if other.parent is self]
+                executor = ThreadPoolExecutor(max_workers=jobs)
+                self._runs = {other.name: executor.submit(self.simulate, other, self.test_timeout)
+                              for other in items}
+                # the other items wait for their own simulations
+                executor.shutdown(wait=False)
+            self._runs[item.name].result()
+        except VHDLRunError:
+            self.capture_waves(item)
+            raise
 
 
 class VHDLTestItem(pytest.Item):
@@ -470,9 +909,9 @@ class VHDLTestItem(pytest.Item):
     test_generic = None
 
     @classmethod
-    def from_parent(cls, parent, **kw):
+    def from_parent(cls, parent, *, test_generic=None, **kw):
         self = super().from_parent(parent=parent, **kw)
-        self.test_generic = kw.get("test", None)
+        self.test_generic = test_generic
         return self
 
     def runtest(self):
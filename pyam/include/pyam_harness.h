@@ -0,0 +1,241 @@
+/* Copyright 2023, Dr John A.R. Williams
+ * SPDX-License-Identifier: GPL-3.0-only
+ *
+ * pyAutoMark fork-server C test harness (POSIX only).
+ *
+ * Include this header in a C test file (one with #define PYAM_TEST "glob") to
+ * define many test cases which are all run by a single launch of the test
+ * binary. The harness provides main(), which forks a child for each case so
+ * that a crash or timeout in one case does not affect the others, and writes
+ * a structured result record for each case to stdout. pyAutoMark reports each
+ * case as its own test item.
+ *
+ *   #define PYAM_TEST "add.c"
+ *   #define PYAM_TIMEOUT 1.0
+ *   #include "pyam_harness.h"
+ *
+ *   PYAM_CASE(add_small) { PYAM_ASSERT(add(1, 2) == 3); }
+ *   PYAM_CASES(add_table, 100) {
+ *       PYAM_ASSERT_INT(add(pyam_case_index, 1), pyam_case_index + 1);
+ *   }
+ *
+ * PYAM_CASES(name, N) defines cases name[0] ... name[N-1] with the index in
+ * pyam_case_index. N must be an integer literal so the cases can be collected
+ * without compiling. PYAM_TIMEOUT, if defined, is the timeout for each case.
+ *
+ * The binary runs the cases named in its arguments, or all if none are given.
+ * The record for each case is the line
+ *   PYAM_CASE <name> <outcome> <detail> <length>
+ * followed by length bytes of the case's captured stdout and stderr, where
+ * outcome is passed, failed, crashed, timeout, exceeded (output limit) or error.
+ *
+ * At run time the environment variables PYAM_CASE_TIMEOUT (seconds),
+ * PYAM_CASE_OUTPUT_LIMIT (bytes of output after which a case is killed) and
+ * PYAM_CASE_OUTPUT_KEEP (bytes of output kept, at most PYAM_MAX_OUTPUT) apply
+ * to each case.
+ */
+#ifndef PYAM_HARNESS_H
+#define PYAM_HARNESS_H
+
+#include <errno.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/time.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+#ifndef PYAM_MAX_CASES
+#define PYAM_MAX_CASES 1024
+#endif
+
+/* Maximum captured output kept per case in bytes */
+#ifndef PYAM_MAX_OUTPUT
+#define PYAM_MAX_OUTPUT 65536
+#endif
+
+/* Output kept and output after which a case is killed (0 for no limit) */
+static size_t pyam_output_keep = PYAM_MAX_OUTPUT;
+static unsigned long long pyam_output_limit = 0;
+
+typedef void (*pyam_case_fn)(int);
+
+struct pyam_case {
+    const char *name;
+    pyam_case_fn fn;
+    int count; /* 0 for a single unindexed case */
+};
+
+static struct pyam_case pyam_cases[PYAM_MAX_CASES];
+static int pyam_ncases = 0;
+
+static void pyam_register(const char *name, pyam_case_fn fn, int count) {
+    if (pyam_ncases < PYAM_MAX_CASES) {
+        pyam_cases[pyam_ncases].name = name;
+        pyam_cases[pyam_ncases].fn = fn;
+        pyam_cases[pyam_ncases].count = count;
+        pyam_ncases++;
+    }
+}
+
+#define PYAM_CASES(name, n)                                                   \
+    static void pyam_case_##name(int pyam_case_index);                        \
+    __attribute__((constructor)) static void pyam_register_##name(void) {     \
+        pyam_register(#name, pyam_case_##name, (n));                          \
+    }                                                                         \
+    static void pyam_case_##name(int pyam_case_index)
+
+#define PYAM_CASE(name) PYAM_CASES(name, 0)
+
+#define PYAM_FAIL(...)                                                        \
+    do {                                                                      \
+        fflush(stdout);                                                       \
+        fprintf(stderr, "%s:%d: ", __FILE__, __LINE__);                       \
+        fprintf(stderr, __VA_ARGS__);                                         \
+        fprintf(stderr, "\n");                                                \
+        fflush(stderr);                                                       \
+        _exit(1);                                                             \
+    } while (0)
+
+#define PYAM_ASSERT(cond)                                                     \
+    do {                                                                      \
+        if (!(cond))                                                          \
+            PYAM_FAIL("assertion failed: %s", #cond);                         \
+    } while (0)
+
+#define PYAM_ASSERT_INT(actual, expected)                                     \
+    do {                                                                      \
+        long long pyam_actual_ = (long long)(actual);                         \
+        long long pyam_expected_ = (long long)(expected);                     \
+        if (pyam_actual_ != pyam_expected_)                                   \
+            PYAM_FAIL("%s is %lld, expected %lld", #actual, pyam_actual_,     \
+                      pyam_expected_);                                        \
+    } while (0)
+
+static int pyam_selected(const char *name, int argc, char *argv[]) {
+    int i;
+    if (argc < 2)
+        return 1;
+    for (i = 1; i < argc; i++)
+        if (strcmp(argv[i], name) == 0)
+            return 1;
+    return 0;
+}
+
+static void pyam_record(const char *name, const char *outcome, const char *detail,
+                        const char *output, size_t length) {
+    printf("PYAM_CASE %s %s %s %lu\n", name, outcome, detail, (unsigned long)length);
+    if (length)
+        fwrite(output, 1, length, stdout);
+    fflush(stdout);
+}
+
+static void pyam_run_case(const char *name, pyam_case_fn fn, int index, double timeout) {
+    static char output[PYAM_MAX_OUTPUT];
+    char buffer[4096], detail[32];
+    size_t length = 0;
+    unsigned long long total = 0;
+    ssize_t count;
+    int fds[2], status, exceeded = 0;
+    pid_t pid;
+
+    if (pipe(fds) != 0) {
+        pyam_record(name, "error", "pipe", NULL, 0);
+        return;
+    }
+    fflush(stdout);
+    fflush(stderr);
+    pid = fork();
+    if (pid < 0) {
+        close(fds[0]);
+        close(fds[1]);
+        pyam_record(name, "error", "fork", NULL, 0);
+        return;
+    }
+    if (pid == 0) {
+        close(fds[0]);
+        dup2(fds[1], STDOUT_FILENO);
+        dup2(fds[1], STDERR_FILENO);
+        close(fds[1]);
+        if (timeout > 0) {
+            struct itimerval timer;
+            memset(&timer, 0, sizeof(timer));
+            timer.it_value.tv_sec = (long)timeout;
+            timer.it_value.tv_usec = (long)((timeout - (long)timeout) * 1e6);
+            setitimer(ITIMER_REAL, &timer, NULL);
+        }
+        fn(index);
+        fflush(stdout);
+        fflush(stderr);
+        _exit(0);
+    }
+    close(fds[1]);
+    /* read all output (to avoid blocking the child) keeping only the start
+       and killing the child if it exceeds the output limit */
+    while ((count = read(fds[0], buffer, sizeof(buffer))) != 0) {
+        if (count < 0) {
+            if (errno == EINTR)
+                continue;
+            break;
+        }
+        if (length < pyam_output_keep) {
+            size_t keep = (size_t)count < pyam_output_keep - length
+                              ? (size_t)count : pyam_output_keep - length;
+            memcpy(output + length, buffer, keep);
+            length += keep;
+        }
+        total += (unsigned long long)count;
+        if (pyam_output_limit && total > pyam_output_limit) {
+            kill(pid, SIGKILL);
+            exceeded = 1;
+            break;
+        }
+    }
+    close(fds[0]);
+    while (waitpid(pid, &status, 0) < 0 && errno == EINTR)
+        ;
+    if (exceeded) {
+        snprintf(detail, sizeof(detail), "output>%llu", pyam_output_limit);
+        pyam_record(name, "exceeded", detail, output, length);
+    } else if (WIFEXITED(status)) {
+        snprintf(detail, sizeof(detail), "exit=%d", WEXITSTATUS(status));
+        pyam_record(name, WEXITSTATUS(status) ? "failed" : "passed", detail, output, length);
+    } else if (WIFSIGNALED(status) && WTERMSIG(status) == SIGALRM) {
+        snprintf(detail, sizeof(detail), "timeout=%g", timeout);
+        pyam_record(name, "timeout", detail, output, length);
+    } else {
+        snprintf(detail, sizeof(detail), "signal=%d", WIFSIGNALED(status) ? WTERMSIG(status) : 0);
+        pyam_record(name, "crashed", detail, output, length);
+    }
+}
+
+int main(int argc, char *argv[]) {
+    const char *env = getenv("PYAM_CASE_TIMEOUT");
+    double timeout = env ? atof(env) : 0.0;
+    char name[256];
+    int i, j;
+
+    env = getenv("PYAM_CASE_OUTPUT_LIMIT");
+    if (env)
+        pyam_output_limit = strtoull(env, NULL, 10);
+    env = getenv("PYAM_CASE_OUTPUT_KEEP");
+    if (env && strtoull(env, NULL, 10) < PYAM_MAX_OUTPUT)
+        pyam_output_keep = (size_t)strtoull(env, NULL, 10);
+
+    for (i = 0; i < pyam_ncases; i++) {
+        int count = pyam_cases[i].count;
+        for (j = 0; j < (count ? count : 1); j++) {
+            if (count)
+                snprintf(name, sizeof(name), "%s[%d]", pyam_cases[i].name, j);
+            else
+                snprintf(name, sizeof(name), "%s", pyam_cases[i].name);
+            if (pyam_selected(name, argc, argv))
+                pyam_run_case(name, pyam_cases[i].fn, j, timeout);
+        }
+    }
+    return 0;
+}
+
+#endif /* PYAM_HARNESS_H */
@@ -0,0 +1,236 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Linting of student C files using clang-tidy with a result cache.
+
+clang-tidy results are cached per cohort, keyed on the file path and content,
+the preprocessed translation unit (so that changes to included headers are
+seen), the checks, the compile flags and the clang-tidy version, so each file
+is only linted again when it or a header it includes changes. All lint callers
+use the include paths from :func:`lint_includes` and, unless a test file sets
+others, the flags :data:`DEFAULT_CFLAGS` so that they share results.
+:func:`lint_cohort` lints the files for all the C test files with a PYAM_LINT
+definition (see :mod:`pyam.fixtures.clang`) across a set of students in
+parallel, using a generated compile_commands.json, so that the lint test items
+then only need to read the cache.
+
+Classes
+
+  :class:`LintCache`
+    Cache of clang-tidy results for a cohort
+
+Functions
+
+  :func:`lint_cohort`
+    Lint the student files for a cohort in parallel
+  :func:`lint_includes`
+    The include paths used to lint a student's files
+  :func:`write_compile_commands`
+    Write a compile_commands.json compilation database
+  :func:`warning_count`
+    The number of warnings reported by clang-tidy
+"""
+import re
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Sequence, Tuple, Union
+from pyam.files import write_atomic
+
+#: clang-tidy command
+CLANG_TIDY = "clang-tidy"
+
+#: Compiler used to preprocess files for cache keys (as in the compilation database)
+COMPILER = "cc"
+
+#: Compile flags used for linting when a test does not specify its own
+DEFAULT_CFLAGS = ["-Wall", "-std=gnu99"]
+
+#: A lint task - source file, checks, include paths and compile flags
+LintTask = Tuple[Path, str, Sequence[Path], Sequence[str]]
+
+
+def warning_count(output: str) -> int:
+    """Return the number of warnings from the "N warnings generated." lines of clang-tidy output"""
+    return sum(int(count) for count in re.findall(r"(\d+) warnings? generated", output))
+
+
+@functools.lru_cache(maxsize=None)
+def tidy_identity() -> str:
+    """Return the clang-tidy version information"""
+    # pylint: disable=W1510
+    return subprocess.run((CLANG_TIDY, "--version"), text=True, capture_output=True).stdout
+
+
+def lint_includes(cohort: 'pyam.cohort.Cohort',
+                  student: 'pyam.cohort.Student') -> Tuple[Path, Path]:
+    """Return the include paths used to lint the files of a student"""
+    return (cohort.test_path, student.path)
+
+
+def compile_arguments(source: Path, includes: Sequence[Path], cflags: Sequence[str]) -> List[str]:
+    """Return the compiler arguments used to lint a source file"""
+    return [COMPILER, *cflags, *[f"-I{path}" for path in includes], "-c", str(source)]
+
+
+def write_compile_commands(path: Path, tasks: Sequence[LintTask]) -> Path:
+    """Write a compile_commands.json compilation database for lint tasks
+
+    Args:
+        path: Directory to write database in
+        tasks: The lint tasks
+
+    Returns:
+        Path to the database
+    """
+    database = path / "compile_commands.json"
+    write_atomic(database, json.dumps([
+        {"directory": str(Path(source).parent),
+         "file": str(source),
+         "arguments": compile_arguments(source, includes, cflags)}
+        for source, _, includes, cflags in tasks], indent=2))
+    return database
+
+
+class LintCache:
+    """Cache of clang-tidy results for a cohort
+
+    Attributes:
+        path (Path): Directory of cache entries
+    """
+
+    def __init__(self, cohort: 'pyam.cohort.Cohort'):
+        self.path: Path = cohort.cache_path / "lint"
+        self.path.mkdir(exist_ok=True)
+
+    def key(self, source: Path, checks: str, includes: Sequence[Path],
+            cflags: Sequence[str]) -> Union[str, None]:
+        """Return the cache key for linting a source file, or None if it can not be preprocessed
+
+        As for :class:`pyam.cunit.CompileCache` the key includes the preprocessed
+        translation unit rather than the include paths.
+        """
+        # pylint: disable=W1510
+        result = subprocess.run(
+            (COMPILER, "-E", "-P", *cflags, *[f"-I{path}" for path in includes], str(source)),
+            text=True,
+            capture_output=True)
+        if result.returncode != 0:
+            return None
+        return hashlib.sha256(json.dumps(
+            (str(Path(source).resolve()),
+             hashlib.sha256(Path(source).read_bytes()).hexdigest(),
+             result.stdout, checks, list(cflags), tidy_identity())).encode("utf-8")).hexdigest()
+
+    def get(self, key: Union[str, None]) -> Union[subprocess.CompletedProcess, None]:
+        """Return the cached clang-tidy result for key or None"""
+        if key is None:
+            return None
+        try:
+            with open(self.path / f"{key}.json", "r") as fid:
+                entry = json.load(fid)
+        except FileNotFoundError:
+            return None
+        return subprocess.CompletedProcess(entry["args"], entry["returncode"],
+                                           entry["stdout"], entry["stderr"])
+
+    def lint(self, source: Path, checks: str, includes: Sequence[Path], cflags: Sequence[str],
+             database: Union[Path, None] = None) -> subprocess.CompletedProcess:
+        """Return the clang-tidy result for a source file - running it if not cached
+
+        Results are not cached if the file can not be preprocessed.
+
+        Args:
+            source: The C file to lint
+            checks: The clang-tidy checks
+            includes: The include paths
+            cflags: The compile flags
+            database: Directory of a compile_commands.json including source to use
+              instead of passing the compile arguments
+        """
+        return self.run(self.key(source, checks, includes, cflags), source, checks, includes,
+                        cflags, database)
+
+    def run(self, key: Union[str, None], source: Path, checks: str, includes: Sequence[Path],
+            cflags: Sequence[str], database: Union[Path, None] = None
+            ) -> subprocess.CompletedProcess:
+        """Return the clang-tidy result for a source file with a given cache key (see
+        :meth:`key`) - running it if not cached
+
+        Arguments are as for :meth:`lint`.
+        """
+        # pylint: disable=W1510
+        result = self.get(key)
+        if result:
+            return result
+        args = [CLANG_TIDY, str(source), f"-checks={checks}", "--quiet"]
+        if database:
+            args += ["-p", str(database)]
+        else:
+            args += ["--", *cflags, *[f"-I{path}" for path in includes]]
+        result = subprocess.run(args, text=True, capture_output=True)
+        if key:
+            write_atomic(self.path / f"{key}.json",
+                         json.dumps({"args": args, "returncode": result.returncode,
+                                     "stdout": result.stdout, "stderr": result.stderr}))
+        return result
+
+
+def lint_tasks(cohort: 'pyam.cohort.Cohort',
+               students: Sequence['pyam.cohort.Student']) -> List[LintTask]:
+    """Return the lint tasks for the C test files with a PYAM_LINT definition for students"""
+    # pylint: disable=import-outside-toplevel
+    from pyam.fixtures.clang import CTestFile
+    tasks = []
+    for test in sorted(cohort.test_path.rglob("test_*.c")):
+        text = test.read_text()
+        if not CTestFile.re_ctest.search(text):
+            continue
+        options = CTestFile.parse(text)
+        if not options.get("clint_threshold"):
+            continue
+        for student in students:
+            paths = list(student.path.glob(options["ctest_glob"]))
+            if paths:
+                tasks.append((paths[0], options.get("clint_checks", CTestFile.clint_checks),
+                              lint_includes(cohort, student), options["cflags"]))
+    return tasks
+
+
+def lint_cohort(cohort: 'pyam.cohort.Cohort', students: Sequence['pyam.cohort.Student'],
+                jobs: Union[int, None] = None) -> int:
+    """Lint the files of students for a cohort in parallel, storing the results in the cache
+
+    Args:
+        cohort: The cohort
+        students: The students whose files are to be linted
+        jobs: The number of clang-tidy processes to run in parallel (default one per CPU)
+
+    Returns:
+        The number of files linted (excluding those already cached)
+    """
+    if not shutil.which(CLANG_TIDY):
+        return 0
+    cache = LintCache(cohort)
+    tasks = lint_tasks(cohort, students)
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        keys = list(executor.map(lambda task: cache.key(*task), tasks))
+    # files which can not be preprocessed are not cached so are linted by the tests
+    tasks = [(key, task) for key, task in zip(keys, tasks) if key and cache.get(key) is None]
+    if not tasks:
+        return 0
+    # database is private to this batch as concurrent batches may lint other students
+    directory = Path(tempfile.mkdtemp(dir=cache.path))
+    try:
+        write_compile_commands(directory, [task for _, task in tasks])
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+            list(executor.map(lambda entry: cache.run(entry[0], *entry[1], database=directory),
+                              tasks))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return len(tasks)
@@ -21,6 +21,12 @@ import pyam.cmd.config
 import pyam.cmd.cohort
 import pyam.cmd.write_csv
 import pyam.cmd.github_push
+import pyam.cmd.results
+import pyam.cmd.merge
+import pyam.cmd.serve
+import pyam.cmd.worker
+import pyam.cmd.lint
+import pyam.cmd.benchmark
 
 def main():
     """Automatically retrieve, mark and provide feedback for digital student submissions"""
@@ -41,7 +47,13 @@ def main():
             ('cohort', pyam.cmd.cohort),
             ('write-csv', pyam.cmd.write_csv),
             ('init', pyam.cmd.init),
-            ('push', pyam.cmd.github_push)):
+            ('push', pyam.cmd.github_push),
+            ('results', pyam.cmd.results),
+            ('merge', pyam.cmd.merge),
+            ('serve', pyam.cmd.serve),
+            ('worker', pyam.cmd.worker),
+            ('lint', pyam.cmd.lint),
+            ('benchmark', pyam.cmd.benchmark)):
         description=module.main.__doc__
         doc=description.splitlines()[0]
         sub = subparsers.add_parser(
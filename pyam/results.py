@@ -0,0 +1,265 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Structured (machine readable) test results.
+
+Each pytest session run by pyAutoMark writes a json results file alongside the
+text report when given the --results option (see :mod:`pyam.fixtures.common`).
+The file contains a dictionary with:
+
+  cohort (str): cohort name
+  student (str): student username
+  created (str): ISO format time the session finished
+  exitstatus (int): pytest exit status
+  duration (float): session duration in seconds
+  tests (dict): per test results indexed by nodeid (relative to the cohort test directory)
+    each a dictionary with outcome ("passed", "failed" or "skipped"), when (the
+    phase which determined the outcome), duration in seconds (of all phases),
+    call_duration (of the call phase only), longrepr (failure
+    representation), sections (captured output by section title) and, if any
+    student programs were run, resources (their total user and system CPU time
+    and number of processes) and, if any were kept, artifacts (file paths indexed by description)
+  errors (dict): collection error representations indexed by nodeid
+  stats (dict): session statistics from plugins (e.g. compile cache hits) indexed by name
+
+Results are also accumulated in a SQLite database per cohort so that they can
+be queried across students and runs without reading every file.
+
+Classes
+
+  :class:`ResultsDB`
+    The cohort results database
+
+Functions
+
+  :func:`read_results`
+    Read a results file
+  :func:`outcomes`
+    Map results to the PASSED/FAILED/SKIPPED names used for marking
+  :func:`results_path`
+    The results file path corresponding to a text report path
+  :func:`artifacts_path`
+    The test artifacts directory corresponding to a text report path
+  :func:`combine_results`
+    Combine the results of several sessions for a student
+  :func:`sum_stats`
+    Total the session statistics of several results
+"""
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Union, List, Tuple
+
+#: pytest exit status when no tests were collected
+NO_TESTS_COLLECTED = 5
+
+#: pytest exit status for an internal error
+INTERNAL_ERROR = 3
+
+
+def results_path(report_path: Union[Path, str]) -> Path:
+    """Return path of structured results file corresponding to a text report path"""
+    return Path(report_path).with_suffix(".json")
+
+
+def artifacts_path(report_path: Union[Path, str]) -> Path:
+    """Return path of test artifacts directory corresponding to a text report path"""
+    report_path = Path(report_path)
+    return report_path.parent / "artifacts" / report_path.stem
+
+
+def read_results(path: Union[Path, str]) -> Dict:
+    """Read a structured results file
+
+    Args:
+        path: Path to the json results file
+
+    Returns:
+        The results dictionary
+    """
+    with open(path, "r") as fid:
+        return json.load(fid)
+
+
+def outcomes(results: Dict) -> Dict[str, str]:
+    """Return marking outcomes ("PASSED", "FAILED" or "SKIPPED") from results indexed by nodeid"""
+    return {nodeid: test["outcome"].upper() for nodeid, test in results["tests"].items()}
+
+
+def combine_results(parts: List[Dict]) -> Dict:
+    """Combine results from several sessions for the same student into one
+
+    The exit status is the most severe of the sessions, ignoring sessions in
+    which no tests were collected (e.g. deselected by a mark) unless all were.
+
+    Args:
+        parts: The results dictionaries for each session
+
+    Returns:
+        The combined results dictionary
+    """
+    statuses = [part["exitstatus"] for part in parts if part["exitstatus"] != NO_TESTS_COLLECTED]
+    return {
+        "cohort": parts[0]["cohort"],
+        "student": parts[0]["student"],
+        "created": max(part["created"] for part in parts),
+        "exitstatus": max(statuses) if statuses else NO_TESTS_COLLECTED,
+        "duration": sum(part["duration"] for part in parts),
+        "tests": {nodeid: test for part in parts for nodeid, test in part["tests"].items()},
+        "errors": {nodeid: error for part in parts for nodeid, error in part["errors"].items()},
+        "stats": sum_stats(parts)
+    }
+
+
+def sum_stats(parts: List[Dict]) -> Dict[str, Dict]:
+    """Return the total of the (numeric) session statistics in several results"""
+    stats = {}
+    for part in parts:
+        for name, values in part.get("stats", {}).items():
+            total = stats.setdefault(name, {})
+            for key, value in values.items():
+                total[key] = total.get(key, 0) + value
+    return stats
+
+
+class ResultsDB:
+    """A SQLite store of structured test results across students and runs.
+
+    Each results file added is a run, indexed by student and time, with a
+    row per test indexed by nodeid. Queries generally consider only the latest
+    run for each student.
+
+    Attributes:
+      path (Path): Path to database file
+      connection (sqlite3.Connection): Connection to database
+    """
+
+    #: Database schema
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        student TEXT NOT NULL,
+        created TEXT NOT NULL,
+        exitstatus INTEGER,
+        duration REAL);
+    CREATE INDEX IF NOT EXISTS runs_student ON runs(student, created);
+    CREATE INDEX IF NOT EXISTS runs_created ON runs(created);
+    CREATE TABLE IF NOT EXISTS results (
+        run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+        nodeid TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        duration REAL,
+        longrepr TEXT,
+        cpu_user REAL,
+        cpu_system REAL,
+        PRIMARY KEY (run, nodeid));
+    CREATE INDEX IF NOT EXISTS results_nodeid ON results(nodeid, outcome);
+    CREATE VIEW IF NOT EXISTS latest AS
+        SELECT * FROM runs AS r WHERE r.id = (
+            SELECT id FROM runs WHERE student = r.student
+            ORDER BY created DESC, id DESC LIMIT 1);
+    """
+
+    def __init__(self, path: Union[Path, str], readonly: bool = False):
+        """Open (creating if necessary) the database at path
+
+        Args:
+            path: The database file
+            readonly: If True the database is opened read only and is not created
+              or changed
+
+        Raises:
+            sqlite3.OperationalError: If opened read only and the database does not exist
+        """
+        self.path = Path(path)
+        if readonly:
+            self.connection = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+            return
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(self.SCHEMA)
+
+    @classmethod
+    def for_cohort(cls, cohort: 'pyam.cohort.Cohort', readonly: bool = False) -> 'ResultsDB':
+        """Return the results database for a cohort (in its report directory)"""
+        return cls(cohort.report_path / "results.sqlite", readonly)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self.connection.close()
+
+    def add(self, results: Dict) -> int:
+        """Add a run from a results dictionary (see :func:`read_results`)
+
+        Returns:
+            The id of the new run
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (student, created, exitstatus, duration) VALUES (?, ?, ?, ?)",
+                (results["student"], results["created"], results["exitstatus"],
+                 results["duration"]))
+            run = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO results (run, nodeid, outcome, duration, longrepr,"
+                " cpu_user, cpu_system) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run, nodeid, test["outcome"], test["duration"], test["longrepr"],
+                  *[test.get("resources", {}).get(key) for key in ("user", "system")])
+                 for nodeid, test in results["tests"].items()])
+        return run
+
+    def outcomes(self, student: str) -> Dict[str, str]:
+        """Return marking outcomes (as :func:`outcomes`) from latest run for student username"""
+        return {
+            nodeid: outcome.upper() for nodeid, outcome in self.connection.execute(
+                "SELECT nodeid, outcome FROM results JOIN latest ON results.run = latest.id"
+                " WHERE latest.student = ?", (student, ))}
+
+    def students(self, nodeid: str, outcome: str = "failed") -> List[str]:
+        """Return usernames of students whose latest run had given outcome for test nodeid"""
+        return [row[0] for row in self.connection.execute(
+            "SELECT latest.student FROM results JOIN latest ON results.run = latest.id"
+            " WHERE results.nodeid = ? AND results.outcome = ? ORDER BY latest.student",
+            (nodeid, outcome))]
+
+    def pass_rates(self) -> List[Tuple[str, int, int]]:
+        """Return list of (nodeid, passed, total) over latest run of each student"""
+        return list(self.connection.execute(
+            "SELECT nodeid, SUM(outcome = 'passed'), COUNT(*) FROM results"
+            " JOIN latest ON results.run = latest.id GROUP BY nodeid ORDER BY nodeid"))
+
+    def nodeids(self) -> List[str]:
+        """Return the nodeids of all tests in latest runs - in order of first appearance"""
+        return [row[0] for row in self.connection.execute(
+            "SELECT nodeid FROM results JOIN latest ON results.run = latest.id"
+            " GROUP BY nodeid ORDER BY MIN(results.rowid)")]
+
+    def durations(self) -> Dict[str, float]:
+        """Return the session duration of the latest run indexed by student username"""
+        return dict(self.connection.execute("SELECT student, duration FROM latest"))
+
+    def test_durations(self) -> Dict[Tuple[str, str], float]:
+        """Return the test durations in latest runs indexed by (student username, nodeid)"""
+        return {(student, nodeid): duration for student, nodeid, duration in self.connection.execute(
+            "SELECT latest.student, nodeid, results.duration FROM results"
+            " JOIN latest ON results.run = latest.id")}
+
+    def resource_usage(self, count: Union[int, None] = None) -> List[Tuple[str, str, float]]:
+        """Return (student username, nodeid, CPU time) for tests in latest runs
+        which ran student programs - most CPU time first
+
+        Args:
+            count: Maximum number of tests to return (default all)
+        """
+        return list(self.connection.execute(
+            "SELECT latest.student, nodeid, cpu_user + cpu_system AS cpu FROM results"
+            " JOIN latest ON results.run = latest.id WHERE cpu_user IS NOT NULL"
+            " ORDER BY cpu DESC LIMIT ?", (-1 if count is None else count, )))
+
+    def runs(self, student: Union[str, None] = None) -> List[Tuple]:
+        """Return list of (student, created, exitstatus, duration) for all runs,
+        or for a specific student username, most recent first"""
+        query = "SELECT student, created, exitstatus, duration FROM runs"
+        if student:
+            return list(self.connection.execute(
+                query + " WHERE student = ? ORDER BY created DESC, id DESC", (student, )))
+        return list(self.connection.execute(query + " ORDER BY created DESC, id DESC"))
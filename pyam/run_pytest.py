@@ -1,12 +1,57 @@
 # Copyright 2023, Dr John A.R. Williams
 # SPDX-License-Identifier: GPL-3.0-only
-"""Pun pytest in the cohort  context."""
+"""Pun pytest in the cohort  context.
+
+Functions
+
+  :func:`run_pytest`
+    Run pytest as a subprocess
+
+Classes
+
+  :class:`PytestPool`
+    A warm pool of workers running pytest sessions in forked children (POSIX only)
+"""
 import subprocess
 import os
+import sys
+import importlib
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, Future
 from pathlib import Path
 from typing import List,Union
 import pyam.fixtures
 
+
+def fixture_plugins(cohort: 'pyam.cohort.Cohort') -> List[str]:
+    """Return the pytest plugin modules for the fixtures configured for a cohort
+
+    Args:
+        cohort: The cohort context to use
+
+    Returns:
+        List of plugin module names - always starting with the common fixtures
+        (which the others import)
+    """
+    #Get fixtures list -either from config or all
+    fixtures = cohort.get("fixtures")
+    if not fixtures:
+        fixtures = list(pyam.fixtures.__all__)
+    elif isinstance(fixtures, str):
+        fixtures = [fixtures]
+    fixtures = ["common"] + [fixture for fixture in fixtures if fixture != "common"]
+    return [f"pyam.fixtures.{fixture}" for fixture in fixtures]
+
+
+def pytest_args(cohort: 'pyam.cohort.Cohort', *extras: str) -> List[str]:
+    """Return the pytest command line arguments for a run in the cohort context"""
+    args = list(extras)
+    for plugin in fixture_plugins(cohort):
+        args += ['-p', plugin]
+    return [*args, '--cohort', cohort.name]
+
+
 def run_pytest(cohort: 'pyam.cohort.Cohort', *extras: Union[List[str],None]) -> subprocess.CompletedProcess:
     """
     Run pytest for pyAutoMark
@@ -27,21 +72,84 @@ def run_pytest(cohort: 'pyam.cohort.Cohort', *extras: Union[List[str],None]) ->
     if os.name == "nt":
         sep=";"
     env["PYTHONPATH"] = str(Path(__file__).parent.parent.resolve()) + sep + env.get("PYTHONPATH","")
-    #set up fixtures argument
-    extras = list(extras)
-    #Get fixtures list -either from config or all
-    fixtures = cohort.get("fixtures")
-    if not fixtures:
-        fixtures = pyam.fixtures.__all__
-    elif isinstance(fixtures, str):
-        fixtures = [fixtures]
-    if "common" not in fixtures:
-        fixtures += ["common"]
-    for fixture in fixtures:
-        extras += ['-p', f"pyam.fixtures.{fixture}"]
-    result = subprocess.run(("pytest", *extras, '--cohort', cohort.name),
+    result = subprocess.run(("pytest", *pytest_args(cohort, *extras)),
                             text=True,
                             capture_output=True,
                             cwd=cohort.test_path,
                             env=env)
     return result
+
+
+def _warm_worker(cohort_name: str, plugins: List[str]) -> None:
+    """Pool initializer - import fixture plugins and load the cohort once per worker"""
+    # pylint: disable=import-outside-toplevel
+    from pyam.cohort import get_cohort
+    for plugin in plugins:
+        importlib.import_module(plugin)
+    get_cohort(cohort_name)
+
+
+def _forked_pytest(cwd: str, args: List[str]) -> subprocess.CompletedProcess:
+    """Run a pytest session in a child forked from this (warm) process
+
+    The child inherits the imported plugins and loaded cohort but any state
+    changed by the session is discarded when it exits.
+    """
+    # pylint: disable=import-outside-toplevel
+    import pytest
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = pytest.ExitCode.INTERNAL_ERROR
+            try:
+                os.chdir(cwd)
+                os.dup2(stdout.fileno(), 1)
+                os.dup2(stderr.fileno(), 2)
+                code = pytest.main(args)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(int(code))
+        _, status = os.waitpid(pid, 0)
+        stdout.seek(0)
+        stderr.seek(0)
+        return subprocess.CompletedProcess(
+            ["pytest", *args], os.waitstatus_to_exitcode(status),
+            stdout.read().decode(errors="replace"),
+            stderr.read().decode(errors="replace"))
+
+
+class PytestPool(ProcessPoolExecutor):
+    """A pool of pre-forked pytest workers for a cohort
+
+    Each worker imports the fixture plugins and loads the cohort once. Every
+    pytest session is then run in a child forked from a warm worker using
+    pytest.main so that it avoids the interpreter startup, import and cohort loading
+    costs of :func:`run_pytest` while remaining isolated from other sessions.
+
+    Only available where os.fork is supported.
+
+    Attributes:
+        cohort (Cohort): The cohort context for sessions in this pool
+    """
+
+    def __init__(self, cohort: 'pyam.cohort.Cohort', max_workers: Union[int, None] = None):
+        super().__init__(max_workers=max_workers,
+                         mp_context=multiprocessing.get_context("fork"),
+                         initializer=_warm_worker,
+                         initargs=(cohort.name, fixture_plugins(cohort)))
+        self.cohort = cohort
+
+    def run_pytest(self, *extras: str) -> Future:
+        """Submit a pytest session in the cohort context
+
+        Args:
+            extras: extra arguments to send pytest
+
+        Returns:
+            Future for the subprocess.CompletedProcess result as from :func:`run_pytest`
+        """
+        return self.submit(_forked_pytest, str(self.cohort.test_path),
+                           pytest_args(self.cohort, *extras))
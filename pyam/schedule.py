@@ -0,0 +1,96 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Scheduling of test sessions using the durations of previous runs.
+
+Sessions are started longest first (longest processing time first
+scheduling) so that slow sessions - e.g. submissions which hit every test
+timeout - are not left until last, where they would extend the run while
+other workers are idle. The same estimates give the expected time remaining.
+
+Classes
+
+  :class:`Progress`
+    Tracks completed sessions and estimates time remaining
+
+Functions
+
+  :func:`longest_first`
+    Order sessions by estimated duration
+"""
+import time
+import statistics
+from typing import Dict, Hashable, Iterable, List, Tuple, Union
+
+
+def longest_first(items: Iterable[Hashable],
+                  durations: Dict[Hashable, float]) -> Tuple[List, Dict[Hashable, float]]:
+    """Order items by estimated duration, longest first
+
+    Args:
+        items: The items (e.g. students) to be scheduled
+        durations: Previous durations indexed by item
+
+    Returns:
+        Tuple of the ordered items and the estimated durations indexed by item.
+        Items without a previous duration are estimated as the median duration.
+    """
+    items = list(items)
+    known = [durations[item] for item in items if durations.get(item) is not None]
+    default = statistics.median(known) if known else 0.0
+    estimates = {item: durations[item] if durations.get(item) is not None else default
+                 for item in items}
+    # sort is stable so items with equal estimates stay in their given order
+    return sorted(items, key=lambda item: -estimates[item]), estimates
+
+
+class Progress:
+    """Track completion of scheduled sessions and estimate the time remaining
+
+    The remaining estimated work is shared between the parallel jobs (but
+    can be no less than the longest remaining session) and scaled by the
+    ratio of actual to estimated durations of the sessions completed so far,
+    so that the estimate adapts if this run is faster or slower than before.
+
+    Attributes:
+        estimates (dict): Estimated durations indexed by item
+        jobs (int): Number of sessions run in parallel
+        start (float): Time progress started
+        remaining (set): Items not yet completed
+    """
+
+    def __init__(self, estimates: Dict[Hashable, float], jobs: int = 1):
+        self.estimates = estimates
+        self.jobs = max(1, jobs)
+        self.start = time.monotonic()
+        self.remaining = set(estimates)
+        self._estimated = 0.0
+        self._actual = 0.0
+
+    def done(self, item: Hashable, duration: Union[float, None] = None) -> str:
+        """Record item as completed and return a progress message
+
+        Args:
+            item: The completed item
+            duration: Its actual duration if known
+        """
+        self.remaining.discard(item)
+        if duration is not None:
+            self._estimated += self.estimates[item]
+            self._actual += duration
+        completed = len(self.estimates) - len(self.remaining)
+        message = f"{completed}/{len(self.estimates)} completed in "\
+            + format_time(time.monotonic() - self.start)
+        if self.remaining:
+            remaining = [self.estimates[item] for item in self.remaining]
+            eta = max(sum(remaining) / self.jobs, max(remaining))
+            if self._estimated > 0:
+                eta *= self._actual / self._estimated
+            message += f", ETA {format_time(eta)}"
+        return message
+
+
+def format_time(seconds: float) -> str:
+    """Format a time in seconds as [H:]MM:SS"""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes:02}:{seconds:02}"
@@ -0,0 +1,130 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Test timeouts calibrated from the run time of the solution student.
+
+If timeout.calibrate is set the configured solution student (solution.username)
+is run first and the duration of the call phase of each passed test (excluding
+fixture setup such as compilation) recorded as its baseline. Other students'
+tests then have a timeout of timeout.multiplier times the baseline (but at least
+timeout.floor seconds) for the programs they run, so that submissions which hang
+fail quickly. A calibrated timeout only ever shortens the timeout a program
+would otherwise have (from a timeout marker, PYAM_TIMEOUT definition or fixture
+default) - see :func:`pyam.fixtures.common.item_timeout`. The timeout marker
+itself is left unchanged, so pytest-timeout still allows for fixture setup.
+
+The baselines are stored in the cohort cache and are only used while the
+cohort tests and solution submission are unchanged.
+
+Classes
+
+  :class:`TimeoutCalibration`
+    Calibrated timeouts for a cohort
+
+Functions
+
+  :func:`calibrate`
+    Run the solution student to calibrate the timeouts if required
+"""
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Dict, Union
+from pyam.config import CONFIG
+from pyam.files import hash_tree, write_atomic
+from pyam.results import read_results
+from pyam.run_pytest import run_pytest
+
+
+class TimeoutCalibration:
+    """Per test timeouts calibrated from the solution student for a cohort
+
+    Attributes:
+        cohort (Cohort): The cohort
+        path (Path): Path to the json baseline file
+        enabled (bool): True if calibration is configured (timeout.calibrate)
+        multiplier (float): Multiple of the baseline duration used as the timeout
+        floor (float): Minimum timeout in seconds
+    """
+
+    def __init__(self, cohort: 'pyam.cohort.Cohort'):
+        self.cohort = cohort
+        self.path: Path = cohort.cache_path / "timeouts.json"
+        self.enabled = bool(cohort.get("timeout.calibrate"))
+        self.multiplier = float(cohort.get("timeout.multiplier") or 0)
+        self.floor = float(cohort.get("timeout.floor") or 0)
+
+    def solution(self) -> Union['pyam.cohort.Student', None]:
+        """Return the solution student if configured"""
+        username = self.cohort.get("solution.username", None)
+        return self.cohort.students(username) if username else None
+
+    def digest(self) -> Union[str, None]:
+        """Return digest of the cohort tests and solution submission (None if no solution)"""
+        solution = self.solution()
+        if solution is None:
+            return None
+        return hashlib.sha256(
+            json.dumps((hash_tree(self.cohort.test_path),
+                        hash_tree(solution.path))).encode("utf-8")).hexdigest()
+
+    def baseline(self) -> Union[Dict[str, float], None]:
+        """Return the stored baseline durations by nodeid if still valid, otherwise None"""
+        if not self.path.exists():
+            return None
+        with open(self.path, "r") as fid:
+            entry = json.load(fid)
+        if entry.get("digest") != self.digest():
+            return None
+        return entry["baseline"]
+
+    def required(self) -> bool:
+        """Return True if timeouts are to be calibrated but there is no valid baseline"""
+        return bool(self.enabled and self.multiplier and self.solution()) \
+            and self.baseline() is None
+
+    def calibrate(self, results: Dict) -> None:
+        """Store the call durations of the passed tests in the solution results as the baseline"""
+        write_atomic(self.path, json.dumps({
+            "digest": self.digest(),
+            "baseline": {nodeid: test.get("call_duration", test["duration"])
+                         for nodeid, test in results["tests"].items()
+                         if test["outcome"] == "passed"}
+        }, indent=1))
+
+    def timeouts(self) -> Dict[str, float]:
+        """Return the calibrated timeouts indexed by nodeid (empty if not calibrated)"""
+        if not (self.enabled and self.multiplier):
+            return {}
+        baseline = self.baseline() or {}
+        return {nodeid: round(max(self.floor, self.multiplier * duration), 2)
+                for nodeid, duration in baseline.items()}
+
+
+def calibrate(cohort: 'pyam.cohort.Cohort', *extras: str) -> bool:
+    """Run the solution student to calibrate the timeouts for a cohort if required
+
+    Args:
+        cohort: The cohort
+        extras: Additional pytest arguments
+
+    Returns:
+        True if the timeouts were calibrated
+    """
+    calibration = TimeoutCalibration(cohort)
+    if not calibration.required():
+        return False
+    solution = calibration.solution()
+    CONFIG.build_path.mkdir(parents=True, exist_ok=True)
+    fid, results_file = tempfile.mkstemp(suffix=".json", dir=CONFIG.build_path)
+    os.close(fid)
+    try:
+        run_pytest(cohort, *extras, "--results", results_file, "--student", solution.username)
+        if not os.path.getsize(results_file):
+            return False
+        calibration.calibrate(read_results(results_file))
+    finally:
+        os.unlink(results_file)
+    cohort.log.info("Calibrated timeouts from '%s'.", solution.name())
+    return True
@@ -0,0 +1,146 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""Dependency ordered, incremental analysis of VHDL files.
+
+The design units each VHDL file declares (entities, packages and
+configurations) and references (work library units, architectures and package
+bodies of units declared elsewhere and component declarations) are found by
+regular expressions so that a set of files can be analysed in dependency order
+using :func:`pyam.files.get_depends`.
+
+:class:`AnalysisStamps` records a key for each file analysed into a library
+from its contents and the keys of the files it depends on, so that a file is
+only analysed again when it, or something it depends on, has changed.
+
+Classes
+
+  :class:`AnalysisStamps`
+    Keys of the files analysed into a library
+
+Functions
+
+  :func:`scan_units`
+    The units a VHDL file declares and references
+  :func:`depends_graph`
+    The dependency graph of a set of VHDL files
+  :func:`analysis_order`
+    VHDL files in the order they must be analysed
+"""
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+from pyam.files import get_depends, write_atomic
+
+RE_COMMENT = re.compile(r'--.*$', re.MULTILINE)
+RE_DECLARES = re.compile(
+    r'^\s*(?:entity|package|configuration)\s+(?!body\b)(\w+)\s+(?:is|of)\b',
+    re.IGNORECASE | re.MULTILINE)
+RE_REQUIRES = re.compile(
+    r'\bwork\.(\w+)|\barchitecture\s+\w+\s+of\s+(\w+)|\bpackage\s+body\s+(\w+)'
+    r'|\bconfiguration\s+\w+\s+of\s+(\w+)',
+    re.IGNORECASE)
+RE_COMPONENT = re.compile(r'\bcomponent\s+(\w+)', re.IGNORECASE)
+
+
+def scan_units(path: Path) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Return the units a VHDL file declares and references
+
+    Names are in lower case as VHDL is case insensitive.
+
+    Returns:
+        Tuple of the sets of the names of units declared, the units required before
+        the file can be analysed and the components declared (needed only at elaboration)
+    """
+    text = RE_COMMENT.sub("", Path(path).read_text(encoding="latin-1")).lower()
+    declares = set(RE_DECLARES.findall(text))
+    requires = {name for match in RE_REQUIRES.findall(text) for name in match if name}
+    components = set(RE_COMPONENT.findall(text))
+    return declares, requires - declares, components - declares
+
+
+def depends_graph(files: Sequence[Path], components: bool = True) -> List[List[Path]]:
+    """Return the dependency graph of VHDL files in the form used by :func:`get_depends`
+
+    Args:
+        files: The VHDL files - the first declaring a unit is taken to provide it
+        components: If True files also depend on files declaring entities for their components
+    """
+    units = {path: scan_units(path) for path in files}
+    provider = {}
+    for path, (declares, _, _) in units.items():
+        for name in declares:
+            provider.setdefault(name, path)
+    graph = []
+    for path, (_, requires, declared_components) in units.items():
+        names = requires | declared_components if components else requires
+        depends = []
+        for name in sorted(names):
+            dependency = provider.get(name)
+            if dependency is not None and dependency != path and dependency not in depends:
+                depends.append(dependency)
+        graph.append([path, *depends])
+    return graph
+
+
+def analysis_order(files: Sequence[Path], graph: List[List[Path]] = None) -> List[Path]:
+    """Return VHDL files in an order they can be analysed in
+
+    Each file comes after the files it depends on and otherwise the given order is kept.
+
+    Args:
+        files: The VHDL files
+        graph: Their dependency graph (default from :func:`depends_graph`)
+    """
+    graph = depends_graph(files) if graph is None else graph
+    order = []
+    for path in files:
+        for dependency in get_depends(path, graph):
+            if dependency not in order:
+                order.append(dependency)
+    return order
+
+
+class AnalysisStamps:
+    """Keys of the VHDL files analysed into a library
+
+    Stored as json in the library directory.
+
+    Attributes:
+        path (Path): Path of the json stamps file
+        base (str): Identifies what the library was started from (e.g. a precompiled library)
+        keys (Dict[str, str]): Key of the analysed contents by file path
+    """
+
+    FILENAME = "pyam-analysed.json"
+
+    def __init__(self, library: Path, base: str):
+        self.path = Path(library) / self.FILENAME
+        self.base = base
+        self.keys: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, "r") as fid:
+                entry = json.load(fid)
+            if entry.get("base") == base:
+                self.keys = entry["keys"]
+
+    def key(self, path: Path, graph: List[List[Path]]) -> str:
+        """Return the key of a file from its contents and those of the files it depends on"""
+        sha = hashlib.sha256()
+        for dependency in get_depends(path, graph):
+            sha.update(str(dependency).encode("utf-8") + b"\0")
+            sha.update(Path(dependency).read_bytes())
+        return sha.hexdigest()
+
+    def current(self, path: Path, key: str) -> bool:
+        """Return True if the file was last analysed with this key"""
+        return self.keys.get(str(path)) == key
+
+    def update(self, path: Path, key: str) -> None:
+        """Record that a file has been analysed with key"""
+        self.keys[str(path)] = key
+
+    def save(self) -> None:
+        """Write the stamps into the library directory"""
+        write_atomic(self.path, json.dumps({"base": self.base, "keys": self.keys}, indent=1))
@@ -0,0 +1,328 @@
+# Copyright 2023, Dr John A.R. Williams
+# SPDX-License-Identifier: GPL-3.0-only
+"""A work queue for distributing test sessions to worker processes.
+
+A work unit is a (student username, test file) pair for a cohort. The server
+(see the serve command) leases units to workers (see the worker command) over
+a TCP or Unix domain socket. Each worker runs the unit as a pytest session
+using the cohort fixtures and sends back the text output and structured
+results. If a worker disconnects before returning a result its unit is put back
+on the queue for another worker, up to :data:`MAX_LOSSES` times after which the
+unit is abandoned with an error result. If running a unit raises an exception
+the worker returns an error result for it rather than stopping.
+
+The protocol is line delimited json. A worker sends {"request": "unit"} and is
+answered with {"unit": {...}}, {"wait": seconds} if all remaining units are
+leased to other workers, or {"unit": null} when the queue is finished. A
+worker returns a result as {"result": {...}} which is acknowledged with
+{"ok": true} before it is passed on, so that the server does not stop before
+acknowledging the final result. A worker treats the server closing the
+connection while it is waiting for a unit as the end of the queue.
+
+There is no authentication so the server should only listen on a local address
+or a Unix socket in a directory only accessible to the assessor.
+
+Classes
+
+  :class:`WorkQueueServer`
+    Serves work units to workers and collects their results
+
+Functions
+
+  :func:`parse_address`
+    Parse a server address
+  :func:`error_result`
+    The result of a unit which could not be run
+  :func:`run_worker`
+    Process units from a server until its queue is finished
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import queue
+import tempfile
+import traceback
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Tuple, Union, Iterator
+from pyam.config import CONFIG
+from pyam.results import read_results, INTERNAL_ERROR
+from pyam.run_pytest import run_pytest
+
+#: Default server address
+DEFAULT_ADDRESS = "127.0.0.1:8421"
+
+#: Seconds a worker is asked to wait when all remaining units are leased
+WAIT_TIME = 1.0
+
+#: Number of times a unit may be requeued after losing the worker running it
+MAX_LOSSES = 2
+
+Unit = Tuple[str, str]
+
+
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """Parse a server address
+
+    Args:
+        address: Either host:port for TCP or a Unix domain socket path (containing a /)
+
+    Returns:
+        Tuple of socket address family and the address
+    """
+    if "/" in address or ":" not in address:
+        return socket.AF_UNIX, address
+    host, port = address.rsplit(":", 1)
+    return socket.AF_INET, (host, int(port))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handle the requests from one worker connection"""
+
+    def handle(self):
+        work = self.server.work
+        unit = None
+        work.connected(1)
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if "result" in message:
+                    self.send({"ok": True})
+                    if unit is not None:
+                        work.complete(unit, message["result"])
+                        unit = None
+                    continue
+                unit = work.lease()
+                if unit is None:
+                    self.send({"unit": None})
+                elif unit == ():
+                    unit = None
+                    self.send({"wait": WAIT_TIME})
+                else:
+                    self.send({"unit": work.describe(unit)})
+        except (OSError, ValueError):
+            pass
+        finally:
+            work.connected(-1)
+            if unit is not None:
+                work.release(unit)
+
+    def send(self, message: Dict) -> None:
+        """Send a message to the worker"""
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class WorkQueueServer:
+    """Serve work units for a cohort to workers and collect their results.
+
+    Use as a context manager - the server listens in a background thread
+    while in context. Results are returned (in completion order) by
+    :meth:`results` in the calling thread.
+
+    Attributes:
+        cohort (Cohort): The cohort being tested
+        address (str): The address served on
+        args (List[str]): The pytest arguments for each unit
+        student_args (Dict[str, List[str]]): Further pytest arguments for the
+          units of each student username (e.g. their artifacts directory)
+        pending (deque): Units waiting to be leased
+        leased (set): Units leased to workers
+        losses (Dict[Unit, int]): Number of workers lost running each unit
+        total (int): Number of units served
+        outstanding (int): Number of units without a result
+        workers (int): Number of connected workers
+    """
+
+    def __init__(self, cohort: 'pyam.cohort.Cohort', units: List[Unit],
+                 address: str = DEFAULT_ADDRESS, args: List[str] = (),
+                 student_args: Union[Dict[str, List[str]], None] = None):
+        self.cohort = cohort
+        self.address = address
+        self.args = list(args)
+        self.student_args = student_args or {}
+        self.pending = deque(units)
+        self.leased = set()
+        self.losses = {}
+        self.total = len(units)
+        self.outstanding = len(units)
+        self.workers = 0
+        self._lock = threading.Lock()
+        self._completed = queue.Queue()
+        family, server_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            Path(server_address).unlink(missing_ok=True)
+            self.server = _UnixServer(server_address, _Handler)
+        else:
+            self.server = _TCPServer(server_address, _Handler)
+        self.server.work = self
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        family, server_address = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            Path(server_address).unlink(missing_ok=True)
+
+    def connected(self, change: int) -> None:
+        """Update the number of connected workers"""
+        with self._lock:
+            self.workers += change
+
+    def lease(self) -> Union[Unit, Tuple, None]:
+        """Lease the next unit to a worker
+
+        Returns:
+            The unit, an empty tuple if all remaining units are leased or None if finished
+        """
+        with self._lock:
+            if self.pending:
+                unit = self.pending.popleft()
+                self.leased.add(unit)
+                return unit
+            return () if self.outstanding else None
+
+    def release(self, unit: Unit) -> None:
+        """Put a leased unit back at the front of the queue
+
+        A unit which has lost more than :data:`MAX_LOSSES` workers is instead
+        completed with an error result, as it is probably killing them.
+        """
+        with self._lock:
+            if unit not in self.leased:
+                return
+            self.leased.remove(unit)
+            self.losses[unit] = self.losses.get(unit, 0) + 1
+            if self.losses[unit] <= MAX_LOSSES:
+                self.pending.appendleft(unit)
+                self.cohort.log.warning("Worker lost - requeued '%s' for '%s'.", unit[1], unit[0])
+                return
+            self.outstanding -= 1
+        self.cohort.log.error("Worker lost %d times - abandoned '%s' for '%s'.",
+                              self.losses[unit], unit[1], unit[0])
+        self._completed.put((unit, error_result(
+            f"Abandoned after {self.losses[unit]} workers were lost running '{unit[1]}'")))
+
+    def complete(self, unit: Unit, result: Dict) -> None:
+        """Record the result of a leased unit"""
+        with self._lock:
+            if unit not in self.leased:
+                return
+            self.leased.remove(unit)
+            self.outstanding -= 1
+        self._completed.put((unit, result))
+
+    def describe(self, unit: Unit) -> Dict:
+        """Return the description of a unit sent to workers"""
+        return {"cohort": self.cohort.name, "student": unit[0], "path": unit[1],
+                "args": [*self.args, *self.student_args.get(unit[0], ())]}
+
+    def results(self) -> Iterator[Tuple[Unit, Dict]]:
+        """Yield (unit, result) as each unit is completed until all are"""
+        for _ in range(self.total):
+            yield self._completed.get()
+
+
+def error_result(message: str) -> Dict:
+    """Return a unit result for a unit which could not be run
+
+    Args:
+        message: Description of the error, used as the unit output
+    """
+    return {"returncode": INTERNAL_ERROR, "stdout": message, "results": None}
+
+
+def run_unit(unit: Dict) -> Dict:
+    """Run a work unit as a pytest session
+
+    Args:
+        unit: The unit description from the server
+
+    Returns:
+        Dictionary with returncode, stdout and the structured results (or None)
+    """
+    # pylint: disable=import-outside-toplevel
+    from pyam.cohort import get_cohort
+    cohort = get_cohort(unit["cohort"])
+    path = (cohort.test_path / unit["path"]).resolve()
+    if not path.is_relative_to(cohort.test_path.resolve()):
+        raise ValueError(f"Test file '{unit['path']}' not in cohort test directory")
+    CONFIG.build_path.mkdir(parents=True, exist_ok=True)
+    fid, results_file = tempfile.mkstemp(suffix=".json", dir=CONFIG.build_path)
+    os.close(fid)
+    try:
+        result = run_pytest(cohort, *unit["args"], "--results", results_file,
+                            "--student", unit["student"], unit["path"])
+        results = read_results(results_file) if os.path.getsize(results_file) else None
+    finally:
+        os.unlink(results_file)
+    return {"returncode": result.returncode, "stdout": result.stdout, "results": results}
+
+
+def run_worker(address: str = DEFAULT_ADDRESS) -> int:
+    """Process units from a server until its queue is finished
+
+    Args:
+        address: The server address (see :func:`parse_address`)
+
+    Returns:
+        The number of units processed
+
+    Raises:
+        ConnectionError: If the server connection is lost while running a unit
+          or before its result is acknowledged
+    """
+    family, server_address = parse_address(address)
+    count = 0
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(server_address)
+        # written unbuffered so that a failed write is not retried when the file is closed
+        with sock.makefile("rb") as stream:
+
+            def request(message):
+                sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("Server closed connection")
+                return json.loads(line)
+
+            while True:
+                try:
+                    reply = request({"request": "unit"})
+                except ConnectionError:
+                    # server stops once all units are completed
+                    return count
+                if "wait" in reply:
+                    time.sleep(reply["wait"])
+                    continue
+                unit = reply["unit"]
+                if unit is None:
+                    return count
+                CONFIG.log.info("Running '%s' for '%s'", unit["path"], unit["student"])
+                try:
+                    result = run_unit(unit)
+                except Exception:  # pylint: disable=broad-except
+                    CONFIG.log.exception("Failed running '%s' for '%s'",
+                                         unit["path"], unit["student"])
+                    result = error_result(traceback.format_exc())
+                request({"result": result})
+                count += 1
@@ -0,0 +1,65 @@
+"""Shared fixtures for the pyam tests
+
+:mod:`pyam.config` looks for pyAutoMark.json from the working directory when
+imported so a temporary assessment root is created and the configuration
+loaded from it before any tests are collected.
+"""
+import os
+import json
+import shutil
+import tempfile
+import itertools
+from pathlib import Path
+import pytest
+
+ROOT = Path(tempfile.mkdtemp(prefix="pyam-tests-"))
+_names = itertools.count()
+
+
+def pytest_configure(config):
+    (ROOT / "pyAutoMark.json").write_text(json.dumps({"cohort": "test"}))
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        import pyam.config  # pylint: disable=import-outside-toplevel,unused-import
+    finally:
+        os.chdir(cwd)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(ROOT, ignore_errors=True)
+
+
+@pytest.fixture
+def make_cohort():
+    """Return a function to create a new cohort in the test root
+
+    The function takes a dictionary of student usernames to their submitted files,
+    a dictionary of test file names to contents and any manifest entries and
+    returns the loaded cohort, which is also made the current cohort.
+    """
+    from pyam.config import CONFIG  # pylint: disable=import-outside-toplevel
+    from pyam.cohort import Cohort  # pylint: disable=import-outside-toplevel
+
+    def _make_cohort(students=None, tests=None, **manifest):
+        name = f"c{next(_names)}"
+        path = CONFIG.cohorts_path / name
+        path.mkdir()
+        (path / "manifest.json").write_text(json.dumps(manifest))
+        students = {"alice": {}, "bob": {}} if students is None else students
+        rows = ["Username,Student ID,Last Name,First Name"]
+        for number, (username, files) in enumerate(students.items()):
+            rows.append(f"{username},{number},{username.title()},{username[0].upper()}")
+            (path / username).mkdir()
+            for file, content in files.items():
+                (path / username / file).write_text(content)
+        (path / "students.csv").write_text("\n".join(rows) + "\n")
+        test_path = CONFIG.tests_path / name
+        test_path.mkdir()
+        for file, content in (tests or {}).items():
+            (test_path / file).write_text(content)
+        cohort = Cohort(name)
+        CONFIG.cohort = cohort
+        return cohort
+
+    return _make_cohort
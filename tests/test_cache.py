@@ -0,0 +1,83 @@
+"""Tests for :mod:`pyam.cache`"""
+import os
+import json
+from pyam.cache import ResultCache, CollectionCache
+
+
+def test_result_cache_key(make_cohort):
+    cohort = make_cohort({"alice": {"a.c": "int a;"}, "bob": {"a.c": "int a;"}},
+                         {"test_a.c": "TEST_ONE"})
+    alice, bob = cohort.students()
+    cache = ResultCache(cohort)
+    key = cache.key(alice)
+    assert key == ResultCache(cohort).key(alice)
+    # identical submissions have the same key
+    assert key == cache.key(bob)
+    assert key != cache.key(alice, ["-k", "ONE"])
+    (alice.path / "a.c").write_text("int b;")
+    assert key != cache.key(alice)
+    assert cache.key(bob) == ResultCache(cohort).key(bob)
+    (cohort.test_path / "test_a.c").write_text("TEST_TWO")
+    assert cache.key(bob) != ResultCache(cohort).key(bob)
+    cohort.manifest["limits"] = {"cpu": 10}
+    assert ResultCache(cohort).config_digest != cache.config_digest
+
+
+def test_result_cache_hit(make_cohort):
+    cohort = make_cohort({"alice": {"a.c": "int a;"}})
+    alice = cohort.students()[0]
+    report = cohort.report_path / "report_alice.json"
+    cache = ResultCache(cohort)
+    key = cache.key(alice)
+    assert not cache.hit(alice, key, report)
+    cache.store(alice, key, report, 0)
+    # the report must still exist
+    assert not cache.hit(alice, key, report)
+    report.write_text("{}")
+    assert cache.hit(alice, key, report)
+    cache = ResultCache(cohort)
+    assert cache.hit(alice, key, report)
+    assert not cache.hit(alice, "other", report)
+    assert not cache.hit(alice, key, cohort.report_path / "other.json")
+
+
+def test_result_cache_journal(make_cohort):
+    cohort = make_cohort()
+    alice, bob = cohort.students()
+    journal = cohort.cache_path / "journal.json"
+    cache = ResultCache(cohort, journal)
+    cache.store(alice, "k1", cohort.report_path / "report_alice.json", 1)
+    assert not cache.path.exists()
+    entries = json.loads(journal.read_text())
+    assert entries == {"alice": {"key": "k1", "report": "report_alice.json", "returncode": 1}}
+    cache = ResultCache(cohort)
+    cache.store(bob, "k2", cohort.report_path / "report_bob.json", 0)
+    cache.update(entries)
+    assert set(json.loads(cache.path.read_text())) == {"alice", "bob"}
+    assert ResultCache(cohort).entries == cache.entries
+
+
+def test_collection_cache(make_cohort):
+    cohort = make_cohort(tests={"test_a.c": "TEST_ONE"}, fixtures=["clang"])
+    calls = []
+
+    def collect():
+        calls.append(1)
+        return [f"test_a.c::{len(calls)}"]
+
+    cache = CollectionCache(cohort)
+    assert cache.nodeids(collect) == ["test_a.c::1"]
+    assert CollectionCache(cohort).nodeids(collect) == ["test_a.c::1"]
+    assert len(calls) == 1
+    # a changed modification time alone is only hashed
+    test_file = cohort.test_path / "test_a.c"
+    stat = test_file.stat()
+    os.utime(test_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.nodeids(collect) == ["test_a.c::1"]
+    assert json.loads(cache.path.read_text())["stamp"][0][1] == stat.st_mtime_ns + 10**9
+    assert len(calls) == 1
+    test_file.write_text("TEST_TWO")
+    assert cache.nodeids(collect) == ["test_a.c::2"]
+    cohort.manifest["fixtures"] = ["clang", "python"]
+    assert cache.nodeids(collect) == ["test_a.c::3"]
+    assert cache.nodeids(collect) == ["test_a.c::3"]
@@ -0,0 +1,98 @@
+"""Tests for :mod:`pyam.clib`"""
+import os
+import shutil
+import faulthandler
+import ctypes
+import subprocess
+import pytest
+from pyam.clib import CLibrary
+from pyam.cunit import c_compile, RunTimeError
+from pyam.execute import ResourceLimit
+
+pytestmark = pytest.mark.skipif(shutil.which("gcc") is None or not hasattr(os, "fork"),
+                                reason="gcc or fork not available")
+
+SOURCE = """#include <signal.h>
+struct point { int x, y; };
+static int count = 0;
+int add(int a, int b) { return a + b; }
+int counter(void) { return ++count; }
+double half(double x) { return x / 2; }
+void fill(int *out, int n) { for (int i = 0; i < n; i++) out[i] = i * i; }
+void divide(int a, int b, int *quotient) { *quotient = a / b; }
+struct point make_point(int x, int y) { struct point p = {x, y}; return p; }
+void crash(void) { raise(SIGSEGV); }
+int hang(int n) { for (;;) n++; return n; }
+"""
+
+
+class Point(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_int), ("y", ctypes.c_int)]
+
+
+@pytest.fixture(autouse=True)
+def no_faulthandler():
+    """Do not dump tracebacks from the children crashed by the tests"""
+    enabled = faulthandler.is_enabled()
+    faulthandler.disable()
+    yield
+    if enabled:
+        faulthandler.enable()
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Return a function to load the test library"""
+    (tmp_path / "lib.c").write_text(SOURCE)
+    path = c_compile(tmp_path / "lib.so", tmp_path / "lib.c", cflags=["-shared", "-fPIC"])
+    return lambda **kwargs: CLibrary(path, **kwargs)
+
+
+def test_calls(library):
+    lib = library(timeout=5)
+    assert lib.add(1, 2) == 3
+    half = lib.function("half", ctypes.c_double, [ctypes.c_double])
+    assert half(3) == 1.5
+    # each call is made in a new child so state does not persist
+    assert lib.counter() == 1
+    assert lib.counter() == 1
+    assert lib.add.map([(i, i) for i in range(1000)]) == [2 * i for i in range(1000)]
+    assert lib.counter.map([()] * 3) == [1, 2, 3]
+    assert lib.add.map([]) == []
+    with pytest.raises(AttributeError):
+        lib.function("missing")
+
+
+def test_output_arguments(library):
+    lib = library(timeout=5)
+    values = (ctypes.c_int * 4)()
+    lib.function("fill", None)(values, 4)
+    assert list(values) == [0, 1, 4, 9]
+    quotient = ctypes.c_int()
+    lib.divide(7, 2, ctypes.byref(quotient))
+    assert quotient.value == 3
+    point = lib.function("make_point", Point, [ctypes.c_int, ctypes.c_int])(1, 2)
+    assert (point.x, point.y) == (1, 2)
+
+
+def test_errors(library):
+    lib = library(timeout=0.5)
+    with pytest.raises(RunTimeError, match="signal SIGSEGV"):
+        lib.crash()
+    with pytest.raises(subprocess.TimeoutExpired):
+        lib.hang(1)
+    # results before a failing call are discarded and the failing call is reported
+    with pytest.raises(RunTimeError, match=r"crash\(\) crashed"):
+        lib.function("crash", None).map([(), ()])
+    add = lib.function("add", ctypes.c_int, [ctypes.c_int, ctypes.c_int])
+    with pytest.raises(RunTimeError, match="ArgumentError"):
+        add("one", 2)
+    # the library is still usable
+    assert add(1, 2) == 3
+
+
+def test_resource_limits(library):
+    lib = library(timeout=30, resources=ResourceLimit(cpu=1))
+    with pytest.raises(RunTimeError, match="signal SIG(XCPU|KILL)"):
+        lib.hang(1)
+    assert lib.add(1, 2) == 3
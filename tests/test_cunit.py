@@ -0,0 +1,132 @@
+"""Tests for :mod:`pyam.cunit`"""
+import os
+import shutil
+import signal
+import pytest
+from pyam.cunit import (CompileCache, CompilationError, c_compile, c_exec, harness_exec,
+                        INCLUDE_PATH)
+from pyam.execute import OutputLimit
+
+pytestmark = pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc not available")
+
+# __FILE__ differs between directories but should not affect the cache key
+SOURCE = """#include <stdio.h>
+#include "value.h"
+static const char *file = __FILE__;
+int main(void) { printf("%d\\n", VALUE); return file[0] == 0; }
+"""
+
+
+def write_source(path, value=1):
+    path.mkdir(exist_ok=True)
+    (path / "main.c").write_text(SOURCE)
+    (path / "value.h").write_text(f"#define VALUE {value}\n")
+    return path / "main.c"
+
+
+def test_compile_cache(tmp_path):
+    cache = CompileCache(tmp_path / "cache", 1 << 24)
+    source = write_source(tmp_path / "a")
+    binary = tmp_path / "a" / "main"
+    c_compile(binary, source, [source.parent], cache=cache)
+    assert cache.stats == {"hits": 0, "misses": 1}
+    binary.unlink()
+    c_compile(binary, source, [source.parent], cache=cache)
+    assert cache.stats == {"hits": 1, "misses": 1}
+    assert c_exec(binary).stdout == "1\n"
+    # the same source in another directory shares the output
+    other = write_source(tmp_path / "b")
+    c_compile(tmp_path / "b" / "main", other, [other.parent], cache=cache)
+    assert cache.stats == {"hits": 2, "misses": 1}
+    # as does a shared cache with its own statistics
+    stats = {}
+    c_compile(tmp_path / "b" / "main", other, [other.parent],
+              cache=CompileCache(cache.path, cache.size, stats))
+    assert stats == {"hits": 1, "misses": 0}
+
+
+def test_compile_cache_invalidated(tmp_path):
+    cache = CompileCache(tmp_path / "cache", 1 << 24)
+    source = write_source(tmp_path / "a")
+    binary = tmp_path / "a" / "main"
+    key = cache.key("gcc", source, [f"-I{source.parent}"], [], [])
+    assert key
+    assert key != cache.key("gcc", source, [f"-I{source.parent}"], ["-O2"], [])
+    assert key != cache.key("gcc", source, [f"-I{source.parent}"], [], ["-lm"])
+    c_compile(binary, source, [source.parent], cache=cache)
+    write_source(source.parent, 2)
+    assert key != cache.key("gcc", source, [f"-I{source.parent}"], [], [])
+    c_compile(binary, source, [source.parent], cache=cache)
+    assert cache.stats == {"hits": 0, "misses": 2}
+    assert c_exec(binary).stdout == "2\n"
+
+
+def test_compile_cache_errors_not_cached(tmp_path):
+    cache = CompileCache(tmp_path / "cache", 1 << 24)
+    source = write_source(tmp_path / "a")
+    # not preprocessed without the header
+    (source.parent / "value.h").unlink()
+    assert cache.key("gcc", source, [], [], []) is None
+    with pytest.raises(CompilationError):
+        c_compile(tmp_path / "main", source, cache=cache)
+    (source.parent / "value.h").write_text("#define VALUE x\n")
+    with pytest.raises(CompilationError):
+        c_compile(tmp_path / "main", source, [source.parent], cache=cache)
+    assert not list(cache.path.glob("*/*"))
+
+
+def test_compile_cache_eviction(tmp_path):
+    cache = CompileCache(tmp_path / "cache", 1 << 24)
+    for value, name in enumerate("abc"):
+        source = write_source(tmp_path / name, value)
+        c_compile(tmp_path / name / "main", source, [source.parent], cache=cache)
+    entries = sorted(cache.path.glob("*/*"), key=lambda path: path.stat().st_mtime)
+    assert len(entries) == 3
+    # least recently used entries are removed first
+    os.utime(entries[0], (1, 1))
+    os.utime(entries[1], (2, 2))
+    cache.size = entries[2].stat().st_size
+    cache.evict()
+    assert list(cache.path.glob("*/*")) == [entries[2]]
+
+
+HARNESS = """#include <stdio.h>
+#include "pyam_harness.h"
+PYAM_CASE(pass) { printf("hello"); }
+PYAM_CASE(fail) { PYAM_ASSERT(1 == 2); }
+PYAM_CASE(crash) { raise(SIGSEGV); }
+PYAM_CASE(hang) { for (;;); }
+PYAM_CASE(chatty) { for (;;) printf("0123456789"); }
+PYAM_CASES(table, 3) { PYAM_ASSERT_INT(pyam_case_index % 2, 0); }
+"""
+
+
+@pytest.fixture
+def harness(tmp_path):
+    (tmp_path / "test_harness.c").write_text(HARNESS)
+    return c_compile(tmp_path / "test_harness", tmp_path / "test_harness.c", [INCLUDE_PATH])
+
+
+def test_harness_outcomes(harness):
+    records, stderr = harness_exec(harness, case_timeout=0.5, timeout=30,
+                                   limit=OutputLimit(1000, 500))
+    assert stderr == ""
+    assert list(records) == ["pass", "fail", "crash", "hang", "chatty",
+                             "table[0]", "table[1]", "table[2]"]
+    assert records["pass"] == ("passed", "exit=0", "hello")
+    outcome, detail, output = records["fail"]
+    assert (outcome, detail) == ("failed", "exit=1")
+    assert "assertion failed: 1 == 2" in output
+    assert records["crash"][:2] == ("crashed", f"signal={signal.SIGSEGV}")
+    assert records["hang"][:2] == ("timeout", "timeout=0.5")
+    # the output kept is bounded and a case exceeding the limit is killed
+    assert records["chatty"] == ("exceeded", "output>1000", "0123456789" * 50)
+    assert [records[f"table[{index}]"][0] for index in range(3)] == \
+        ["passed", "failed", "passed"]
+
+
+def test_harness_selected_cases(harness):
+    records, _ = harness_exec(harness, ["table[1]", "pass"])
+    assert set(records) == {"pass", "table[1]"}
+    assert records["table[1]"][0] == "failed"
+    assert "pyam_case_index % 2 is 1, expected 0" in records["table[1]"][2]
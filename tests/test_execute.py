@@ -0,0 +1,83 @@
+"""Tests for :func:`pyam.execute.run_bounded` and resource usage collection"""
+import os
+import sys
+import subprocess
+import pytest
+from pyam.execute import run_bounded, OutputLimit, ResourceLimit, collect_usage, total_usage
+
+PYTHON = sys.executable
+
+
+def test_untruncated():
+    result = run_bounded([PYTHON, "-c", "import sys; print(sys.stdin.read().upper())"],
+                         input="hello")
+    assert result.returncode == 0
+    assert result.stdout == "HELLO\n"
+    assert not result.truncated and not result.exceeded
+    assert result.spills == {}
+
+
+def test_truncated_keeps_head_and_tail(tmp_path):
+    script = "print('START'); print('x' * 10000); print('END')"
+    result = run_bounded([PYTHON, "-c", script], limit=OutputLimit(limit=100000, keep=100),
+                         spill=tmp_path)
+    assert result.returncode == 0
+    assert result.truncated and not result.exceeded
+    assert result.stdout.startswith("START\n")
+    assert result.stdout.endswith("END\n")
+    assert "bytes of output truncated" in result.stdout
+    head, tail = result.stdout.split("\n... [")[0], result.stdout.rsplit("] ...\n")[1]
+    assert len(head) == 100 and len(tail) == 100
+    spill = result.spills["stdout"]
+    assert spill.parent == tmp_path
+    assert len(spill.read_bytes()) == len("START\n") + 10001 + len("END\n") - 200
+
+
+def test_truncated_without_spill():
+    result = run_bounded([PYTHON, "-c", "print('x' * 1000)"], limit=OutputLimit(keep=10))
+    assert result.truncated
+    assert result.spills == {}
+    assert "[981 bytes of output truncated] ..." in result.stdout
+
+
+def test_exceeded_limit_kills():
+    result = run_bounded([PYTHON, "-c", "while True: print('x' * 1000)"],
+                         limit=OutputLimit(limit=100000, keep=100), timeout=30)
+    assert result.exceeded and result.truncated
+    assert result.returncode != 0
+    assert "exceeding the output limit of 100000 bytes" in result.stderr
+
+
+def test_timeout():
+    with pytest.raises(subprocess.TimeoutExpired) as err:
+        run_bounded([PYTHON, "-c", "import time; print('started', flush=True); time.sleep(60)"],
+                    timeout=1)
+    assert "started" in err.value.output
+
+
+def test_bytes_output():
+    result = run_bounded([PYTHON, "-c", "import sys; sys.stdout.buffer.write(b'\\xff')"],
+                         text=False)
+    assert result.stdout == b"\xff"
+
+
+def test_collect_usage():
+    with collect_usage() as usages:
+        run_bounded([PYTHON, "-c", "pass"])
+        run_bounded([PYTHON, "-c", "pass"])
+    run_bounded([PYTHON, "-c", "pass"])
+    if usages:  # not available without os.wait4
+        assert len(usages) == 2
+        assert set(usages[0]) == {"command", "user", "system"}
+        total = total_usage(usages)
+        assert total["processes"] == 2
+        assert total["user"] >= 0 and total["system"] >= 0
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="POSIX only")
+def test_cpu_limit():
+    result = run_bounded([PYTHON, "-c", "while True: pass"], timeout=30,
+                         resources=ResourceLimit(cpu=1))
+    assert result.returncode < 0
+    assert "exceeding the CPU time limit of 1s" in result.stderr
+    assert result.usage["user"] + result.usage["system"] >= 0.9
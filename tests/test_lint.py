@@ -0,0 +1,100 @@
+"""Tests for :mod:`pyam.lint`"""
+import sys
+import json
+import shutil
+import pytest
+from pyam import lint
+from pyam.lint import LintCache, lint_cohort, lint_includes, warning_count, DEFAULT_CFLAGS
+from pyam.fixtures.clang import CTestFile
+
+pytestmark = pytest.mark.skipif(shutil.which(lint.COMPILER) is None,
+                                reason="C compiler not available")
+
+TIDY = """#!{python}
+import sys, json
+if sys.argv[1:] == ["--version"]:
+    print("fake clang-tidy")
+    sys.exit(0)
+with open({log!r}, "a") as fid:
+    fid.write(json.dumps(sys.argv[1:]) + "\\n")
+print(sys.argv[1] + ":1:1: warning: fake")
+print("1 warning generated.")
+"""
+
+TEST_FILE = """#define PYAM_TEST "add.c"
+#define PYAM_LINT 5
+int TEST_ADD;
+"""
+
+
+@pytest.fixture
+def tidy(tmp_path, monkeypatch):
+    """Use a fake clang-tidy which logs its arguments - returns function to read the log"""
+    log = tmp_path / "tidy.log"
+    script = tmp_path / "clang-tidy"
+    script.write_text(TIDY.format(python=sys.executable, log=str(log)))
+    script.chmod(0o755)
+    monkeypatch.setattr(lint, "CLANG_TIDY", str(script))
+    lint.tidy_identity.cache_clear()
+    yield lambda: [json.loads(line) for line in log.read_text().splitlines()] \
+        if log.exists() else []
+    lint.tidy_identity.cache_clear()
+
+
+def test_warning_count():
+    assert warning_count("2 warnings generated.\nx\n1 warning generated.\n") == 3
+    assert warning_count("") == 0
+
+
+def test_lint_cache(make_cohort, tidy):
+    cohort = make_cohort({"alice": {"add.c": '#include "add.h"\nint add;\n',
+                                    "add.h": "int a;\n"}})
+    alice = cohort.students()[0]
+    source = alice.path / "add.c"
+    includes = lint_includes(cohort, alice)
+    cache = LintCache(cohort)
+    key = cache.key(source, "*", includes, DEFAULT_CFLAGS)
+    assert key != cache.key(source, "readability-*", includes, DEFAULT_CFLAGS)
+    assert key != cache.key(source, "*", includes, ["-O2"])
+    result = cache.lint(source, "*", includes, DEFAULT_CFLAGS)
+    assert warning_count(result.stdout) == 1
+    assert cache.lint(source, "*", includes, DEFAULT_CFLAGS).stdout == result.stdout
+    assert LintCache(cohort).get(key).stdout == result.stdout
+    assert len(tidy()) == 1
+    # a change to an included header lints the file again
+    (alice.path / "add.h").write_text("int b;\n")
+    assert cache.key(source, "*", includes, DEFAULT_CFLAGS) != key
+    cache.lint(source, "*", includes, DEFAULT_CFLAGS)
+    assert len(tidy()) == 2
+    # files which can not be preprocessed are linted but not cached
+    (alice.path / "add.h").unlink()
+    assert cache.key(source, "*", includes, DEFAULT_CFLAGS) is None
+    cache.lint(source, "*", includes, DEFAULT_CFLAGS)
+    cache.lint(source, "*", includes, DEFAULT_CFLAGS)
+    assert len(tidy()) == 4
+
+
+def test_lint_cohort(make_cohort, tidy):
+    cohort = make_cohort(
+        {"alice": {"add.c": '#include "common.h"\nint add;\n'},
+         "bob": {"add.c": '#include "common.h"\nint add;\n'},
+         "carl": {"add.c": '#include "missing.h"\n'},
+         "dave": {}},
+        {"test_add.c": TEST_FILE, "test_other.c": '#define PYAM_TEST "add.c"\nint TEST_X;\n',
+         "common.h": "int common;\n"})
+    students = cohort.students()
+    assert lint_cohort(cohort, students, 2) == 2
+    calls = tidy()
+    assert sorted(call[0] for call in calls) == [
+        str(cohort.path / name / "add.c") for name in ("alice", "bob")]
+    assert all("-p" in call for call in calls)
+    # the test items then only read the cache
+    cache = LintCache(cohort)
+    alice = students[0]
+    assert cache.get(cache.key(alice.path / "add.c", CTestFile.clint_checks,
+                               lint_includes(cohort, alice), DEFAULT_CFLAGS))
+    assert lint_cohort(cohort, students, 2) == 0
+    # a change to a header in the tests lints all the files again
+    (cohort.test_path / "common.h").write_text("int changed;\n")
+    assert lint_cohort(cohort, students, 2) == 2
+    assert len(tidy()) == 4
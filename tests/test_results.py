@@ -0,0 +1,84 @@
+"""Tests for :class:`pyam.results.ResultsDB`"""
+import sqlite3
+import pytest
+from pyam.results import ResultsDB
+
+
+def results(student, created, tests, exitstatus=1, duration=1.0):
+    return {"cohort": "t1", "student": student, "created": created, "exitstatus": exitstatus,
+            "duration": duration, "errors": {}, "stats": {},
+            "tests": {nodeid: {"outcome": outcome, "when": "call", "duration": 0.5,
+                               "longrepr": None if outcome == "passed" else "failed",
+                               **extra}
+                      for nodeid, (outcome, extra) in tests.items()}}
+
+
+def test_round_trip(tmp_path):
+    database = ResultsDB(tmp_path / "results.sqlite")
+    database.add(results("alice", "2023-01-01T10:00:00", {
+        "test_a.c::ONE": ("passed", {"resources": {"user": 1.0, "system": 0.5}}),
+        "test_a.c::TWO": ("failed", {})}))
+    database.close()
+    database = ResultsDB(tmp_path / "results.sqlite")
+    assert database.outcomes("alice") == {"test_a.c::ONE": "PASSED", "test_a.c::TWO": "FAILED"}
+    assert database.nodeids() == ["test_a.c::ONE", "test_a.c::TWO"]
+    assert database.durations() == {"alice": 1.0}
+    assert database.test_durations() == {("alice", "test_a.c::ONE"): 0.5,
+                                         ("alice", "test_a.c::TWO"): 0.5}
+    assert database.resource_usage() == [("alice", "test_a.c::ONE", 1.5)]
+    assert database.runs("alice") == [("alice", "2023-01-01T10:00:00", 1, 1.0)]
+    database.close()
+
+
+def test_latest_run_queries(tmp_path):
+    database = ResultsDB(tmp_path / "results.sqlite")
+    database.add(results("alice", "2023-01-01T10:00:00", {"t::A": ("failed", {})}))
+    database.add(results("alice", "2023-01-02T10:00:00", {"t::A": ("passed", {})}, 0))
+    database.add(results("bob", "2023-01-01T10:00:00", {"t::A": ("failed", {})}))
+    database.add(results("carl", "2023-01-01T10:00:00", {"t::A": ("failed", {})}))
+    assert database.outcomes("alice") == {"t::A": "PASSED"}
+    assert database.students("t::A") == ["bob", "carl"]
+    assert database.students("t::A", "passed") == ["alice"]
+    assert database.pass_rates() == [("t::A", 1, 3)]
+    assert [run[1] for run in database.runs("alice")] == ["2023-01-02T10:00:00",
+                                                           "2023-01-01T10:00:00"]
+    assert len(database.runs()) == 4
+    database.close()
+
+
+def test_resource_usage_order(tmp_path):
+    database = ResultsDB(tmp_path / "results.sqlite")
+    database.add(results("alice", "2023-01-01T10:00:00", {
+        "t::A": ("passed", {"resources": {"user": 1.0, "system": 0.0}}),
+        "t::B": ("passed", {"resources": {"user": 3.0, "system": 1.0}}),
+        "t::C": ("passed", {"resources": {"user": 2.0, "system": 0.0}})}))
+    assert [row[1] for row in database.resource_usage()] == ["t::B", "t::C", "t::A"]
+    assert [row[1] for row in database.resource_usage(1)] == ["t::B"]
+    database.close()
+
+
+def test_reopen(tmp_path):
+    path = tmp_path / "results.sqlite"
+    database = ResultsDB(path)
+    database.add(results("alice", "2023-01-02T10:00:00", {
+        "t::A": ("passed", {"resources": {"user": 1.0, "system": 1.0}})}))
+    database.close()
+    database = ResultsDB(path)
+    assert database.outcomes("alice") == {"t::A": "PASSED"}
+    assert database.resource_usage() == [("alice", "t::A", 2.0)]
+    database.close()
+
+
+def test_readonly(tmp_path):
+    path = tmp_path / "results.sqlite"
+    with pytest.raises(sqlite3.OperationalError):
+        ResultsDB(path, readonly=True)
+    assert not path.exists()
+    database = ResultsDB(path)
+    database.add(results("alice", "2023-01-01T10:00:00", {"t::A": ("passed", {})}))
+    database.close()
+    database = ResultsDB(path, readonly=True)
+    assert database.durations() == {"alice": 1.0}
+    with pytest.raises(sqlite3.OperationalError):
+        database.add(results("bob", "2023-01-01T10:00:00", {"t::A": ("passed", {})}))
+    database.close()
@@ -0,0 +1,26 @@
+"""Tests for :mod:`pyam.schedule`"""
+from pyam.schedule import longest_first
+
+
+def test_longest_first():
+    order, estimates = longest_first(["a", "b", "c"], {"a": 1.0, "b": 3.0, "c": 2.0})
+    assert order == ["b", "c", "a"]
+    assert estimates == {"a": 1.0, "b": 3.0, "c": 2.0}
+
+
+def test_longest_first_unknown_use_median():
+    order, estimates = longest_first(["new", "a", "b", "c"],
+                                     {"a": 1.0, "b": 5.0, "c": 2.0, "gone": 100.0})
+    assert estimates["new"] == 2.0
+    # ties keep their given order
+    assert order == ["b", "new", "c", "a"]
+
+
+def test_longest_first_no_durations():
+    order, estimates = longest_first(["x", "y", "z"], {"y": None})
+    assert order == ["x", "y", "z"]
+    assert estimates == {"x": 0.0, "y": 0.0, "z": 0.0}
+
+
+def test_longest_first_empty():
+    assert longest_first([], {"a": 1.0}) == ([], {})
@@ -0,0 +1,62 @@
+"""Tests for sharded runs (run --shard) and merging them (merge command)"""
+import argparse
+import pytest
+from pyam.cmd import run, merge
+from pyam.cache import ResultCache
+from pyam.results import ResultsDB
+
+STUDENTS = {username: {"answer.txt": "42"} for username in
+            ("alice", "bob", "carl", "dave", "erin", "fred")}
+TESTS = {"test_answer.py": "def test_answer():\n    assert True\n"}
+
+
+def parse(module, *args):
+    parser = argparse.ArgumentParser()
+    module.add_args(parser)
+    return parser.parse_args(args)
+
+
+def test_shard_spec():
+    assert run.shard_spec("2/3") == (2, 3)
+    assert run.shard_name(2, 3) == "shard-2-of-3"
+    for spec in ("0/3", "4/3", "1", "a/b"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            run.shard_spec(spec)
+
+
+def test_log_records():
+    text = ("2023-01-01 10:00:00: INFO first\n  more\n"
+            "2023-01-01 10:00:01: INFO second\n")
+    assert merge.log_records(text) == ["2023-01-01 10:00:00: INFO first\n  more\n",
+                                       "2023-01-01 10:00:01: INFO second\n"]
+
+
+def test_shard_and_merge(make_cohort):
+    cohort = make_cohort(STUDENTS, TESTS, fixtures=["python"])
+    for index in (1, 2):
+        run.main(parse(run, "--cohort", cohort.name, "--shard", f"{index}/2", "--jobs", "2"))
+    reports = {username: cohort.report_path / f"report_{username}.txt" for username in STUDENTS}
+    shards = [cohort.report_path / run.shard_name(index, 2) for index in (1, 2)]
+    sharded = [{path.stem[len("report_"):] for path in shard.glob("report_*.txt")}
+               for shard in shards]
+    # each student is tested in exactly one shard
+    assert sharded[0] | sharded[1] == set(STUDENTS)
+    assert not sharded[0] & sharded[1]
+    assert not any(path.exists() for path in reports.values())
+    # shards only record their keys in their journal and do not create the database
+    assert not (cohort.cache_path / "results.json").exists()
+    assert not (cohort.report_path / "results.sqlite").exists()
+    merge.main(parse(merge, "--cohort", cohort.name))
+    assert not any(shard.exists() for shard in shards)
+    assert all(path.exists() and path.with_suffix(".json").exists()
+               for path in reports.values())
+    database = ResultsDB.for_cohort(cohort)
+    for username in STUDENTS:
+        assert database.outcomes(username) == {"test_answer.py::test_answer": "PASSED"}
+    database.close()
+    cache = ResultCache(cohort)
+    assert all(cache.hit(student, cache.key(student), reports[student.username])
+               for student in cohort.students())
+    log = (cohort.report_path / "info.log").read_text()
+    assert "shard-" not in log.split("Merged")[0]
+    assert all(f"report_{username}.txt" in log for username in STUDENTS)
@@ -0,0 +1,69 @@
+"""Tests for :mod:`pyam.timeouts` and calibrated item timeouts"""
+from types import SimpleNamespace
+import pytest
+from pyam.timeouts import TimeoutCalibration, calibrate
+from pyam.fixtures.common import item_timeout, ITEM_TIMEOUT
+
+STUDENTS = {"sol": {"answer.txt": "42"}, "alice": {"answer.txt": "41"}}
+TESTS = {"test_answer.py": "def test_fast():\n    pass\n\ndef test_fail():\n    assert False\n"}
+CALIBRATE = {"solution": {"username": "sol"}, "timeout": {"calibrate": True}}
+
+
+def results(tests):
+    return {"tests": {nodeid: {"outcome": outcome, "duration": duration + 1,
+                               "call_duration": duration}
+                      for nodeid, (outcome, duration) in tests.items()}}
+
+
+def test_calibration(make_cohort):
+    cohort = make_cohort(STUDENTS, TESTS, **CALIBRATE)
+    calibration = TimeoutCalibration(cohort)
+    assert calibration.solution().username == "sol"
+    assert calibration.required()
+    assert calibration.timeouts() == {}
+    calibration.calibrate(results({"a": ("passed", 0.5), "b": ("passed", 0.01),
+                                   "c": ("failed", 0.5)}))
+    assert not calibration.required()
+    # the multiplier times the call duration but at least the floor
+    assert calibration.timeouts() == {"a": 5.0, "b": 1.0}
+    # only valid while the tests and solution are unchanged
+    (cohort.path / "sol" / "answer.txt").write_text("43")
+    assert calibration.required()
+    assert calibration.timeouts() == {}
+    calibration.calibrate(results({"a": ("passed", 0.5)}))
+    (cohort.path / "alice" / "answer.txt").write_text("40")
+    assert calibration.timeouts() == {"a": 5.0}
+    (cohort.test_path / "test_answer.py").write_text("")
+    assert calibration.timeouts() == {}
+
+
+def test_calibration_disabled(make_cohort):
+    cohort = make_cohort(STUDENTS, TESTS, solution={"username": "sol"})
+    calibration = TimeoutCalibration(cohort)
+    assert not calibration.required()
+    calibration.calibrate(results({"a": ("passed", 0.5)}))
+    assert calibration.timeouts() == {}
+    assert not calibrate(cohort)
+
+
+def test_calibrate(make_cohort):
+    cohort = make_cohort(STUDENTS, TESTS, fixtures=["python"],
+                         timeout={"calibrate": True, "floor": 2.5},
+                         solution={"username": "sol"})
+    assert calibrate(cohort)
+    assert TimeoutCalibration(cohort).timeouts() == {"test_answer.py::test_fast": 2.5}
+    assert not calibrate(cohort)
+
+
+@pytest.mark.parametrize("timeout, calibrated, expected", [
+    (None, None, None),
+    (10, None, 10),
+    (None, 2.0, 2.0),
+    (10, 2.0, 2.0),
+    ("1.5", 2.0, 1.5),
+])
+def test_item_timeout(timeout, calibrated, expected):
+    item = SimpleNamespace(stash=pytest.Stash())
+    if calibrated is not None:
+        item.stash[ITEM_TIMEOUT] = calibrated
+    assert item_timeout(item, timeout) == expected
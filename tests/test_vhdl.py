@@ -0,0 +1,217 @@
+"""Tests for the VHDL simulators and VHDL test files in :mod:`pyam.fixtures.vhdl`"""
+import os
+import sys
+import gzip
+import json
+import argparse
+import pytest
+from pyam.config import CONFIG
+from pyam.cmd import run
+from pyam.results import read_results
+from pyam.fixtures.vhdl import (get_simulator, simulate_testbench, GHDL, NVC, VHDLError,
+                                VHDLAnalysisError, VHDLRunError)
+
+#: A fake simulator which logs its arguments and records the files analysed in
+#: its working directory. Files containing "bad" fail analysis, a unit named
+#: noelab fails elaboration and a run fails (writing any wave file) if a file
+#: containing "failsim" has been analysed.
+SIMULATOR = """#!{python}
+import os, sys, json
+args = sys.argv[1:]
+with open({log!r}, "a") as fid:
+    fid.write(json.dumps([os.getcwd(), *args]) + "\\n")
+if args == ["--version"]:
+    print("fake {name} 1.0")
+    sys.exit(0)
+for arg in args:
+    if arg.endswith(".vhd"):
+        if "bad" in open(arg).read():
+            sys.exit(f"{{arg}}:1:1: syntax error")
+        with open("work-index", "a") as fid:
+            fid.write(arg + "\\n")
+if "noelab" in args:
+    sys.exit("noelab: unit not found")
+if "-r" in args:
+    analysed = open("work-index").read().split() if os.path.exists("work-index") else []
+    if any("failsim" in open(path).read() for path in analysed):
+        for arg in args:
+            if arg.startswith("--wave="):
+                with open(arg[len("--wave="):], "w") as fid:
+                    fid.write("wave " * 1000)
+        sys.exit("@10ns:(assertion error): wrong output")
+"""
+
+def parse(module, *args):
+    parser = argparse.ArgumentParser()
+    module.add_args(parser)
+    return parser.parse_args(args)
+
+
+ENTITY = "entity inv is\nend entity;\n"
+TESTBENCH = ("entity tb_inv is\nend entity;\narchitecture test of tb_inv is\nbegin\n"
+             "  uut: entity work.inv;\nend architecture;\n")
+
+
+@pytest.fixture
+def simulator_log(tmp_path, monkeypatch):
+    """Put fake ghdl and nvc simulators on the PATH - returns function to read their log"""
+    path = tmp_path / "bin"
+    path.mkdir()
+    log = tmp_path / "simulator.log"
+    for name in ("ghdl", "nvc"):
+        (path / name).write_text(SIMULATOR.format(python=sys.executable, log=str(log),
+                                                  name=name))
+        (path / name).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{path}{os.pathsep}{os.environ['PATH']}")
+
+    def read():
+        """Return the arguments of each call since last read"""
+        lines = log.read_text().splitlines() if log.exists() else []
+        log.unlink(missing_ok=True)
+        return [json.loads(line)[1:] for line in lines]
+
+    return read
+
+
+def test_get_simulator(simulator_log, tmp_path, monkeypatch):
+    assert isinstance(get_simulator(), GHDL)
+    simulator = get_simulator("nvc")
+    assert isinstance(simulator, NVC)
+    assert simulator.executable == tmp_path / "bin" / "nvc"
+    assert "fake nvc 1.0" in simulator.identity()
+    with pytest.raises(ValueError, match="Unknown VHDL simulator 'modelsim'"):
+        get_simulator("modelsim")
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    with pytest.raises(FileNotFoundError):
+        get_simulator("ghdl", [tmp_path / "empty"])
+    assert get_simulator("ghdl", [tmp_path]).executable == tmp_path / "bin" / "ghdl"
+
+
+def test_ghdl_commands(simulator_log, tmp_path):
+    simulator = GHDL()
+    source = tmp_path / "inv.vhd"
+    source.write_text(ENTITY)
+    simulator.analyse(source, tmp_path)
+    simulator.elaborate("inv", tmp_path)
+    simulator.run("inv", tmp_path)
+    simulator.run("inv", tmp_path, generics={"N": "4"}, wave=tmp_path / "inv.ghw",
+                  signals=["/inv/a"], stop_time="1us")
+    assert simulator_log() == [
+        ["-a", "--std=08", "--warn-no-hide", str(source)],
+        ["-e", "--std=08", "--warn-no-hide", "inv"],
+        ["-r", "--std=08", "--warn-no-hide", "inv", "--assert-level=error"],
+        ["-r", "--std=08", "--warn-no-hide", "inv", "--assert-level=error", "-gN=4",
+         f"--wave={tmp_path / 'inv.ghw'}", f"--read-wave-opt={tmp_path / 'inv.opt'}",
+         "--stop-time=1us"]]
+    assert (tmp_path / "inv.opt").read_text() == "$ version 1.1\n/inv/a\n"
+
+
+def test_nvc_commands(simulator_log, tmp_path):
+    simulator = NVC()
+    source = tmp_path / "inv.vhd"
+    source.write_text(ENTITY)
+    simulator.analyse(source, tmp_path)
+    simulator.elaborate("inv", tmp_path)
+    simulator.run("inv", tmp_path)
+    simulator.run("inv", tmp_path, generics={"N": "4"}, wave=tmp_path / "inv.fst",
+                  signals=["/inv/a"], stop_time="1us")
+    assert simulator_log() == [
+        ["--std=2008", "-a", str(source)],
+        ["--std=2008", "-e", "inv"],
+        ["--std=2008", "-r", "inv", "--exit-severity=error"],
+        ["--std=2008", "-e", "--jit", "--no-save", "-gN=4", "inv", "-r",
+         "--exit-severity=error", f"--wave={tmp_path / 'inv.fst'}", "--include=/inv/a",
+         "--stop-time=1us"]]
+    (tmp_path / "inv.fst").write_text("")
+    simulator.clean(tmp_path)
+    assert not (tmp_path / "inv.fst").exists()
+
+
+@pytest.mark.parametrize("name", ["ghdl", "nvc"])
+def test_simulator_errors(simulator_log, tmp_path, name):
+    simulator = get_simulator(name)
+    bad = tmp_path / "bad.vhd"
+    bad.write_text("bad")
+    with pytest.raises(VHDLAnalysisError, match="syntax error"):
+        simulator.analyse(bad, tmp_path)
+    with pytest.raises(VHDLError, match=f"{name} elaborate 'noelab'"):
+        simulator.elaborate("noelab", tmp_path)
+    failing = tmp_path / "inv.vhd"
+    failing.write_text(ENTITY + "-- failsim\n")
+    simulator.analyse(failing, tmp_path)
+    with pytest.raises(VHDLRunError, match="assertion error"):
+        simulator.run("inv", tmp_path)
+
+
+@pytest.mark.parametrize("name", ["ghdl", "nvc"])
+def test_simulate_testbench(simulator_log, tmp_path, name):
+    testbench = tmp_path / "tb_inv.vhd"
+    testbench.write_text(TESTBENCH)
+    entity = tmp_path / "inv.vhd"
+    entity.write_text(ENTITY)
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    times = simulate_testbench(get_simulator(name), testbench, [testbench, entity], workdir,
+                               ["1", "2"])
+    assert set(times) == {"analyse", "elaborate", "run"}
+    commands = simulator_log()
+    # the entity is analysed before the testbench which uses it
+    assert [str(entity) in command for command in commands[:2]] == [True, False]
+    assert [str(testbench) in command for command in commands[:2]] == [False, True]
+    assert "tb_inv" in commands[2]
+    assert ["-gPYAM_TEST_VALUE=1" in command for command in commands[3:]] == [True, False]
+    assert ["-gPYAM_TEST_VALUE=2" in command for command in commands[3:]] == [False, True]
+
+
+TEST_FILE = """-- PYAM_TEST "inv.vhd"
+-- PYAM_TEST_VALUE 1
+-- PYAM_TEST_VALUE 2
+entity test_inv is
+end entity;
+architecture test of test_inv is
+begin
+  uut: entity work.inv;
+end architecture;
+"""
+
+STUDENTS = {"alice": {"inv.vhd": ENTITY}, "bob": {"inv.vhd": ENTITY + "-- failsim\n"}}
+
+
+@pytest.mark.parametrize("name", ["ghdl", "nvc"])
+def test_wave_capture(simulator_log, make_cohort, name):
+    cohort = make_cohort(STUDENTS, {"test_inv.vhd": TEST_FILE}, fixtures=["vhdl"],
+                         vhdl={"simulator": name, "wave": {"stop-time": "1us"}})
+    run.main(parse(run, "--cohort", cohort.name, "--jobs", "1"))
+    suffix = get_simulator(name).wave_suffix
+    waves = cohort.report_path / "artifacts" / "report_bob"
+    assert sorted(path.name for path in waves.iterdir()) == \
+        [f"test_inv-1{suffix}.gz", f"test_inv-2{suffix}.gz"]
+    with gzip.open(waves / f"test_inv-1{suffix}.gz", "rt") as fid:
+        assert fid.read() == "wave " * 1000
+    results = read_results(cohort.report_path / "report_bob.json")
+    for value in ("1", "2"):
+        test = results["tests"][f"test_inv.vhd::{value}"]
+        assert test["outcome"] == "failed"
+        assert test["artifacts"] == {
+            "wave": str((waves / f"test_inv-{value}{suffix}.gz").relative_to(CONFIG.root_path))}
+    assert f"artifacts/report_bob/test_inv-1{suffix}.gz" in \
+        (cohort.report_path / "report_bob.txt").read_text()
+    # waves are only written when a failed simulation is run again
+    runs = [command for command in simulator_log() if "-r" in command]
+    wave_runs = [command for command in runs
+                 if any(arg.startswith("--wave=") for arg in command)]
+    assert len(runs) == 6 and len(wave_runs) == 2
+    assert all("--stop-time=1us" in command for command in wave_runs)
+    assert not list((cohort.report_path / "artifacts" / "report_alice").glob("*"))
+    assert all(test["outcome"] == "passed" and "artifacts" not in test for test in
+               read_results(cohort.report_path / "report_alice.json")["tests"].values())
+
+
+def test_wave_capture_disabled(simulator_log, make_cohort):
+    cohort = make_cohort(STUDENTS, {"test_inv.vhd": TEST_FILE}, fixtures=["vhdl"],
+                         vhdl={"wave": {"failed": False}})
+    run.main(parse(run, "--cohort", cohort.name, "--jobs", "1", "--students", "bob"))
+    results = read_results(cohort.report_path / "report_bob.json")
+    assert all(test["outcome"] == "failed" and "artifacts" not in test
+               for test in results["tests"].values())
+    assert not any(arg.startswith("--wave=") for command in simulator_log() for arg in command)
@@ -0,0 +1,76 @@
+"""Tests for :mod:`pyam.vhdl_depends` and :func:`pyam.files.get_depends`"""
+from pyam.files import get_depends
+from pyam.vhdl_depends import scan_units, depends_graph, analysis_order
+
+
+def write(path, text):
+    path.write_text(text, encoding="latin-1")
+    return path
+
+
+def test_scan_units(tmp_path):
+    path = write(tmp_path / "top.vhd", """
+library ieee;
+use ieee.std_logic_1164.all;
+use work.Util_Pkg.all;  -- use work.commented.all
+entity Top is
+end entity;
+architecture rtl of top is
+  component adder is end component;
+begin
+  u1: entity work.counter port map ();
+end architecture;
+""")
+    declares, requires, components = scan_units(path)
+    assert declares == {"top"}
+    assert requires == {"util_pkg", "counter"}
+    assert components == {"adder"}
+
+
+def test_scan_units_package_body(tmp_path):
+    path = write(tmp_path / "pkg_body.vhd", "package body util_pkg is\nend package body;\n")
+    declares, requires, _ = scan_units(path)
+    assert declares == set()
+    assert requires == {"util_pkg"}
+
+
+def test_analysis_order(tmp_path):
+    pkg = write(tmp_path / "pkg.vhd", "package util_pkg is\nend package;\n")
+    counter = write(tmp_path / "counter.vhd",
+                    "use work.util_pkg.all;\nentity counter is\nend entity;\n")
+    top = write(tmp_path / "top.vhd",
+                "entity top is\nend entity;\narchitecture a of top is\nbegin\n"
+                "  u: entity work.counter;\nend architecture;\n")
+    other = write(tmp_path / "other.vhd", "entity other is\nend entity;\n")
+    assert analysis_order([top, other, counter, pkg]) == [pkg, counter, top, other]
+
+
+def test_analysis_order_components(tmp_path):
+    adder = write(tmp_path / "adder.vhd", "entity adder is\nend entity;\n")
+    top = write(tmp_path / "top.vhd",
+                "entity top is\nend entity;\narchitecture a of top is\n"
+                "  component adder\n  end component;\nbegin\nend architecture;\n")
+    assert analysis_order([top, adder]) == [adder, top]
+    graph = depends_graph([top, adder], components=False)
+    assert analysis_order([top, adder], graph) == [top, adder]
+
+
+def test_analysis_order_cycle(tmp_path):
+    first = write(tmp_path / "a.vhd", "use work.b.all;\npackage a is\nend package;\n")
+    second = write(tmp_path / "b.vhd", "use work.a.all;\npackage b is\nend package;\n")
+    order = analysis_order([first, second])
+    assert sorted(order) == sorted([first, second])
+    assert len(order) == 2
+
+
+def test_get_depends():
+    graph = [["c", "b", "a"], ["b", "a"], ["a"]]
+    assert get_depends("c", graph) == ["a", "b", "c"]
+    assert get_depends("a", graph) == ["a"]
+    assert get_depends("x", graph) == ["x"]
+
+
+def test_get_depends_cycle():
+    graph = [["a", "b"], ["b", "c"], ["c", "a"]]
+    assert get_depends("a", graph) == ["c", "b", "a"]
+    assert get_depends("self", [["self", "self"]]) == ["self"]
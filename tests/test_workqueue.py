@@ -0,0 +1,92 @@
+"""Tests for :mod:`pyam.workqueue`"""
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from pyam import workqueue
+from pyam.workqueue import WorkQueueServer, parse_address, run_worker, MAX_LOSSES
+from pyam.results import INTERNAL_ERROR
+
+UNITS = [(student, test) for student in ("alice", "bob") for test in ("test_a.c", "test_b.c")]
+
+
+@pytest.fixture
+def address(tmp_path):
+    return str(tmp_path / "queue.sock")
+
+
+def test_parse_address():
+    assert parse_address("localhost:8421") == (socket.AF_INET, ("localhost", 8421))
+    assert parse_address("/tmp/queue.sock") == (socket.AF_UNIX, "/tmp/queue.sock")
+    assert parse_address("queue") == (socket.AF_UNIX, "queue")
+
+
+def test_workers_complete_all_units(make_cohort, address, monkeypatch):
+    cohort = make_cohort()
+    seen = []
+    lock = threading.Lock()
+
+    def run_unit(unit):
+        with lock:
+            seen.append(unit)
+        return {"returncode": 0, "stdout": unit["path"], "results": None}
+
+    monkeypatch.setattr(workqueue, "run_unit", run_unit)
+    server = WorkQueueServer(cohort, UNITS, address, ["-x"], {"alice": ["--artifacts", "a"]})
+    with server, ThreadPoolExecutor(3) as executor:
+        workers = [executor.submit(run_worker, address) for _ in range(3)]
+        results = list(server.results())
+        counts = [worker.result(timeout=10) for worker in workers]
+    assert sorted(unit for unit, _ in results) == sorted(UNITS)
+    assert all(result["stdout"] == unit[1] for unit, result in results)
+    assert sum(counts) == len(UNITS)
+    assert sorted((unit["student"], unit["path"]) for unit in seen) == sorted(UNITS)
+    for unit in seen:
+        assert unit["cohort"] == cohort.name
+        assert unit["args"] == (["-x", "--artifacts", "a"] if unit["student"] == "alice"
+                                else ["-x"])
+
+
+def test_worker_returns_error_result(make_cohort, address, monkeypatch):
+    cohort = make_cohort()
+
+    def run_unit(unit):
+        if unit["path"] == "test_b.c":
+            raise ValueError("broken unit")
+        return {"returncode": 0, "stdout": "", "results": None}
+
+    monkeypatch.setattr(workqueue, "run_unit", run_unit)
+    with WorkQueueServer(cohort, UNITS, address) as server, ThreadPoolExecutor(1) as executor:
+        worker = executor.submit(run_worker, address)
+        results = dict(server.results())
+        assert worker.result(timeout=10) == len(UNITS)
+    for (_, test), result in results.items():
+        if test == "test_b.c":
+            assert result["returncode"] == INTERNAL_ERROR
+            assert "broken unit" in result["stdout"]
+        else:
+            assert result["returncode"] == 0
+
+
+def lease_and_disconnect(address):
+    """Lease a unit then disconnect without returning a result"""
+    while True:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(address)
+            sock.sendall(json.dumps({"request": "unit"}).encode("utf-8") + b"\n")
+            reply = json.loads(sock.makefile("rb").readline())
+        if reply.get("unit"):
+            return reply["unit"]
+
+
+def test_lost_units_requeued_then_abandoned(make_cohort, address):
+    cohort = make_cohort()
+    with WorkQueueServer(cohort, UNITS[:1], address) as server:
+        units = [lease_and_disconnect(address) for _ in range(MAX_LOSSES + 1)]
+        assert all(unit == units[0] for unit in units)
+        (unit, result), = server.results()
+    assert unit == UNITS[0]
+    assert result["returncode"] == INTERNAL_ERROR
+    assert f"Abandoned after {MAX_LOSSES + 1}" in result["stdout"]
+    assert server.outstanding == 0 and not server.pending and not server.leased